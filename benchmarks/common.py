@@ -0,0 +1,55 @@
+import os
+import random
+import resource
+import sys
+
+# Benchmarks are run from the repository root or from benchmarks directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def synthetic_model_text(reactions=10000, metabolites=None, external=0.05, seed=0):
+    """
+    Generate random model in BioOpt format with a structure similar to genome scale models
+
+    :param reactions: Number of reactions
+    :param metabolites: Number of metabolites (default: same as number of reactions)
+    :param external: Fraction of metabolites listed in external metabolites section
+    :param seed: Random seed
+    :rtype: str
+    """
+    rnd = random.Random(seed)
+    if metabolites is None:
+        metabolites = reactions
+
+    met_names = ["M_{0}_c".format(i) for i in xrange(metabolites)]
+    directions = ["->", "<->", "->", "<-"]
+
+    def members():
+        ret = []
+        for m in rnd.sample(met_names, rnd.randint(1, 3)):
+            coef = rnd.choice(["", "", "", "2 ", "0.5 ", "(1.25) "])
+            ret.append(coef + m)
+        return " + ".join(ret)
+
+    lines = ["-REACTIONS"]
+    for i in xrange(reactions):
+        lines.append("R_{0} : {1} {2} {3}".format(i, members(), rnd.choice(directions), members()))
+
+    lines += ["", "-CONSTRAINTS"]
+    for i in xrange(reactions):
+        lines.append("R_{0} [{1}, {2}]".format(i, rnd.choice([-1000, 0, 0, -10]), rnd.choice([1000, 1000, 10])))
+
+    lines += ["", "-EXTERNAL METABOLITES"]
+    lines += rnd.sample(met_names, int(metabolites*external))
+
+    lines += ["", "-OBJECTIVE", "R_0 1 1", "", "-DESIGN OBJECTIVE", "R_1 1 1", ""]
+
+    return "\n".join(lines)
+
+
+def peak_memory():
+    """
+    Peak resident memory of current process in megabytes
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024.0 / 1024.0 if sys.platform == "darwin" else rss / 1024.0
@@ -0,0 +1,47 @@
+"""
+Measure construction of flux balance problems (see :func:`cplex_utils.bioopt2cplex`) for models of increasing size:
+creation of model arrays (:meth:`model.Model.matrix`) and of the linear program with every available backend, with
+and without splitting of reversible reactions.
+
+Examples::
+
+    python benchmarks/fba_setup.py --reactions 1000 10000 50000
+    python benchmarks/fba_setup.py --backends scipy --repeat 5
+"""
+from common import synthetic_model_text
+from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+import cplex_utils
+import lp_backend
+import argparse
+import time
+
+
+def best_time(func, repeat):
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        res = func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark construction of flux balance problems')
+    parser.add_argument('--reactions', dest="reactions", default=[1000, 10000], type=int, nargs='+', action='store', help='Numbers of reactions in synthetic models (default: 1000 10000)')
+    parser.add_argument('--backends', dest="backends", default=lp_backend.available_backends(), nargs='+', action='store', help='Backends (default: all available)')
+    parser.add_argument('--repeat', dest="repeat", default=3, type=int, action='store', help='Best of N runs (default: 3)')
+
+    args = parser.parse_args()
+
+    print "{0:>10}{1:>10}{2:>10}{3:>12}{4:>10}{5:>12}".format("Reactions", "Backend", "Split", "Matrix, ms", "Columns", "Problem, ms")
+    for n in args.reactions:
+        model = BiooptParser().parse(synthetic_model_text(n), diagnostics=BiooptParseDiagnostics())
+        matrix_time, matrix = best_time(lambda: model.matrix(refresh=True), args.repeat)
+
+        for backend in args.backends:
+            for split in [False, True]:
+                setup_time, prob = best_time(lambda: cplex_utils.bioopt2cplex(matrix, split_reversible=split, objective="R_0", backend=backend), args.repeat)
+                print "{0:>10}{1:>10}{2:>10}{3:>12.1f}{4:>10}{5:>12.1f}".format(
+                    n, backend, "yes" if split else "no", matrix_time*1000, prob.rxnnum, setup_time*1000)
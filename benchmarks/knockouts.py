@@ -0,0 +1,87 @@
+"""
+Measure throughput of knockout screening (see :func:`knockout_utils.run_knockouts`) with increasing number of worker
+processes. Every run solves the same single (or double) reaction knockouts and results are compared with the first run.
+With wild type screening (see :class:`knockout_utils.WildTypeScreen`) knockouts which can't change the objective are
+not solved. With pruning (see :class:`knockout_utils.PrunedKnockouts`) knockouts of 1 to K of the first reactions are
+enumerated, skipping knockouts containing lethal knockouts. Number of bound changes between consecutive knockouts depends
+on their order (see :func:`knockout_utils.revolving_door`).
+
+Examples::
+
+    python benchmarks/knockouts.py --reactions 2000 --knockouts 500 --workers 1 2 4 8
+    python benchmarks/knockouts.py --model model.bioopt --objective R_BIOMASS --chunk-size 20
+    python benchmarks/knockouts.py --double --screen
+    python benchmarks/knockouts.py --knockouts 50 --prune 3
+    python benchmarks/knockouts.py --double --knockouts 1000 --order revolving-door
+"""
+from common import synthetic_model_text
+from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+import knockout_utils
+import lp_backend
+import argparse
+import itertools
+import multiprocessing
+import time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark parallel knockout screening')
+    parser.add_argument('--model', dest="model", default=None, action='store', help='BioOpt file (default: generate synthetic model)')
+    parser.add_argument('--objective', dest="objective", default="R_0", action='store', help='Objective reaction (default: R_0)')
+    parser.add_argument('--reactions', dest="reactions", default=500, type=int, action='store', help='Number of reactions in synthetic model (default: 500)')
+    parser.add_argument('--knockouts', dest="knockouts", default=100, type=int, action='store', help='Number of knockouts (default: 100)')
+    parser.add_argument('--workers', dest="workers", default=[1, multiprocessing.cpu_count()], type=int, nargs='+', action='store', help='Numbers of worker processes (default: 1 and number of CPUs)')
+    parser.add_argument('--chunk-size', dest="chunk_size", default=10, type=int, action='store', help='Knockouts sent to a worker at once (default: 10)')
+    parser.add_argument('--double', dest="double", default=False, action='store_true', help='Double knockouts of the first reactions instead of single knockouts')
+    parser.add_argument('--screen', dest="screen", default=False, action='store_true', help='Skip knockouts of reactions without flux in the wild type')
+    parser.add_argument('--prune', dest="prune", default=None, type=int, action='store', help='Knock out 1 to PRUNE of the first KNOCKOUTS reactions, skipping knockouts containing lethal knockouts')
+    parser.add_argument('--order', dest="order", default="lexicographic", choices=["lexicographic", "revolving-door"], action='store', help='Order of knockouts (default: lexicographic)')
+    parser.add_argument('--backend', dest="backend", default=None, choices=[b.name for b in lp_backend.backends], action='store', help='Backend (default: first available)')
+
+    args = parser.parse_args()
+
+    if args.model:
+        model = BiooptParser().parse_file(args.model, diagnostics=BiooptParseDiagnostics())
+    else:
+        model = BiooptParser().parse(synthetic_model_text(args.reactions), diagnostics=BiooptParseDiagnostics())
+
+    spec = knockout_utils.ProblemSpec(model.matrix(), args.objective, backend=args.backend)
+    if args.double:
+        knockouts = list(itertools.islice(knockout_utils.combinations(range(model.matrix().n_reactions), 2, args.order), args.knockouts))
+    else:
+        knockouts = [(i,) for i in xrange(min(args.knockouts, model.matrix().n_reactions))]
+
+    print "Model: {0} ({1} reactions), {2} knockouts, {3} CPUs".format(args.model or "synthetic", len(model.reactions), len(knockouts), multiprocessing.cpu_count())
+
+    screen = None
+    if args.screen:
+        start = time.time()
+        screen = knockout_utils.WildTypeScreen(spec.create())
+        screened = sum(1 for ko in knockouts if screen.unaffected(ko))
+        print "Wild type screen: {0:.2f} s, {1} of {2} knockouts don't need a solution".format(time.time() - start, screened, len(knockouts))
+
+    print "{0:>8}{1:>10}{2:>14}{3:>10}".format("Workers", "Time, s", "Knockouts/s", "Speedup")
+
+    reference = None
+    for workers in args.workers:
+        start = time.time()
+        solve = lambda kos: knockout_utils.run_knockouts(spec, kos, workers=workers, chunk_size=args.chunk_size, screen=screen)
+        if args.prune:
+            pruned = knockout_utils.PrunedKnockouts(range(min(args.knockouts, model.matrix().n_reactions)), args.prune, order=args.order)
+            results = list(pruned.run(solve))
+        else:
+            results = list(solve(knockouts))
+        elapsed = time.time() - start
+
+        values = [(status, round(value, 6)) for ko, status, value in results]
+        if reference is None:
+            reference = (elapsed, values)
+        elif values != reference[1]:
+            print "WARNING: results with {0} workers differ from results with {1} workers".format(workers, args.workers[0])
+
+        print "{0:>8}{1:>10.2f}{2:>14.1f}{3:>10.2f}".format(workers, elapsed, len(results) / elapsed, reference[0] / elapsed)
+        if args.prune:
+            print "{0:>8}  solved {1} knockouts, pruned {2}".format("", pruned.solved, pruned.pruned)
+
+    changes = sum(len(set(a[0]) ^ set(b[0])) for a, b in zip(results, results[1:]))
+    print "Bound changes between consecutive knockouts: {0} ({1:.2f} per knockout)".format(changes, changes / float(max(1, len(results))))
@@ -0,0 +1,99 @@
+"""
+Compare linear programming backends (see :mod:`lp_backend`) on the same flux balance problems: problem setup, wild
+type solution and a series of single reaction knockouts solved from scratch and warm started from the wild type basis.
+Objective values of all backends are compared.
+
+Examples::
+
+    python benchmarks/lp_backends.py --reactions 2000 --knockouts 100
+    python benchmarks/lp_backends.py --model model.bioopt --objective R_BIOMASS --backends cplex scipy
+"""
+from common import synthetic_model_text
+from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+import cplex_utils
+import lp_backend
+import argparse
+import random
+import time
+
+
+def run_backend(backend, model, objective, knockouts):
+    start = time.time()
+    prob = cplex_utils.bioopt2cplex(model, objective=objective, backend=backend)
+    prob.lp.set_objective([(prob.rxn2i[objective], 1.0)])
+    setup = time.time() - start
+
+    start = time.time()
+    prob.lp.solve()
+    wt = time.time() - start
+    wt_value = prob.lp.objective_value() if prob.lp.is_optimal() else None
+    basis = prob.lp.basis()
+
+    results = {}
+    for warm in [False, True]:
+        values = []
+        start = time.time()
+        for name in knockouts:
+            i = prob.rxn2i[name]
+            lb, ub = prob.lp.lower_bounds([i])[0], prob.lp.upper_bounds([i])[0]
+            prob.lp.set_lower_bounds([(i, 0.0)])
+            prob.lp.set_upper_bounds([(i, 0.0)])
+            if warm:
+                prob.lp.set_basis(basis)
+            prob.lp.solve()
+            values.append(prob.lp.objective_value() if prob.lp.is_optimal() else None)
+            prob.lp.set_lower_bounds([(i, lb)])
+            prob.lp.set_upper_bounds([(i, ub)])
+        results[warm] = (time.time() - start, values)
+
+    return {
+        "backend": backend,
+        "setup": setup,
+        "wt": wt,
+        "wt_value": wt_value,
+        "cold": results[False][0],
+        "warm": results[True][0] if basis is not None else None,
+        "values": results[False][1],
+    }
+
+
+def same(a, b, tolerance=1e-5):
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark linear programming backends on flux balance problems')
+    parser.add_argument('--model', dest="model", default=None, action='store', help='BioOpt file (default: generate synthetic model)')
+    parser.add_argument('--objective', dest="objective", default="R_0", action='store', help='Objective reaction (default: R_0)')
+    parser.add_argument('--reactions', dest="reactions", default=2000, type=int, action='store', help='Number of reactions in synthetic model (default: 2000)')
+    parser.add_argument('--knockouts', dest="knockouts", default=50, type=int, action='store', help='Number of single reaction knockouts (default: 50)')
+    parser.add_argument('--backends', dest="backends", default=lp_backend.available_backends(), nargs='+', action='store', help='Backends to compare (default: all available)')
+    parser.add_argument('--seed', dest="seed", default=0, type=int, action='store', help='Random seed used to select knockouts (default: 0)')
+
+    args = parser.parse_args()
+
+    if args.model:
+        model = BiooptParser().parse_file(args.model, diagnostics=BiooptParseDiagnostics())
+    else:
+        model = BiooptParser().parse(synthetic_model_text(args.reactions), diagnostics=BiooptParseDiagnostics())
+
+    names = [r.name for r in model.reactions if r.name != args.objective]
+    knockouts = random.Random(args.seed).sample(names, min(args.knockouts, len(names)))
+
+    print "Model: {0} ({1} reactions), {2} knockouts".format(args.model or "synthetic", len(model.reactions), len(knockouts))
+    print "{0:<10}{1:>10}{2:>10}{3:>12}{4:>12}{5:>16}".format("Backend", "Setup, s", "WT, s", "KO cold, s", "KO warm, s", "WT objective")
+
+    results = []
+    for backend in args.backends:
+        res = run_backend(backend, model, args.objective, knockouts)
+        print "{0:<10}{1:>10.3f}{2:>10.3f}{3:>12.3f}{4:>12}{5:>16}".format(
+            res["backend"], res["setup"], res["wt"], res["cold"],
+            "-" if res["warm"] is None else "{0:.3f}".format(res["warm"]),
+            "-" if res["wt_value"] is None else "{0:.6g}".format(res["wt_value"]))
+        results.append(res)
+
+    for res in results[1:]:
+        if not same(res["wt_value"], results[0]["wt_value"]) or not all(same(a, b) for a, b in zip(res["values"], results[0]["values"])):
+            print "WARNING: {0} and {1} found different objective values".format(results[0]["backend"], res["backend"])
@@ -0,0 +1,78 @@
+"""
+Measure memory saved by interning metabolite and reaction names (see :func:`model.intern_name`). Many similar models
+are parsed and kept in memory (optionally joined into a community model) once with shared names and once with every
+object keeping its own name string. Every variant is run in a separate process.
+
+Examples::
+
+    python benchmarks/name_interning.py --models 100 --reactions 2000
+    python benchmarks/name_interning.py --models 100 --commune
+"""
+from common import synthetic_model_text, peak_memory
+from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+import model
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_variant(variant, directory, commune):
+    if variant == "plain":
+        model.intern_name = lambda name: name
+
+    start = time.time()
+    parser = BiooptParser()
+    models = [parser.parse_file(path, diagnostics=BiooptParseDiagnostics()) for path in sorted(glob.glob(os.path.join(directory, "*.bioopt")))]
+    if commune:
+        models = [model.Model.commune(models)]
+
+    names = [m.name for mdl in models for m in mdl.find_metabolites()] + [r.name for mdl in models for r in mdl.reactions]
+
+    return {
+        "variant": variant,
+        "time": time.time() - start,
+        "peak_mb": peak_memory(),
+        "names": len(names),
+        "distinct": len(set(names)),
+        "objects": len(set(id(n) for n in names)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark memory used by names of many similar models')
+    parser.add_argument('--models', dest="models", default=100, type=int, action='store', help='Number of models (default: 100)')
+    parser.add_argument('--reactions', dest="reactions", default=2000, type=int, action='store', help='Number of reactions per model (default: 2000)')
+    parser.add_argument('--commune', dest="commune", default=False, action='store_true', help='Join models into a community model')
+    parser.add_argument('--single', dest="single", default=None, action='store', help=argparse.SUPPRESS)
+    parser.add_argument('--directory', dest="directory", default=None, action='store', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.single:
+        print json.dumps(run_variant(args.single, args.directory, args.commune))
+        sys.exit(0)
+
+    # Models share metabolite and reaction names, but have different reactions
+    directory = tempfile.mkdtemp()
+    try:
+        for i in xrange(args.models):
+            with open(os.path.join(directory, "model{0:04d}.bioopt".format(i)), "w") as f:
+                f.write(synthetic_model_text(args.reactions, seed=i))
+
+        print "Models: {0} x {1} reactions{2}".format(args.models, args.reactions, ", community" if args.commune else "")
+        print "{0:<10}{1:>10}{2:>12}{3:>12}{4:>12}".format("Names", "Time, s", "Peak, MB", "Distinct", "Objects")
+
+        for variant in ["plain", "interned"]:
+            cmd = [sys.executable, os.path.abspath(__file__), "--single", variant, "--directory", directory]
+            if args.commune:
+                cmd.append("--commune")
+            res = json.loads(subprocess.check_output(cmd).splitlines()[-1])
+            print "{variant:<10}{time:>10.2f}{peak_mb:>12.1f}{distinct:>12}{objects:>12}".format(**res)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,83 @@
+"""
+Compare throughput and peak memory of BioOpt parser engines. Every engine is run in a separate process so that peak
+memory of one engine doesn't affect the others. Models produced by all engines are compared through their saved text.
+
+Examples::
+
+    python benchmarks/parser_engines.py --reactions 20000
+    python benchmarks/parser_engines.py --model model.bioopt --engines regex scanner
+"""
+from common import synthetic_model_text, peak_memory
+from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_engine(engine, path, repeat):
+    parser = BiooptParser(engine=engine)
+    size = os.path.getsize(path)
+    times = []
+    model = None
+    for i in xrange(repeat):
+        start = time.time()
+        model = parser.parse_file(path, diagnostics=BiooptParseDiagnostics())
+        times.append(time.time() - start)
+
+    return {
+        "engine": engine,
+        "time": min(times),
+        "mb_per_s": size / 1024.0 / 1024.0 / min(times),
+        "reactions": len(model.reactions),
+        "peak_mb": peak_memory(),
+        "digest": hashlib.md5(model.save()).hexdigest(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark BioOpt parser engines')
+    parser.add_argument('--model', dest="model", default=None, action='store', help='BioOpt file (default: generate synthetic model)')
+    parser.add_argument('--reactions', dest="reactions", default=10000, type=int, action='store', help='Number of reactions in synthetic model (default: 10000)')
+    parser.add_argument('--engines', dest="engines", default=BiooptParser.engines, nargs='+', action='store', help='Engines to compare (default: all)')
+    parser.add_argument('--repeat', dest="repeat", default=3, type=int, action='store', help='Number of runs per engine, best time is reported (default: 3)')
+    parser.add_argument('--single', dest="single", default=None, action='store', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.single:
+        print json.dumps(run_engine(args.single, args.model, args.repeat))
+        sys.exit(0)
+
+    path = args.model
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".bioopt")
+        with os.fdopen(fd, "w") as f:
+            f.write(synthetic_model_text(args.reactions))
+
+    try:
+        print "Model: {0} ({1:.2f} MB)".format(args.model or "synthetic, {0} reactions".format(args.reactions), os.path.getsize(path) / 1024.0 / 1024.0)
+        print "{0:<10}{1:>10}{2:>10}{3:>12}".format("Engine", "Time, s", "MB/s", "Peak, MB")
+
+        results = []
+        for engine in args.engines:
+            cmd = [sys.executable, os.path.abspath(__file__), "--single", engine, "--model", path, "--repeat", str(args.repeat)]
+            try:
+                res = json.loads(subprocess.check_output(cmd).splitlines()[-1])
+            except subprocess.CalledProcessError:
+                print "{0:<10}{1:>10}".format(engine, "failed")
+                continue
+
+            print "{engine:<10}{time:>10.3f}{mb_per_s:>10.2f}{peak_mb:>12.1f}".format(**res)
+            results.append(res)
+
+        if len(set(r["digest"] for r in results)) > 1:
+            print "WARNING: engines produced different models"
+            sys.exit(1)
+    finally:
+        if args.model is None:
+            os.remove(path)
@@ -0,0 +1,23 @@
+from bioopt_parser import *
+from bioopt_binary import *
+import argparse
+
+warnings.simplefilter("ignore")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Converts model from bioopt format to binary format and back. Direction of conversion is detected from input file')
+    parser.add_argument('input', action='store', help='File containing bioopt or binary model')
+    parser.add_argument('output', action='store', help='Output file')
+    parser.add_argument('--in-inf', dest="in_inf", default=1000, action='store', type=float, help='Infinity value in parsed model (default: 1000)')
+    parser.add_argument('--out-inf', dest="out_inf", default=1000, action='store', type=float, help='Infinity value for a new model (default: 1000)')
+
+    args = parser.parse_args()
+
+    if is_binary(args.input):
+        model = load_binary(args.input).to_model()
+        model.save(args.output, inf=args.out_inf)
+        print "Finished converting {0} into BioOpt ({1})".format(args.input, args.output)
+    else:
+        model = BiooptParser(inf=args.in_inf).parse_file(args.input)
+        save_binary(model, args.output)
+        print "Finished converting {0} into binary model ({1})".format(args.input, args.output)
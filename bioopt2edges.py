@@ -1,7 +1,7 @@
 from bioopt_parser import *
 import argparse
 import cplex_utils
-import cplex
+import lp_backend
 
 def blocked(prob, reactions):
     """
@@ -10,34 +10,33 @@ def blocked(prob, reactions):
     :param reactions: List of reactions to be checked for "blocked" condition
     :return: List of blocked reactions
     """
-    m = prob.model
+    m = prob.lp
 
     # Constraint all reactions with [-1, 1] or [0, 1] range (reversible, irreversible)
-    reactions_set = set(reactions)
-    m.variables.set_lower_bounds([(r_i, -1 if prob.rxn2bounds[rxn].lb < 0 else 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in reactions_set])
-    m.variables.set_upper_bounds([(r_i, 1 if prob.rxn2bounds[rxn].ub > 0 else 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in reactions_set])
+    reactions_i = prob.rxn2i.indices(reactions).tolist()
+    m.set_lower_bounds([(r_i, -1 if prob.lb[r_i] < 0 else 0) for r_i in reactions_i])
+    m.set_upper_bounds([(r_i, 1 if prob.ub[r_i] > 0 else 0) for r_i in reactions_i])
 
     # Optimize sum of all reactions
-    m.objective.set_linear([(r_i, 1) for r_i in xrange(len(prob.rxn2i))])
+    m.set_objective([(r_i, 1) for r_i in xrange(len(prob.rxn2i))])
 
     # Create a list of candidates for being called blocked
-    reactions_set = set(reactions)
-    blocked_candidates_set = set(r_i for rxn, r_i in prob.rxn2i.iteritems() if rxn in reactions_set)
+    blocked_candidates_set = set(reactions_i)
     blocked_candidates = list(blocked_candidates_set)
 
     # Maximize (and minimize) sum of all reactions to see which reactions can possibly have flux.
     # The ones that will have non-zero flux can not possibly be blocked. Repeat N times.
     for p in range(50):
         # MAXIMIZE CANDIDATES
-        m.objective.set_linear([(r_i, 0) for r_i in xrange(len(prob.rxn2i))])
-        m.objective.set_linear([(r_i, 1) for r_i in blocked_candidates])
-        m.objective.set_sense(m.objective.sense.maximize)
+        m.set_objective([(r_i, 0) for r_i in xrange(len(prob.rxn2i))])
+        m.set_objective([(r_i, 1) for r_i in blocked_candidates])
+        m.set_maximize(True)
         m.solve()
-        active_fwd_set = set(r_i for r_i, flux in zip(blocked_candidates, m.solution.get_values(blocked_candidates)) if abs(flux) > 1e-10)
+        active_fwd_set = set(r_i for r_i, flux in zip(blocked_candidates, m.values(blocked_candidates)) if abs(flux) > 1e-10)
 
         # MINIMIZE CANDIDATES
-        active_rev_set = set(r_i for r_i, flux in zip(blocked_candidates, m.solution.get_values(blocked_candidates)) if abs(flux) > 1e-10)
-        m.objective.set_sense(m.objective.sense.minimize)
+        active_rev_set = set(r_i for r_i, flux in zip(blocked_candidates, m.values(blocked_candidates)) if abs(flux) > 1e-10)
+        m.set_maximize(False)
         m.solve()
 
         blocked_candidates_set = blocked_candidates_set - active_fwd_set.union(active_rev_set)
@@ -47,25 +46,25 @@ def blocked(prob, reactions):
     # Now check blocked reactions one by one by setting objective coefficient for each reaction to 1 and then
     # maximizing and minimizing that reaction
     blocked = []
-    m.objective.set_linear([(r_i, 0) for r_i in xrange(len(prob.rxn2i))])
+    m.set_objective([(r_i, 0) for r_i in xrange(len(prob.rxn2i))])
     for i, r_i in enumerate(blocked_candidates):
         print "{}/{}: {}".format(i, len(blocked_candidates), prob.i2rxn[r_i]),
 
         v_min, v_max = 0.0, 0.0
 
         # Set objective coefficient to 1
-        m.objective.set_linear(r_i, 1)
-        m.objective.set_sense(m.objective.sense.maximize)
-        prob.model.solve()
-        if cplex_utils.is_optimal(prob.model):
-            v_max = m.solution.get_objective_value()
+        m.set_objective([(r_i, 1)])
+        m.set_maximize(True)
+        m.solve()
+        if cplex_utils.is_optimal(m):
+            v_max = m.objective_value()
 
         # If reaction can't have positive flux try to minimize the same reaction
         if v_max == 0:
-            m.objective.set_sense(m.objective.sense.minimize)
+            m.set_maximize(False)
             m.solve()
-            if cplex_utils.is_optimal(prob.model):
-                v_min = m.solution.get_objective_value()
+            if cplex_utils.is_optimal(m):
+                v_min = m.objective_value()
 
 
         # If reaction don't have flux it is blocked!
@@ -76,7 +75,7 @@ def blocked(prob, reactions):
             print "[{} {}]".format(v_min, v_max)
 
         # Reset objective equation
-        m.objective.set_linear(r_i, 0)
+        m.set_objective([(r_i, 0)])
 
     return blocked
 
@@ -113,6 +112,7 @@ if __name__ == "__main__":
     parser.add_argument('output', action='store', help='Output file prefix (.edges and .nodes files are created')
     parser.add_argument('--metabolite-map', dest="metabolite_map", action='store', help="Map metabolite identifiers to names")
     parser.add_argument('--remove-nodes', dest="remove_nodes", action='store', help="Comma separated list of nodes not to be included in the final edges list")
+    parser.add_argument('--backend', dest='backend', action='store', choices=[b.name for b in lp_backend.backends], help="Linear programming solver (default: first available of {0})".format(", ".join(b.name for b in lp_backend.backends)), default=None)
 
     args = parser.parse_args()
 
@@ -175,13 +175,14 @@ if __name__ == "__main__":
             edge.removed = remove_nodes and (remove_nodes.match(m_name2) or remove_nodes.match(m_name) or remove_nodes.match(r.name))
             edges.append(edge)
 
-    prob = cplex_utils.bioopt2cplex(model)
+    prob = cplex_utils.bioopt2cplex(model, backend=args.backend)
 
     #
     # Find blocked reactions
     #
-    prob.model.variables.set_lower_bounds([(r_i, -1 if prob.rxn2bounds[rxn].lb < 0 else 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
-    prob.model.variables.set_upper_bounds([(r_i, 1 if prob.rxn2bounds[rxn].ub > 0 else 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
+    sinks_i = prob.rxn2i.indices(model_sinks).tolist()
+    prob.lp.set_lower_bounds([(r_i, -1 if prob.lb[r_i] < 0 else 0) for r_i in sinks_i])
+    prob.lp.set_upper_bounds([(r_i, 1 if prob.ub[r_i] > 0 else 0) for r_i in sinks_i])
     potential_blocked_reactions = [n.name for n in nodes.itervalues() if n.type == "reaction" and not n.blocked and not n.constrained]
     blocked_reactions = set(prob.i2rxn[r_i] for r_i in blocked(prob, potential_blocked_reactions))
     #blocked_reactions = set(r.strip() for r in open("/g/patil/Sergej/CancerHeterogeneity/data/model/blocked_reactions.txt"))
@@ -196,8 +197,8 @@ if __name__ == "__main__":
     #
     # Find infinite flux
     #
-    prob.model.variables.set_lower_bounds([(r_i, 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
-    prob.model.variables.set_upper_bounds([(r_i, 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
+    prob.lp.set_lower_bounds([(r_i, 0) for r_i in sinks_i])
+    prob.lp.set_upper_bounds([(r_i, 0) for r_i in sinks_i])
     potential_gen_reactions = set(n.name for n in nodes.itervalues() if n.type == "reaction" and not n.blocked and not n.constrained)
     genesis_reactions = potential_gen_reactions - set(prob.i2rxn[r_i] for r_i in blocked(prob, list(potential_gen_reactions)))
     #genesis_reactions = set(r.strip() for r in open("/g/patil/Sergej/CancerHeterogeneity/data/model/genesis_reactions.txt"))
@@ -213,23 +214,23 @@ if __name__ == "__main__":
     # Find infinite metabolites (unfinished)
     #
     if False:
-        prob.model.variables.set_lower_bounds([(prob.rxn2i[r.name], -1 if r.bounds.lb < 0 else 0) for r in model.reactions])
-        prob.model.variables.set_upper_bounds([(prob.rxn2i[r.name], 1 if r.bounds.ub > 0 else 0) for r in model.reactions])
-        prob.model.variables.set_lower_bounds([(r_i, 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
-        prob.model.variables.set_upper_bounds([(r_i, 0) for rxn, r_i in prob.rxn2i.iteritems() if rxn in model_sinks])
-        prob.model.objective.set_linear([(r_i, 0) for r_i in prob.i2rxn])
+        prob.lp.set_lower_bounds([(prob.rxn2i[r.name], -1 if r.bounds.lb < 0 else 0) for r in model.reactions])
+        prob.lp.set_upper_bounds([(prob.rxn2i[r.name], 1 if r.bounds.ub > 0 else 0) for r in model.reactions])
+        prob.lp.set_lower_bounds([(r_i, 0) for r_i in sinks_i])
+        prob.lp.set_upper_bounds([(r_i, 0) for r_i in sinks_i])
+        prob.lp.set_objective([(r_i, 0) for r_i in xrange(prob.rxnnum)])
 
         for c in model.find_metabolites():
             c_i = prob.cpd2i[c.name]
-            prob.model.variables.add(lb=[0], ub=[1000], names=["MET_EXPORT_TEST"], columns=[cplex.SparsePair([c_i], [-1])], obj=[1])
-            prob.model.solve()
+            prob.lp.add_column([c_i], [-1], lb=0, ub=1000, obj=1, name="MET_EXPORT_TEST")
+            prob.lp.solve()
 
-            status = prob.model.solution.get_status_string()
-            obj = prob.model.solution.get_objective_value() if status.startswith("optimal") else 0
+            status = prob.lp.status()
+            obj = prob.lp.objective_value() if status.startswith("optimal") else 0
             if obj > 1e-10:
                 print "{} {}".format(c.name, obj)
 
-            prob.model.variables.delete(prob.rxnnum)
+            prob.lp.delete_column(prob.rxnnum)
 
 
 
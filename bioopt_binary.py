@@ -0,0 +1,142 @@
+from model import *
+from model_matrix import ModelMatrix, StringTable
+import json
+import struct
+import numpy as np
+
+MAGIC = b"BIOOPTB\x00"
+VERSION = 1
+ALIGNMENT = 64
+
+_header = struct.Struct("<8sII")
+
+
+def is_binary(path):
+    """
+    Check whether file is a binary model
+
+    :param path: File path
+    :rtype: bool
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _arrays(matrix):
+    reaction_names = StringTable.from_strings(matrix.reaction_names)
+    metabolite_names = StringTable.from_strings(matrix.metabolite_names)
+    objective_names = StringTable.from_strings(matrix.objective_names)
+
+    arrays = [
+        ("reaction_names.blob", reaction_names.blob),
+        ("reaction_names.offsets", reaction_names.offsets),
+        ("directions", matrix.directions),
+        ("lb", matrix.lb),
+        ("ub", matrix.ub),
+        ("indptr", matrix.indptr),
+        ("indices", matrix.indices),
+        ("coefficients", matrix.coefficients),
+        ("sides", matrix.sides),
+        ("metabolite_names.blob", metabolite_names.blob),
+        ("metabolite_names.offsets", metabolite_names.offsets),
+        ("metabolite_boundary", matrix.metabolite_boundary),
+        ("metabolite_order", matrix.metabolite_order),
+        ("objective_names.blob", objective_names.blob),
+        ("objective_names.offsets", objective_names.offsets),
+    ]
+
+    for name in ["objective", "design_objective"]:
+        objective = getattr(matrix, name)
+        if objective is not None:
+            arrays += [(name + ".indptr", objective[0]), (name + ".operands", objective[1]), (name + ".values", objective[2])]
+
+    return arrays
+
+
+def save_binary(model, path):
+    """
+    Save model in binary format. Names are stored in string tables, reactions as compressed sparse row arrays and
+    objectives as sparse vectors (see :class:`model_matrix.ModelMatrix`). All arrays are aligned, so that they can be
+    memory mapped by :func:`load_binary`.
+
+    :param model: :class:`Model` or :class:`model_matrix.ModelMatrix`
+    :param path: Output file path
+    """
+    matrix = ModelMatrix.from_model(model) if isinstance(model, Model) else model
+
+    entries = []
+    offset = 0
+    for name, array in _arrays(matrix):
+        array = np.ascontiguousarray(array)
+        array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        entries.append((name, array, offset))
+        offset += (array.nbytes + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    header = json.dumps({
+        "arrays": dict((name, [array.dtype.str, list(array.shape), offset]) for name, array, offset in entries),
+    })
+    data_start = (_header.size + len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    with open(path, "wb") as f:
+        f.write(_header.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(b"\x00" * (data_start - _header.size - len(header)))
+
+        for name, array, offset in entries:
+            f.seek(data_start + offset)
+            f.write(array.tostring())
+
+
+def load_binary(path, mmap=True):
+    """
+    Load model saved by :func:`save_binary`. Arrays are memory mapped, so loading is almost instant and pages are shared
+    between processes loading the same file. Use :meth:`model_matrix.ModelMatrix.to_model` to create model objects.
+
+    :param path: File path
+    :param mmap: Memory map file (otherwise file is read into memory)
+    :rtype: :class:`model_matrix.ModelMatrix`
+    """
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+
+    if len(data) < _header.size:
+        raise IOError("File is not a binary BioOpt model: {0}".format(path))
+
+    magic, version, header_length = _header.unpack(data[:_header.size].tostring())
+    if magic != MAGIC:
+        raise IOError("File is not a binary BioOpt model: {0}".format(path))
+    if version > VERSION:
+        raise IOError("Binary BioOpt model version {0} is not supported (maximum: {1}): {2}".format(version, VERSION, path))
+
+    header = json.loads(data[_header.size:_header.size+header_length].tostring())
+    data_start = (_header.size + header_length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header["arrays"].iteritems():
+        dtype = np.dtype(str(dtype))
+        start = data_start + offset
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[str(name)] = data[start:start+size].view(dtype).reshape(shape)
+
+    def objective(name):
+        if name + ".indptr" not in arrays:
+            return None
+        return arrays[name + ".indptr"], arrays[name + ".operands"], arrays[name + ".values"]
+
+    return ModelMatrix(
+        reaction_names=StringTable(arrays["reaction_names.blob"], arrays["reaction_names.offsets"]),
+        directions=arrays["directions"],
+        lb=arrays["lb"],
+        ub=arrays["ub"],
+        indptr=arrays["indptr"],
+        indices=arrays["indices"],
+        coefficients=arrays["coefficients"],
+        sides=arrays["sides"],
+        metabolite_names=StringTable(arrays["metabolite_names.blob"], arrays["metabolite_names.offsets"]),
+        metabolite_boundary=arrays["metabolite_boundary"],
+        metabolite_order=arrays["metabolite_order"],
+        objective=objective("objective"),
+        design_objective=objective("design_objective"),
+        objective_names=StringTable(arrays["objective_names.blob"], arrays["objective_names.offsets"]).tolist())
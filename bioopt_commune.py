@@ -1,4 +1,5 @@
 from bioopt_parser import *
+from community import Community
 import argparse
 import os
 import numpy as np
@@ -9,63 +10,65 @@ if __name__ == "__main__":
     parser.add_argument('bioopt', action='store', nargs='+', help='Files containing bioopt models')
     parser.add_argument('output', action='store', help='Output file')
     parser.add_argument('--block', '-b', dest="block", action='store', help='Regexp to block uptake of reactions')
-    parser.add_argument('--inf', dest="inf", default=None, action='store', help='Infinity value for a new model (default: 1000)')
+    parser.add_argument('--inf', dest="inf", default=1000, action='store', type=float, help='Infinity value for a new model (default: 1000)')
+    parser.add_argument('--workers', '-w', dest="workers", default=None, action='store', type=int, help='Number of processes used to parse and prefix models (default: number of CPUs)')
 
     args = parser.parse_args()
 
-    boundary = {}
-    models = []
-    for bioopt_path in args.bioopt:
-        print "Parsing {0}: ".format(bioopt_path),
-        if not os.path.exists(bioopt_path):
-            print "File not found!"
-            break
+    community = Community()
+    names = {}
+    for res in community.add_member_files(args.bioopt, workers=args.workers):
+        print "Parsing {0}: ".format(res.path),
+        if not res.ok:
+            print res.error
+            for diagnostic in res.diagnostics:
+                print "  {0}".format(diagnostic)
+            continue
 
-        parser = BiooptParser()
-        model = parser.parse_file(bioopt_path)
-        boundary[os.path.basename(bioopt_path)] = set([m.name for m in model.find_boundary_metabolites()])
-        models.append(model)
-        print "Done"
+        names[res.prefix] = os.path.basename(res.path)
+        print "Done ({0:.2f}s)".format(res.time)
+        for diagnostic in res.diagnostics:
+            print "  {0}".format(diagnostic)
 
-    if args.inf is None:
-        args.inf = 1000
+    if not community.members:
+        print "No models were parsed"
+        exit(1)
 
-    com_model = Model.commune(models)
+    # Members of files which failed to parse are missing, so names are looked up by member prefix
+    names = [names[prefix] for prefix in community.members]
+
+    com_model = community.to_matrix()
     print "Community model created"
 
-    boundary = boundary.items()
-    bl = max(len(x[0]) for x in boundary)+3
+    # Pairwise intersections of exchanged metabolites as one product of boolean metabolite x model matrix
+    overlap = community.overlap()
+    bl = max(len(x) for x in names)+3
     bl_str = "{:<"+str(bl)+"}"
     print ""
     print "="*bl*3
     print "Exchanged metabolites intersection"
     print "="*bl*3
-    for b_i, b in enumerate(boundary):
+    for b_i, b in enumerate(names):
         if b_i == 0:
-            print (bl_str+"\t{}").format("", "\t".join(b_model2 for b_model2, b_mets2 in boundary))
-        print (bl_str+"\t{}").format(b[0], "\t".join(bl_str.format(len(b[1].intersection(b_mets2))) for b_model2, b_mets2 in boundary))
+            print (bl_str+"\t{}").format("", "\t".join(names))
+        print (bl_str+"\t{}").format(b, "\t".join(bl_str.format(n) for n in overlap[b_i].tolist()))
     print "="*bl*3
 
+    lb = com_model.lb.copy()
+    ub = com_model.ub.copy()
 
     if args.block:
         print "Blocking reactions: ",
         block_re = re.compile(args.block)
-        blocked_rcount = 0
-        for r in com_model.reactions:
-            if block_re.match(r.name):
-                if blocked_rcount > 0:
-                    print ", ",
-                print r.name,
-                r.bounds = Bounds(0, 0)
-                blocked_rcount += 1
-        print ""
-
-    for r in model.reactions:
-        if math.fabs(r.bounds.lb) == Bounds.inf():
-            r.bounds.lb = args.inf if r.bounds.lb >= 0 else -args.inf
+        blocked = [i for i, name in enumerate(com_model.reaction_names) if block_re.match(name)]
+        print ", ".join(com_model.reaction_names[i] for i in blocked)
+        lb[blocked] = 0
+        ub[blocked] = 0
 
-        if math.fabs(r.bounds.ub) >= Bounds.inf():
-            r.bounds.ub = args.inf if r.bounds.ub >= 0 else -args.inf
+    lb[np.isinf(lb)] = np.copysign(args.inf, lb[np.isinf(lb)])
+    ub[np.isinf(ub)] = np.copysign(args.inf, ub[np.isinf(ub)])
+    com_model.lb = lb
+    com_model.ub = ub
 
     com_model.save(args.output)
-    print "File {0} written!".format(args.output)
\ No newline at end of file
+    print "File {0} written!".format(args.output)
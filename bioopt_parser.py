@@ -1,12 +1,465 @@
 import re
 from model import *
+from compression import iter_lines
+from collections import namedtuple
+import cPickle
+import itertools
+import multiprocessing
+import time
 import warnings
+import weakref
+import zlib
 
 class BiooptParseWarning(Warning):
     pass
 
+
+class BiooptParseDiagnostic(namedtuple("BiooptParseDiagnostic", ["severity", "section", "line", "message", "filename"])):
+    """
+    Single problem found while parsing BioOpt model
+
+    :param severity: :attr:`BiooptParseDiagnostics.WARNING` or :attr:`BiooptParseDiagnostics.ERROR`
+    :param section: Name of the section the problem was found in (None if problem is not related to any section)
+    :param line: Line number in parsed text (None if problem is not related to any line)
+    :param message: Problem description
+    :param filename: Name of parsed file (None if text was parsed)
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        location = "{0}:{1}".format(self.filename or "<bioopt>", self.line or 0)
+        if self.section:
+            location += " ({0})".format(self.section)
+
+        return "{0}: {1}: {2}".format(location, self.severity, self.message)
+
+
+class BiooptParseError(SyntaxError):
+    """
+    Raised by strict :class:`BiooptParseDiagnostics` collector on the first problem found in the model
+
+    :param diagnostic: :class:`BiooptParseDiagnostic` describing the problem
+    """
+    def __init__(self, diagnostic):
+        super(BiooptParseError, self).__init__(str(diagnostic))
+        self.diagnostic = diagnostic
+
+
+class BiooptParseDiagnostics(object):
+    """
+    Collector of problems found while parsing BioOpt model. The same collector instance is passed through all parser
+    stages, so no state is set up for each parsed line.
+
+    :param strict: If True :class:`BiooptParseError` is raised on the first reported problem. Otherwise (batch mode)
+            all problems are collected and lines which could not be parsed are skipped.
+    :param warn: If True every collected problem is also issued as :class:`BiooptParseWarning`
+    :rtype: :class:`BiooptParseDiagnostics`
+    """
+    WARNING = "warning"
+    ERROR = "error"
+
+    def __init__(self, strict=False, warn=False):
+        self.strict = strict
+        self.warn = warn
+        self.diagnostics = []
+
+    def report(self, severity, message, section=None, line=None, filename=None):
+        """
+        Record a problem. In strict mode :class:`BiooptParseError` is raised instead.
+
+        :rtype: :class:`BiooptParseDiagnostic`
+        """
+        diagnostic = BiooptParseDiagnostic(severity, section, line, str(message), filename)
+        if self.strict:
+            raise BiooptParseError(diagnostic)
+
+        self.diagnostics.append(diagnostic)
+        if self.warn:
+            warnings.warn_explicit(diagnostic.message, BiooptParseWarning, filename=filename or "<bioopt>", lineno=line or 0)
+
+        return diagnostic
+
+    def warning(self, message, section=None, line=None, filename=None):
+        return self.report(BiooptParseDiagnostics.WARNING, message, section=section, line=line, filename=filename)
+
+    def error(self, message, section=None, line=None, filename=None):
+        return self.report(BiooptParseDiagnostics.ERROR, message, section=section, line=line, filename=filename)
+
+    @property
+    def warnings(self):
+        """
+        List of collected warnings
+
+        :rtype: list of :class:`BiooptParseDiagnostic`
+        """
+        return [d for d in self.diagnostics if d.severity == BiooptParseDiagnostics.WARNING]
+
+    @property
+    def errors(self):
+        """
+        List of collected errors
+
+        :rtype: list of :class:`BiooptParseDiagnostic`
+        """
+        return [d for d in self.diagnostics if d.severity == BiooptParseDiagnostics.ERROR]
+
+    def __len__(self):
+        return len(self.diagnostics)
+
+    def __iter__(self):
+        return iter(self.diagnostics)
+
+
+class BiooptParseResult(object):
+    """
+    Outcome of parsing one file with :meth:`BiooptParser.parse_files`
+
+    :param path: Parsed file
+    :param model: Parsed :class:`Model` (None if parsing failed or model is frozen)
+    :param image: Frozen model image (compressed pickle) which is unpacked on the first access to :attr:`model`
+    :param diagnostics: List of :class:`BiooptParseDiagnostic` collected while parsing
+    :param time: Time spent parsing file (seconds)
+    :param error: Description of error which stopped parsing (None if file was parsed)
+    :rtype: :class:`BiooptParseResult`
+    """
+
+    def __init__(self, path, model=None, image=None, diagnostics=None, time=0.0, error=None):
+        self.path = path
+        self.image = image
+        self.diagnostics = diagnostics if diagnostics is not None else []
+        self.time = time
+        self.error = error
+        self.__model = model
+
+    @staticmethod
+    def freeze(model):
+        """
+        Create compact frozen image of a model
+
+        :param model: :class:`Model`
+        :rtype: :class:`str`
+        """
+        return zlib.compress(cPickle.dumps(model, cPickle.HIGHEST_PROTOCOL), 1)
+
+    @staticmethod
+    def thaw(image):
+        """
+        Restore model from frozen image
+
+        :param image: Frozen model image created with :meth:`freeze`
+        :rtype: :class:`Model`
+        """
+        return cPickle.loads(zlib.decompress(image))
+
+    @property
+    def model(self):
+        """
+        Parsed model
+
+        :rtype: :class:`Model`
+        """
+        if self.__model is None and self.image is not None:
+            self.__model = BiooptParseResult.thaw(self.image)
+
+        return self.__model
+
+    @property
+    def ok(self):
+        """
+        True if file was parsed
+        """
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else "error: {0}".format(self.error)
+        return "{0} ({1}, {2} diagnostics, {3:.3f}s)".format(self.path, status, len(self.diagnostics), self.time)
+
+
+def _parse_file_worker(args):
+    inf, engine, path, strict, frozen = args
+
+    diagnostics = BiooptParseDiagnostics(strict=strict)
+    start = time.time()
+    try:
+        model = BiooptParser(inf=inf, engine=engine).parse_file(path, diagnostics=diagnostics)
+    except Exception, e:
+        return BiooptParseResult(path, diagnostics=diagnostics.diagnostics, time=time.time() - start,
+                                 error="{0}: {1}".format(type(e).__name__, e))
+
+    if frozen:
+        return BiooptParseResult(path, image=BiooptParseResult.freeze(model), diagnostics=diagnostics.diagnostics, time=time.time() - start)
+
+    return BiooptParseResult(path, model=model, diagnostics=diagnostics.diagnostics, time=time.time() - start)
+
+
+class BiooptParserEngine(object):
+    """
+    Line parsing backend of :class:`BiooptParser`. Parser reads model sections, collects diagnostics and assembles
+    :class:`Model`, while engine turns single section lines into model objects. All engines produce identical models.
+
+    :param parser: :class:`BiooptParser` using this engine
+    """
+    name = None
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def reset(self):
+        """
+        Called before parsing every model
+        """
+        pass
+
+    def parse_reaction(self, line):
+        """
+        :rtype: :class:`Reaction`
+        """
+        raise NotImplementedError()
+
+    def parse_constraint(self, line):
+        """
+        :rtype: :class:`Reaction` holding constraint bounds
+        """
+        raise NotImplementedError()
+
+    def parse_external_metabolite(self, line):
+        """
+        :rtype: :class:`Metabolite`
+        """
+        return Metabolite(line)
+
+    def parse_objective_line(self, line):
+        """
+        :rtype: :class:`MathExpression`
+        """
+        raise NotImplementedError()
+
+
+class RegexEngine(BiooptParserEngine):
+    """
+    Default engine based on regular expressions used by :class:`BiooptParser` section parsing methods
+    """
+    name = "regex"
+
+    def parse_reaction(self, line):
+        return self.parser.parse_reaction(line, strip_comments=False)
+
+    def parse_constraint(self, line):
+        return self.parser.parse_constraint(line, strip_comments=False)
+
+    def parse_objective_line(self, line):
+        return self.parser.parse_objective_section_line(line)
+
+
+class ScannerEngine(BiooptParserEngine):
+    """
+    Engine scanning lines with precompiled patterns. Reaction members without coefficients are recognized without
+    regular expressions and metabolite instances are shared between reactions while they are created.
+    """
+    name = "scanner"
+
+    __number_start = frozenset("(-+.0123456789")
+
+    def __init__(self, parser):
+        super(ScannerEngine, self).__init__(parser)
+        self.re_direction = re.compile(r"(\s+<\->|<\-|\->\s+)")
+        self.re_plus = re.compile(r"\s+\+\s+")
+        self.re_space = re.compile(r"\s+")
+        self.re_member = parser.re_member
+        self.re_constraint = re.compile(parser.re_constraint)
+        self.fwd = Direction.forward()
+        self.rev = Direction.reversible()
+        self.__metabolites = {}
+
+    def reset(self):
+        self.__metabolites = {}
+
+    def __parse_members(self, members_str):
+        if not len(members_str):
+            raise ValueError("Reaction member list string is empty")
+
+        metabolites = self.__metabolites
+        members = ReactionMemberList()
+        for member_str in self.re_plus.split(members_str):
+            member_str = member_str.strip()
+            if not len(member_str):
+                raise ValueError("Reaction member string is empty")
+
+            if member_str[0] in ScannerEngine.__number_start:
+                m = self.re_member.match(member_str)
+                if not m:
+                    raise SyntaxError("Could not parse reaction member: {0}".format(member_str))
+                tmp, coef, name = m.groups()
+                coef = float(coef) if coef else 1
+            else:
+                coef, name = 1, member_str
+
+            m = metabolites.get(name)
+            if m is None:
+                m = metabolites[name] = Metabolite(name)
+
+            members.append(ReactionMember(m, coef))
+
+        return members
+
+    def parse_reaction(self, line):
+        parts = line.split(":")
+        if len(parts) > 2:
+            raise SyntaxError(": separator split reaction line into more than two parts [{0}]".format(line))
+        if len(parts) < 2:
+            raise SyntaxError("Could not split reaction line using : separator [{0}]".format(line))
+
+        d = self.re_direction.search(line)
+        if d is None:
+            raise SyntaxError("Could not find reaction direction [{0}]".format(line))
+
+        direction = d.group(1)
+        sides = parts[1].split(direction)
+        if len(sides) != 2:
+            raise SyntaxError("Reaction doesn't consist of exactly two parts (reactants & products)")
+
+        name = parts[0].strip()
+        reactants = self.__parse_members(sides[0])
+        products = self.__parse_members(sides[1])
+
+        direction = direction.strip()
+        if direction == "->":
+            return Reaction(name, reactants, products, self.fwd)
+        elif direction == "<-":
+            return Reaction(name, products, reactants, self.fwd)
+        else:
+            return Reaction(name, reactants, products, self.rev)
+
+    def parse_constraint(self, line):
+        m = self.re_constraint.match(line)
+        if m is None:
+            raise SyntaxError("Could parse reaction constraint: {0}".format(line))
+
+        reaction_name, lb, ub = m.groups()
+        inf = self.parser.inf
+        lb = float(lb)
+        lb = -Bounds.inf() if lb <= -inf else lb
+        ub = float(ub)
+        ub = Bounds.inf() if ub >= inf else ub
+        bounds = Bounds(lb, ub)
+
+        return Reaction(reaction_name.strip(), ReactionMemberList(), ReactionMemberList(), bounds.direction, bounds)
+
+    def parse_objective_line(self, line):
+        parsed_parts = []
+        for p in self.re_space.split(line):
+            try:
+                p = float(p)
+            except ValueError:
+                p = Reaction(p)
+
+            parsed_parts.append(p)
+
+        if len(parsed_parts) == 1:
+            return MathExpression(None, [parsed_parts[0]])
+        else:
+            return MathExpression(Operation.multiplication(), parsed_parts)
+
+
+def _engine_class(name):
+    if name == RegexEngine.name:
+        return RegexEngine
+    if name == ScannerEngine.name:
+        return ScannerEngine
+    if name == "peg":
+        from bioopt_parser2 import PegEngine
+        return PegEngine
+    return None
+
+
+def _create_engine(engine, parser):
+    if isinstance(engine, BiooptParserEngine):
+        return engine
+    if isinstance(engine, type) and issubclass(engine, BiooptParserEngine):
+        return engine(parser)
+
+    engine_class = _engine_class(engine)
+    if engine_class is None:
+        raise ValueError("Unknown parser engine '{0}'. Available engines: {1}".format(engine, ", ".join(BiooptParser.engines)))
+
+    return engine_class(parser)
+
+
+class _ParseSnapshot(object):
+    """
+    Parsed lines of a model created by incremental parse. Lines are reused by content, so that moved lines don't have to
+    be parsed again. Objective sections are small and their expressions are modified while model is assembled, so they
+    are always parsed again.
+    """
+    __registry = {}
+    types = ("reactions", "constraints", "external")
+
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.current = dict((t, {}) for t in _ParseSnapshot.types)
+        self.reused = []
+
+    @staticmethod
+    def resume(model):
+        """
+        Create snapshot for parsing new version of a model. Lines of model are available for reuse.
+        """
+        entry = _ParseSnapshot.__registry.pop(id(model), None) if model is not None else None
+        if entry is None or entry[0]() is not model:
+            return _ParseSnapshot()
+
+        return _ParseSnapshot(entry[1])
+
+    def take(self, type, line):
+        entries = self.previous.get(type, {}).get(line)
+        if not entries:
+            return None
+
+        entry = entries.pop()
+        if type == "reactions":
+            self.reused.append(entry[0])
+
+        return entry
+
+    def add(self, type, line, result, messages):
+        if type in self.current:
+            self.current[type].setdefault(line, []).append((result, messages))
+
+    def reset_reused(self):
+        """
+        Bring reused reactions to the state right after parsing, constraints and external metabolites are applied again
+        """
+        for r in self.reused:
+            r.bounds_reset()
+            for m in itertools.chain(r.reactants, r.products):
+                m.metabolite.boundary = False
+                m.metabolite.order_boundary = 0
+
+    def register(self, model):
+        # Entries are kept while model is alive
+        key = id(model)
+        registry = _ParseSnapshot.__registry
+
+        def forget(ref):
+            if key in registry and registry[key][0] is ref:
+                del registry[key]
+
+        registry[key] = (weakref.ref(model, forget), self.current)
+
+
 class BiooptParser(object):
-    def __init__(self, inf=1000):
+    """
+    BioOpt format parser
+
+    :param inf: Bounds with absolute value larger or equal to this number are considered infinite
+    :param engine: Line parsing backend: **"regex"** (default), **"scanner"** or **"peg"** (requires pypeg2). All
+            engines produce identical models, use benchmarks/parser_engines.py to select the fastest one. Custom
+            engine is a :class:`BiooptParserEngine` subclass or its instance.
+    :rtype: :class:`BiooptParser`
+    """
+    engines = ["regex", "scanner", "peg"]
+
+    def __init__(self, inf=1000, engine="regex"):
         # TODO: replace number with float() for performance reasons
         re_number_str = r"(?:[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)|(?:[-+]?(?:[0-9]*\.[0-9]+|[0-9]+))"
         re_bounds_str = "\[\s*(" + re_number_str + r")\s*,\s*(" + re_number_str + r")\s*\]"
@@ -14,13 +467,55 @@ class BiooptParser(object):
         self.re_constraint = r"(.*)\s*" + re_bounds_str
         self.re_member = re.compile(r"(\(?(" + re_number_str + r") *\)? +)?(.*)")
         self.inf = inf
+        self.engine = _create_engine(engine, self)
 
-    def parse_file(self, path):
+    def parse_file(self, path, diagnostics=None):
         """
+        Parse model from file. Lines are read and parsed one by one, so the whole file is never held in memory.
+        Files compressed with gzip, bzip2 or xz are decompressed on the fly.
+
+        :param path: File path or file object opened in binary mode
+        :param diagnostics: :class:`BiooptParseDiagnostics` collecting parse problems. By default problems are issued
+                as :class:`BiooptParseWarning` and lines which could not be parsed raise an exception.
         :rtype: Model
         """
-        f = open(path, "r")
-        return self.__parse(f.read(), filename=path)
+        filename = path if isinstance(path, basestring) else getattr(path, "name", None)
+        return self.__parse(iter_lines(path), filename=filename, diagnostics=diagnostics)
+
+    def parse_files(self, paths, workers=None, strict=False, frozen=False):
+        """
+        Parse many files concurrently in a pool of worker processes. Problems in one file don't affect other files:
+        lines which could not be parsed are skipped and reported in diagnostics (see :class:`BiooptParseDiagnostics`)
+        and errors which stop parsing of a file are reported in :attr:`BiooptParseResult.error`.
+
+        :param paths: List of file paths
+        :param workers: Number of worker processes (default: number of CPUs). With one worker files are parsed in the
+                current process.
+        :param strict: Stop parsing a file on the first problem (see :class:`BiooptParseDiagnostics`)
+        :param frozen: Return compact frozen model images which are unpacked on the first access to
+                :attr:`BiooptParseResult.model`. Frozen images are cheaper to pass between processes.
+        :rtype: list of :class:`BiooptParseResult` in the order of input paths
+        """
+        paths = list(paths)
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+
+        # Built-in engines are passed by name, custom engines are created from their class (which must be defined at
+        # module level to be sent to workers)
+        engine = self.engine.name
+        if _engine_class(engine) is not type(self.engine):
+            engine = type(self.engine)
+
+        tasks = [(self.inf, engine, path, strict, frozen) for path in paths]
+        if workers <= 1 or len(paths) <= 1:
+            return [_parse_file_worker(t) for t in tasks]
+
+        pool = multiprocessing.Pool(min(workers, len(paths)))
+        try:
+            return pool.map(_parse_file_worker, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
 
     def parse_reactions_section(self, section_text):
         """
@@ -28,11 +523,12 @@ class BiooptParser(object):
         """
         return list(r for r, i in self.__parse_reactions_section(section_text))
 
-    def __parse_reactions_section(self, section_text, filename=None, section_start=0, strip_comments=True):
+    def __parse_reactions_section(self, section_text, filename=None, section_start=0, strip_comments=True, section_name=None, diagnostics=None, raise_errors=True):
         if not isinstance(section_text, str):
             raise TypeError("Reactions section text is not of type string")
 
-        return self.__parse_section(section_text, lambda x: self.parse_reaction(x, strip_comments=strip_comments), filename=filename, section_start=section_start, strip_comments=strip_comments)
+        return self.__parse_section(section_text, lambda x: self.parse_reaction(x, strip_comments=strip_comments), filename=filename, section_start=section_start, strip_comments=strip_comments,
+                                    section_name=section_name, diagnostics=diagnostics, raise_errors=raise_errors)
 
     def parse_reaction_member(self, member_str):
         """
@@ -167,11 +663,12 @@ class BiooptParser(object):
         """
         return list(c for c, i in self.__parse_constraints_section(section_text))
 
-    def __parse_constraints_section(self, section_text, filename=None, section_start=0, strip_comments=True):
+    def __parse_constraints_section(self, section_text, filename=None, section_start=0, strip_comments=True, section_name=None, diagnostics=None, raise_errors=True):
         if not isinstance(section_text, str):
             raise TypeError("External metabolites section text is not of type string")
 
-        return self.__parse_section(section_text, self.parse_constraint, filename=filename, section_start=section_start, strip_comments=strip_comments)
+        return self.__parse_section(section_text, self.parse_constraint, filename=filename, section_start=section_start, strip_comments=strip_comments,
+                                    section_name=section_name, diagnostics=diagnostics, raise_errors=raise_errors)
 
     def parse_objective_section_line(self, objective_line):
         """
@@ -201,19 +698,28 @@ class BiooptParser(object):
         """
         return self.__parse_objective_section(section_text)
 
-    def __parse_objective_section(self, section_text, filename=None, section_start=0, reactions=None, section_name="-DESIGN OBJECTIVE/-OBJECTIVE", reactions_section_name="-REACTIONS", strip_comments=True):
+    def __parse_objective_section(self, section_text, filename=None, section_start=0, reactions=None, section_name="-DESIGN OBJECTIVE/-OBJECTIVE", reactions_section_name="-REACTIONS", strip_comments=True, diagnostics=None, raise_errors=True):
         if not isinstance(section_text, str):
             raise TypeError("Objective section text is not of type string")
 
-        add_operands = list(self.__parse_section(section_text, self.parse_objective_section_line, filename=filename, section_start=section_start, strip_comments=strip_comments))
+        if diagnostics is None:
+            diagnostics = BiooptParseDiagnostics(warn=True)
+
+        add_operands = self.__parse_section(section_text, self.parse_objective_section_line, filename=filename, section_start=section_start, strip_comments=strip_comments,
+                                            section_name=section_name, diagnostics=diagnostics, raise_errors=raise_errors)
+        add_operands = [(e, section_start+i+1) for e, i in add_operands]
+
+        return self.__build_objective(add_operands, filename=filename, reactions=reactions, section_name=section_name,
+                                      reactions_section_name=reactions_section_name, diagnostics=diagnostics)
 
+    def __build_objective(self, add_operands, filename=None, reactions=None, section_name="-DESIGN OBJECTIVE/-OBJECTIVE", reactions_section_name="-REACTIONS", diagnostics=None):
         if not reactions is None and len(reactions) > 0 and len(add_operands) > 0:
-            line_reactions = ((i, r) for expression, i in add_operands for r in expression.find_variables() if isinstance(r, Reaction))
-            for i, r in line_reactions:
+            line_reactions = ((lineno, r) for expression, lineno in add_operands for r in expression.find_variables() if isinstance(r, Reaction))
+            for lineno, r in line_reactions:
                 if r.name not in reactions:
-                    warnings.warn_explicit(
+                    diagnostics.warning(
                         "Reaction '{0}' from '{1}' section is not present in '{2}' section".format(r.name, section_name, reactions_section_name),
-                        BiooptParseWarning, filename=filename, lineno=section_start+i+1)
+                        section=section_name, line=lineno, filename=filename)
 
         if len(add_operands) == 1:
             return add_operands[0][0]
@@ -227,11 +733,12 @@ class BiooptParser(object):
         """
         return list(e for e, i in self.__parse_external_metabolites_section(section_text))
 
-    def __parse_external_metabolites_section(self, section_text, filename=None, section_start=0, strip_comments=True):
+    def __parse_external_metabolites_section(self, section_text, filename=None, section_start=0, strip_comments=True, section_name=None, diagnostics=None, raise_errors=True):
         if not isinstance(section_text, str):
             raise TypeError("External metabolites section text is not of type string")
 
-        return self.__parse_section(section_text, Metabolite, filename=filename, section_start=section_start, strip_comments=strip_comments)
+        return self.__parse_section(section_text, Metabolite, filename=filename, section_start=section_start, strip_comments=strip_comments,
+                                    section_name=section_name, diagnostics=diagnostics, raise_errors=raise_errors)
 
     def find_sections(self, text):
         s = re.compile(r"^-[\w ]+$", re.MULTILINE)
@@ -248,117 +755,231 @@ class BiooptParser(object):
 
         return sections2
 
-    def __parse_section(self, section_text, method, filename=None, section_start=0, strip_comments=True):
+    def __parse_section(self, section_text, method, filename=None, section_start=0, strip_comments=True, section_name=None, diagnostics=None, raise_errors=True):
         nl = re.compile("\n\r|\r\n|\n")
-        lines = nl.split(section_text)
-        comment = False
-        for i, line in enumerate(lines):
-            if strip_comments:
-                line, multiline_comment = self.strip_comments(line, comment)
-            line = line.strip()
-
-            # TODO: Return None to have errors with line information anntached
-            if not len(line):
-                continue
+        lines = enumerate(nl.split(section_text))
 
-            saved_warnings = []
-            with warnings.catch_warnings(record=True) as ws:
-                warnings.simplefilter("always")
-                result = method(line)
+        return self.__parse_lines(lines, method, filename=filename, section_start=section_start, strip_comments=strip_comments,
+                                  section_name=section_name, diagnostics=diagnostics, raise_errors=raise_errors)
 
-                for w in ws:
-                    w_outer = warnings.WarningMessage(message=w.message, category=BiooptParseWarning, filename=filename, lineno=section_start+i+1, line=line)
-                    saved_warnings.append(w_outer)
+    def __parse_lines(self, lines, method, filename=None, section_start=0, strip_comments=True, section_name=None, diagnostics=None, raise_errors=True, snapshot=None, section_type=None):
+        if diagnostics is None:
+            diagnostics = BiooptParseDiagnostics(warn=True)
 
-            for w in saved_warnings:
-                warnings.warn_explicit(message=w.message, category=w.category, filename=w.filename, lineno=w.lineno)
+        comment = False
+        results = []
+        problems = []
+
+        # Warnings raised by model classes are recorded once per section and attributed to lines by their position in
+        # the record. Problems are reported after warnings filters are restored, so that they can be re-issued.
+        with warnings.catch_warnings(record=True) as ws:
+            warnings.simplefilter("always")
+            for i, line in lines:
+                if strip_comments:
+                    line, comment = self.strip_comments(line, comment)
+                line = line.strip()
+
+                if not len(line):
+                    continue
+
+                cached = snapshot.take(section_type, line) if snapshot else None
+                if cached:
+                    result, messages = cached
+                else:
+                    ws_start = len(ws)
+                    try:
+                        result = method(line)
+                    except Exception, e:
+                        if raise_errors:
+                            raise
+                        problems.append((BiooptParseDiagnostics.ERROR, e, i))
+                        if diagnostics.strict:
+                            break
+                        continue
+
+                    messages = [w.message for w in ws[ws_start:]]
+
+                if snapshot:
+                    snapshot.add(section_type, line, result, messages)
+
+                for message in messages:
+                    problems.append((BiooptParseDiagnostics.WARNING, message, i))
+
+                results.append((result, i))
+                if problems and diagnostics.strict:
+                    break
+
+        for severity, message, i in problems:
+            diagnostics.report(severity, message, section=section_name, line=section_start+i+1, filename=filename)
+
+        return results
+
+    def __strip_lines(self, lines):
+        comment = False
+        for lineno, line in enumerate(lines, 1):
+            line = line.rstrip("\r\n")
+            if comment or "#" in line or "%" in line:
+                line, comment = self.strip_comments(line, comment)
+
+            yield lineno, line
+
+    @staticmethod
+    def __section_type(name):
+        if re.search(r"reac", name, re.I):
+            return "reactions"
+        if re.search(r"cons", name, re.I):
+            return "constraints"
+        if re.search(r"ext", name, re.I):
+            return "external"
+        if re.search(r"obj", name, re.I):
+            return "design_objective" if re.search("des", name, re.I) else "objective"
+
+        return None
+
+    def parse(self, text, diagnostics=None):
+        """
+        :param diagnostics: :class:`BiooptParseDiagnostics` collecting parse problems. By default problems are issued
+                as :class:`BiooptParseWarning` and lines which could not be parsed raise an exception.
+        :rtype: Model
+        """
+        return self.__parse(text.splitlines(), diagnostics=diagnostics)
 
-            yield result, i
+    def parse_incremental(self, previous, text, diagnostics=None):
+        """
+        Parse edited model text reusing unchanged parts of previously parsed model. Only reactions, constraints and
+        external metabolites whose lines were changed (added, edited) are parsed again, lines which were only moved are
+        reused. Resulting model is identical to the model created by :meth:`parse`.
 
-    def __find_section(self, text, sections, fun):
-        for name in sections.keys():
-            if fun(name):
-                start, end, line = sections[name]
-                return name, text[start:end], line
+        Reactions of previous model are reused by the new model, so previous model should not be used after this call.
+        Model which was not created by an incremental parse (or None) is parsed from scratch.
 
-        return None, None, None
+        :param previous: :class:`Model` returned by previous call of :meth:`parse_incremental` or
+                :meth:`parse_file_incremental`
+        :param text: Model text
+        :param diagnostics: :class:`BiooptParseDiagnostics` collecting parse problems (see :meth:`parse`)
+        :rtype: Model
+        """
+        return self.__parse(text.splitlines(), diagnostics=diagnostics, snapshot=_ParseSnapshot.resume(previous))
 
-    def parse(self, text):
+    def parse_file_incremental(self, previous, path, diagnostics=None):
         """
+        Parse edited model file reusing unchanged parts of previously parsed model (see :meth:`parse_incremental`)
+
+        :param previous: :class:`Model` returned by previous incremental parse or None
+        :param path: File path or file object opened in binary mode
+        :param diagnostics: :class:`BiooptParseDiagnostics` collecting parse problems (see :meth:`parse_file`)
         :rtype: Model
         """
-        return self.__parse(text)
+        filename = path if isinstance(path, basestring) else getattr(path, "name", None)
+        return self.__parse(iter_lines(path), filename=filename, diagnostics=diagnostics, snapshot=_ParseSnapshot.resume(previous))
+
+    def __parse(self, lines, filename=None, diagnostics=None, snapshot=None):
+        raise_errors = diagnostics is None
+        if diagnostics is None:
+            diagnostics = BiooptParseDiagnostics(warn=True)
+
+        engine = self.engine
+        engine.reset()
+        methods = {
+            "reactions": engine.parse_reaction,
+            "constraints": engine.parse_constraint,
+            "external": engine.parse_external_metabolite,
+            "objective": engine.parse_objective_line,
+            "design_objective": engine.parse_objective_line,
+        }
+
+        # Lines are consumed section by section, only parsed objects are kept in memory
+        re_section = re.compile(r"^-[\w ]+$")
+        names, items = {}, dict((t, []) for t in methods)
+        header = [None, 0]
+
+        def section_key(item):
+            lineno, line = item
+            if re_section.match(line):
+                header[:] = [line.strip(), lineno]
+            return header[1]
+
+        for section_start, section_lines in itertools.groupby(self.__strip_lines(lines), section_key):
+            name = header[0]
+            type = self.__section_type(name) if name else None
+            if type is None:
+                continue
 
-    def __parse(self, text, filename=None):
-        text = text.replace("\r\n", "\n")
-        text = text.replace("\r", "\n")
+            names.setdefault(type, name)
+            section_lines = ((lineno-section_start-1, line) for lineno, line in section_lines if lineno != section_start)
+            results = self.__parse_lines(section_lines, methods[type], filename=filename, section_start=section_start, strip_comments=False,
+                                         section_name=name, diagnostics=diagnostics, raise_errors=raise_errors, snapshot=snapshot, section_type=type)
+            items[type].extend((r, i, section_start+i+1) for r, i in results)
 
-        re_long = re.compile("%.*?%", re.DOTALL | re.MULTILINE)
-        text = re_long.sub("\n", text)
+        if snapshot:
+            snapshot.reset_reused()
 
-        re_short = re.compile("#.*?\n")
-        text = re_short.sub("\n", text)
+        model = self.__build_model(names, items, filename=filename, diagnostics=diagnostics)
+        if snapshot:
+            snapshot.register(model)
+
+        return model
 
-        sections = self.find_sections(text)
+    def __build_model(self, names, items, filename=None, diagnostics=None):
+        react_name = names.get("reactions")
+        const_name = names.get("constraints")
+        ext_m_name = names.get("external")
+        obj_name = names.get("objective")
+        dobj_name = names.get("design_objective")
 
         model = Model()
-        react_name, react_text, react_line = self.__find_section(text, sections, lambda x: re.search(r"reac", x, re.I))
-        const_name, const_text, const_line = self.__find_section(text, sections, lambda x: re.search(r"cons", x, re.I))
-        ext_m_name, ext_m_text, ext_m_line = self.__find_section(text, sections, lambda x: re.search(r"ext", x, re.I))
-        obj_name, obj_text, obj_line       = self.__find_section(text, sections, lambda x: re.search(r"obj", x, re.I) and not re.search("des", x, re.I))
-        dobj_name, dobj_text, line         = self.__find_section(text, sections, lambda x: re.search(r"obj", x, re.I) and re.search("des", x, re.I))
-
-        if react_text:
-            tmp = self.__parse_reactions_section(react_text, filename=filename, section_start=react_line, strip_comments=False)
-            model.reactions = list(r for r, i in tmp)
+        if react_name:
+            model.reactions = list(r for r, i, lineno in items["reactions"])
             model.unify_metabolite_references()
         else:
-            warnings.warn("Could not find '-REACTIONS' section", BiooptParseWarning)
+            diagnostics.warning("Could not find '-REACTIONS' section", filename=filename)
 
         reactions = dict()
         if model.reactions:
             reactions = dict((r.name, r) for r in model.reactions)
 
-        if const_text:
-            for c, i in self.__parse_constraints_section(const_text, filename=filename, section_start=const_line, strip_comments=False):
+        if const_name:
+            for c, i, lineno in items["constraints"]:
                 if c.name in reactions and c.bounds.lb < 0 and reactions[c.name].direction != Direction.reversible():
-                    warnings.warn_explicit(
+                    diagnostics.warning(
                         "Reaction '{0}' from '{1}' has effective bounds not compatible with reaction direction in '{2}' section ({3} : {4})".format(c.name, const_name, react_name, reactions[c.name].direction, c.bounds),
-                        BiooptParseWarning, filename=filename, lineno=const_line+i+1)
+                        section=const_name, line=lineno, filename=filename)
 
                 if c.name in reactions:
                     reactions[c.name].bounds = c.bounds
-                elif react_text:
-                    warnings.warn_explicit(
+                elif react_name:
+                    diagnostics.warning(
                         "Reaction '{0}' from '{1}' section is not present in '{2}' section".format(c.name, const_name, react_name),
-                        BiooptParseWarning, filename=filename, lineno=const_line+i+1)
+                        section=const_name, line=lineno, filename=filename)
         else:
-            warnings.warn("Could not find '-CONSTRAINS' section", BiooptParseWarning)
+            diagnostics.warning("Could not find '-CONSTRAINS' section", filename=filename)
 
-        if ext_m_text:
+        if ext_m_name:
             metabolites = dict((m.name, m) for m in model.find_metabolites())
-            for m, i in self.__parse_external_metabolites_section(ext_m_text, filename=filename, section_start=ext_m_line, strip_comments=False):
+            for m, i, lineno in items["external"]:
                 if m.name in metabolites:
                     metabolites[m.name].boundary = True
                     metabolites[m.name].order_boundary = i
-                elif react_text:
-                    warnings.warn_explicit(
+                elif react_name:
+                    diagnostics.warning(
                         "Metabolite '{0}' from '{1}' section is not present in any reaction from '{2}' section".format(m.name, ext_m_name, react_name),
-                        BiooptParseWarning, filename=filename, lineno=ext_m_line+i+1)
+                        section=ext_m_name, line=lineno, filename=filename)
         else:
-            warnings.warn("Could not find '-EXTERNAL METABOLITES' section", BiooptParseWarning)
+            diagnostics.warning("Could not find '-EXTERNAL METABOLITES' section", filename=filename)
 
-        if obj_text:
-            objective = self.__parse_objective_section(obj_text, section_name=obj_name, reactions_section_name=react_name, filename=filename, section_start=obj_line, reactions=reactions, strip_comments=False)
-            model.objective = objective
+        if obj_name:
+            add_operands = [(e, lineno) for e, i, lineno in items["objective"]]
+            model.objective = self.__build_objective(add_operands, section_name=obj_name, reactions_section_name=react_name, filename=filename,
+                                                     reactions=reactions, diagnostics=diagnostics)
         else:
-            warnings.warn("Could not find '-OBJECTIVE' section", BiooptParseWarning)
+            diagnostics.warning("Could not find '-OBJECTIVE' section", filename=filename)
 
-        if dobj_text:
-            design_objective = self.__parse_objective_section(dobj_text, section_name=dobj_name, filename=filename, section_start=line, reactions=reactions, strip_comments=False)
-            model.design_objective = design_objective
+        if dobj_name:
+            add_operands = [(e, lineno) for e, i, lineno in items["design_objective"]]
+            model.design_objective = self.__build_objective(add_operands, section_name=dobj_name, filename=filename,
+                                                            reactions=reactions, diagnostics=diagnostics)
         else:
-            warnings.warn("Could not find '-DESIGN OBJECTIVE' section", BiooptParseWarning)
+            diagnostics.warning("Could not find '-DESIGN OBJECTIVE' section", filename=filename)
 
         model.unify_reaction_references()
 
@@ -3,12 +3,15 @@ import pypeg2 as p
 from pypeg2 import Whitespace as ws
 from pypeg2 import optional as opt
 from pypeg2 import attr
+from bioopt_parser import BiooptParserEngine
+import model
 import re
 
 re_comment_short = re.compile(r"\#.*")
 re_comment_long = re.compile(r"(?m)/%.*?%/")
 re_capital = re.compile(r"(?m)[a-z]")
 re_number_str = r"(?:[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)|(?:[-+]?(?:[0-9]*\.[0-9]+|[0-9]+))"
+re_number = re.compile(re_number_str)
 
 class BiooptWhitespace(p.Symbol):
     regex = re.compile("[ \t]+")
@@ -17,11 +20,11 @@ ows = p.omit(opt(BiooptWhitespace))
 nl = p.omit(["\r", "\n", "\r\n"])
 
 
-class Plus(p.Keyword):
-    regex = re.compile(r"[ \t]*\+[ \t]*")
+class Plus(p.Symbol):
+    regex = re.compile(r"[ \t]+\+[ \t]+")
 
-class Direction(p.Keyword):
-    regex = re.compile(r"<?->")
+class Direction(p.Symbol):
+    regex = re.compile(r"<->|<-|->")
 
 class Restline(p.Symbol):
     regex = re.compile(r".*?(?=(\n|\r|$))")
@@ -32,22 +35,26 @@ class ReactionSeparator(p.Symbol):
 
 
 class Metabolite(p.Symbol):
-    regex = re.compile(r".+?(?=[ \t]*(\+|->|<->|\n|\r|$))")
+    regex = re.compile(r".+?(?=[ \t]+\+[ \t]|[ \t]*(<->|<-|->)|[ \t]*(\n|\r|$))")
 
 
 class Number(p.Symbol):
     regex = re.compile(re_number_str)
 
 
+class Coefficient(p.Symbol):
+    regex = re.compile(r"\(?(?:{0}) *\)?(?=[ \t])".format(re_number_str))
+
+
 class ReactionMember(p.List):
-    grammar = opt(attr("coefficient", Number), ws), attr("metabolite", Metabolite), ows
+    grammar = opt(attr("coefficient", Coefficient), ws), attr("metabolite", Metabolite)
 
     def __repr__(self):
         return "('{coef}', '{met}')".format(coef=self.__dict__.get("coefficient", 1), met=self.metabolite)
 
 
 class ReactionMemberList(p.List):
-    grammar = opt(ReactionMember), p.maybe_some(p.omit(Plus), ReactionMember)
+    grammar = ReactionMember, p.maybe_some(p.omit(Plus), ReactionMember)
 
     def __repr__(self):
         if len(self) > 0:
@@ -79,8 +86,11 @@ class ConstraintBoundaries(p.List):
     def __repr__(self):
         return "[{0}, {1}]".format(self.lb, self.ub)
 
+class ConstraintName(p.Symbol):
+    regex = re.compile(r".*(?=\[[ \t]*(?:{0})[ \t]*,[ \t]*(?:{0})[ \t]*\])".format(re_number_str))
+
 class Constraint(p.List):
-    grammar = attr("reaction", ReactionName), ows, attr("boundaries", ConstraintBoundaries)
+    grammar = attr("reaction", ConstraintName), ows, attr("boundaries", ConstraintBoundaries), p.omit(Restline)
 
     def __repr__(self):
         return "{0} {1}".format(self.reaction, self.boundaries)
@@ -104,15 +114,14 @@ class ExternalSection(Section):
     grammar = "-", p.attr("name", Restline), nl, attr("items", p.some([nl, Metabolite]))
 
 
-class ObjectiveName(p.Symbol):
-    regex = re.compile(".*?(?=[ \t]+{0}[ \t]+{1})".format(re_number_str, re_number_str))
+class ObjectiveToken(p.Symbol):
+    regex = re.compile(r"[^ \t\r\n]+")
 
 class Objective(p.List):
-    grammar = p.attr("reaction", ObjectiveName), p.some(ws), \
-              p.attr("coef1", Number), p.some(ws), p.attr("coef2", Number)
+    grammar = ObjectiveToken, p.maybe_some(p.omit(BiooptWhitespace), ObjectiveToken)
 
     def __repr__(self):
-        return "{0} ('{1}', '{2}')".format(self.reaction, self.coef1, self.coef2)
+        return " ".join(self)
 
 class ObjectiveSection(Section):
     grammar = "-", p.attr("name", Restline), nl, attr("items", p.some([nl, Objective]))
@@ -124,39 +133,67 @@ class Bioopt(p.List):
 
     def __repr__(self):
         return "\n\n".join(repr(s) for s in self.__dict__.get("sections", []))
-# Test
-
-f = p.parse("""-REACTIONS 1
-R1: A + B -> C
-R2: F -> G
-R3: A -> B
-
-
--REACTIONS 2
-R4: A -> B
-R5: D -> F
-R6: D -> F
-
--CONSTRAINTS
-U214_ [1, 1]
-ZYMSTxtI [0, 0]
-XANxtI [0, 0]
-URIxtI [0, 0]
-UREAxtI [0, 0]
-
--EXTERNAL METABOLITES
-acetaldehyde[b]
-acetate[b]
-adenosine[b]
-adenine[b]
-2-oxoglutarate[b]
-
--OBJ
-VGRO 1 1
-EEEEEEEE 1 1
-""", Bioopt, whitespace=None)
-print(f)
-
-
 
 
+class PegEngine(BiooptParserEngine):
+    """
+    :class:`BiooptParser` engine based on pyPEG grammar. Requires *pypeg2* package.
+    """
+    name = "peg"
+
+    def __parse(self, line, thing):
+        return p.parse(line, thing, whitespace=None)
+
+    def __members(self, members):
+        ret = model.ReactionMemberList()
+        for m in members:
+            coef = m.__dict__.get("coefficient")
+            coef = float(re_number.search(coef).group(0)) if coef else 1
+            ret.append(model.ReactionMember(model.Metabolite(str(m.metabolite)), coef))
+
+        return ret
+
+    def parse_reaction(self, line):
+        parts = line.count(":") + 1
+        if parts > 2:
+            raise SyntaxError(": separator split reaction line into more than two parts [{0}]".format(line))
+        if parts < 2:
+            raise SyntaxError("Could not split reaction line using : separator [{0}]".format(line))
+
+        r = self.__parse(line, Reaction)
+        name = str(r.name).strip()
+        reactants = self.__members(r.lhs)
+        products = self.__members(r.rhs)
+
+        if r.direction == "<-":
+            return model.Reaction(name, products, reactants, model.Direction.forward())
+        elif r.direction == "->":
+            return model.Reaction(name, reactants, products, model.Direction.forward())
+        else:
+            return model.Reaction(name, reactants, products, model.Direction.reversible())
+
+    def parse_constraint(self, line):
+        c = self.__parse(line, Constraint)
+        inf = self.parser.inf
+        lb = float(c.boundaries.lb)
+        lb = -model.Bounds.inf() if lb <= -inf else lb
+        ub = float(c.boundaries.ub)
+        ub = model.Bounds.inf() if ub >= inf else ub
+        bounds = model.Bounds(lb, ub)
+
+        return model.Reaction(str(c.reaction).strip(), model.ReactionMemberList(), model.ReactionMemberList(), bounds.direction, bounds)
+
+    def parse_objective_line(self, line):
+        parsed_parts = []
+        for t in self.__parse(line, Objective):
+            try:
+                t = float(t)
+            except ValueError:
+                t = model.Reaction(str(t))
+
+            parsed_parts.append(t)
+
+        if len(parsed_parts) == 1:
+            return model.MathExpression(None, [parsed_parts[0]])
+        else:
+            return model.MathExpression(model.Operation.multiplication(), parsed_parts)
@@ -0,0 +1,443 @@
+from model import *
+from model_matrix import ModelMatrix
+import collections
+import multiprocessing
+import numpy as np
+import re
+import time
+
+
+def _block_pattern(block):
+    """
+    Combine block patterns into one regular expression, so that every name is searched once
+    """
+    block = [block] if not isinstance(block, list) else block
+    if not block:
+        return None
+
+    patterns = [re.compile(b) for b in block]
+    if len(patterns) == 1:
+        return patterns[0]
+
+    # Groups of separate patterns can't be combined (back references would be renumbered)
+    if any(p.groups for p in patterns):
+        class AnyPattern(object):
+            def search(self, name):
+                return any(p.search(name) for p in patterns)
+        return AnyPattern()
+
+    return re.compile("|".join("(?:{0})".format(p.pattern) for p in patterns))
+
+
+def _keep_rows(names, pattern):
+    if pattern is None:
+        return np.ones(len(names), dtype=np.bool_)
+
+    search = pattern.search
+    return np.fromiter((not search(n) for n in names), dtype=np.bool_, count=len(names))
+
+
+def _select_rows(indptr, keep, *columns):
+    """
+    Select rows of CSR arrays. Returns new indptr and selected entries of every column.
+    """
+    lengths = np.diff(indptr)
+    entries = np.repeat(keep, lengths)
+    new_indptr = np.zeros(np.count_nonzero(keep) + 1, dtype=np.int64)
+    np.cumsum(lengths[keep], out=new_indptr[1:])
+
+    return (new_indptr,) + tuple(c[entries] for c in columns)
+
+
+class _MemberBlock(object):
+    """
+    Reactions of one community member (member reactions followed by exchange reactions with shared environment).
+    Metabolite indices are local to the block, references to environment metabolites are stored as negative numbers
+    ``-(slot+1)`` where slot is position in :attr:`env_names`.
+    """
+
+    def __init__(self, matrix, prefix, pattern=None):
+        boundary = np.flatnonzero(matrix.metabolite_boundary)
+        env_names = [matrix.metabolite_names[j] for j in boundary]
+        nb = len(boundary)
+
+        exchange_names = []
+        for name in env_names:
+            exchange_names.append(intern_name(prefix + "OUT_" + name))
+            exchange_names.append(intern_name(prefix + "IN_" + name))
+
+        # OUT_: member metabolite -> environment, IN_: environment -> member metabolite
+        env_refs = -(np.arange(nb, dtype=np.int64) + 1)
+        exchange_indices = np.column_stack([boundary, env_refs, env_refs, boundary]).ravel()
+
+        reaction_names = [intern_name(prefix + name) for name in matrix.reaction_names] + exchange_names
+        keep = _keep_rows(reaction_names, pattern)
+
+        indptr = np.concatenate([matrix.indptr, matrix.indptr[-1] + 2 * np.arange(1, 2*nb + 1, dtype=np.int64)])
+        indices = np.concatenate([np.asarray(matrix.indices, dtype=np.int64), exchange_indices])
+        coefficients = np.concatenate([matrix.coefficients, np.ones(4*nb)])
+        sides = np.concatenate([matrix.sides, np.tile(np.array([ModelMatrix.REACTANT, ModelMatrix.PRODUCT], dtype=np.uint8), 2*nb)])
+
+        self.indptr, self.indices, self.coefficients, self.sides = _select_rows(indptr, keep, indices, coefficients, sides)
+        self.reaction_names = [name for name, k in zip(reaction_names, keep.tolist()) if k]
+        self.directions = np.concatenate([matrix.directions, np.zeros(2*nb, dtype=np.uint8)])[keep]
+        self.lb = np.concatenate([matrix.lb, np.zeros(2*nb)])[keep]
+        self.ub = np.concatenate([matrix.ub, np.repeat(Bounds.inf(), 2*nb)])[keep]
+
+        # Only metabolites used by remaining reactions are kept
+        local = self.indices >= 0
+        used = np.unique(self.indices[local])
+        remap = np.zeros(matrix.n_metabolites, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        self.indices[local] = remap[self.indices[local]]
+
+        self.prefix = prefix
+        self.env_names = env_names
+        self.metabolite_names = [intern_name(prefix + matrix.metabolite_names[j]) for j in used.tolist()]
+        self.metabolite_order = np.asarray(matrix.metabolite_order)[used]
+
+    @property
+    def n_reactions(self):
+        return len(self.directions)
+
+    @property
+    def n_metabolites(self):
+        return len(self.metabolite_names)
+
+
+def _assemble(blocks, env_prefix, pattern=None):
+    """
+    Stack member blocks block-diagonally and add environment metabolites with their exchange reactions (xtO/xtI)
+
+    :rtype: :class:`model_matrix.ModelMatrix`
+    """
+    env = {}
+    env_names = []
+    for b in blocks:
+        for name in b.env_names:
+            if name not in env:
+                env[name] = len(env_names)
+                env_names.append(name)
+
+    n_member_metabolites = sum(b.n_metabolites for b in blocks)
+    n_env = len(env_names)
+
+    reaction_names = []
+    indptr = [np.zeros(1, dtype=np.int64)]
+    indices = []
+    met_offset = 0
+    entry_offset = 0
+    for b in blocks:
+        idx = b.indices.copy()
+        local = idx >= 0
+        idx[local] += met_offset
+        if b.env_names:
+            slots = np.array([env[name] for name in b.env_names], dtype=np.int64)
+            idx[~local] = n_member_metabolites + slots[-idx[~local] - 1]
+
+        reaction_names.extend(b.reaction_names)
+        indices.append(idx)
+        indptr.append(b.indptr[1:] + entry_offset)
+        met_offset += b.n_metabolites
+        entry_offset += len(idx)
+
+    # Environment exchange: ENV_m -> ENV_mxtX (xtO) and ENV_mxtX -> ENV_m (xtI)
+    env_index = n_member_metabolites + np.arange(n_env, dtype=np.int64)
+    ext_index = env_index + n_env
+    xt_names = []
+    for name in env_names:
+        xt_names.append(env_prefix + name + "xtO")
+        xt_names.append(env_prefix + name + "xtI")
+
+    keep = _keep_rows(xt_names, pattern)
+    xt_indptr, xt_indices = _select_rows(2 * np.arange(2*n_env + 1, dtype=np.int64), keep,
+                                         np.column_stack([env_index, ext_index, ext_index, env_index]).ravel())
+    reaction_names.extend(name for name, k in zip(xt_names, keep.tolist()) if k)
+    indices.append(xt_indices)
+    indptr.append(xt_indptr[1:] + entry_offset)
+
+    n_xt = len(xt_indptr) - 1
+    directions = np.concatenate([b.directions for b in blocks] + [np.zeros(n_xt, dtype=np.uint8)])
+    lb = np.concatenate([b.lb for b in blocks] + [np.zeros(n_xt)])
+    ub = np.concatenate([b.ub for b in blocks] + [np.repeat(Bounds.inf(), n_xt)])
+    coefficients = np.concatenate([b.coefficients for b in blocks] + [np.ones(2*n_xt)])
+    sides = np.concatenate([b.sides for b in blocks] + [np.tile(np.array([ModelMatrix.REACTANT, ModelMatrix.PRODUCT], dtype=np.uint8), n_xt)])
+    indices = np.concatenate(indices)
+    indptr = np.concatenate(indptr)
+
+    metabolite_names = [name for b in blocks for name in b.metabolite_names]
+    metabolite_names += [env_prefix + name for name in env_names]
+    metabolite_names += [env_prefix + name + "xtX" for name in env_names]
+    metabolite_boundary = np.zeros(len(metabolite_names), dtype=np.bool_)
+    metabolite_boundary[n_member_metabolites + n_env:] = True
+    metabolite_order = np.concatenate([b.metabolite_order for b in blocks] + [np.zeros(2*n_env)])
+
+    # Environment metabolites of blocked exchange reactions are removed
+    used = np.unique(indices)
+    if len(used) < len(metabolite_names):
+        remap = np.zeros(len(metabolite_names), dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        indices = remap[indices]
+        metabolite_names = [metabolite_names[j] for j in used.tolist()]
+        metabolite_boundary = metabolite_boundary[used]
+        metabolite_order = metabolite_order[used]
+
+    return ModelMatrix(
+        reaction_names=reaction_names,
+        directions=directions,
+        lb=lb,
+        ub=ub,
+        indptr=indptr,
+        indices=indices.astype(np.int32),
+        coefficients=coefficients,
+        sides=sides,
+        metabolite_names=metabolite_names,
+        metabolite_boundary=metabolite_boundary,
+        metabolite_order=metabolite_order)
+
+
+class MemberFileResult(object):
+    """
+    Outcome of preparing one member file with :meth:`Community.add_member_files`
+
+    :param path: Parsed file
+    :param prefix: Prefix assigned to member
+    :param exchanged: Names of metabolites member exchanges with environment
+    :param diagnostics: List of :class:`bioopt_parser.BiooptParseDiagnostic` collected while parsing
+    :param time: Time spent parsing and prefixing member (seconds)
+    :param error: Description of error which stopped preparation (None if member was added)
+    :rtype: :class:`MemberFileResult`
+    """
+
+    def __init__(self, path, prefix, exchanged=None, diagnostics=None, time=0.0, error=None):
+        self.path = path
+        self.prefix = prefix
+        self.exchanged = exchanged if exchanged is not None else []
+        self.diagnostics = diagnostics if diagnostics is not None else []
+        self.time = time
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _member_file_worker(args):
+    path, prefix, block, inf = args
+
+    from bioopt_parser import BiooptParser, BiooptParseDiagnostics
+    diagnostics = BiooptParseDiagnostics()
+    start = time.time()
+    try:
+        model = BiooptParser(inf=inf).parse_file(path, diagnostics=diagnostics)
+        member = _MemberBlock(ModelMatrix.from_model(model), prefix, _block_pattern(block))
+    except Exception, e:
+        return MemberFileResult(path, prefix, diagnostics=diagnostics.diagnostics, time=time.time() - start,
+                                error="{0}: {1}".format(type(e).__name__, e)), None
+
+    return MemberFileResult(path, prefix, member.env_names, diagnostics.diagnostics, time.time() - start), member
+
+
+def commune(models, model_prefix="ML{0:04d}_", env_prefix="ENV_", block=[]):
+    """
+    Build community model arrays (see :meth:`model.Model.commune`). Member matrices are stacked block-diagonally and
+    exchange reactions are generated with array operations, model objects are not created.
+
+    :param models: List of :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+    :param model_prefix: Model prefix added to all reaction and metabolite names of a member
+    :param env_prefix: Prefix of metabolites in shared environment
+    :param block: Regular expression or list of regular expressions. Reactions with matching names (after prefix is
+            added) are left out.
+    :rtype: :class:`model_matrix.ModelMatrix`
+    """
+    pattern = _block_pattern(block)
+    blocks = []
+    for i, m in enumerate(models):
+        matrix = ModelMatrix.from_model(m) if isinstance(m, Model) else m
+        blocks.append(_MemberBlock(matrix, model_prefix.format(i), pattern))
+
+    return _assemble(blocks, env_prefix, pattern)
+
+
+class Community(object):
+    """
+    Community model which can be edited by adding and removing members. Every member is kept as a separate block of
+    reactions (member reactions and their exchange reactions with environment), so adding or removing a member only
+    creates or drops its block. Shared environment metabolites and their xtO/xtI reactions are derived from the
+    current members when community is exported.
+
+    Members keep prefixes assigned when they were added, so after a member is removed the community is equal to
+    :meth:`model.Model.commune` of remaining members only if prefixes are the same.
+
+    :param models: Initial list of :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+    :param model_prefix: Pattern of member prefixes, formatted with a counter of added members
+    :param env_prefix: Prefix of metabolites in shared environment
+    :param block: Regular expression or list of regular expressions. Reactions with matching names (after prefix is
+            added) are left out.
+    :rtype: :class:`Community`
+    """
+
+    def __init__(self, models=[], model_prefix="ML{0:04d}_", env_prefix="ENV_", block=[]):
+        self.model_prefix = model_prefix
+        self.env_prefix = env_prefix
+        self.__block = block
+        self.__pattern = _block_pattern(block)
+        self.__blocks = collections.OrderedDict()
+        self.__counter = 0
+        self.__matrix = None
+
+        for m in models:
+            self.add_member(m)
+
+    @property
+    def members(self):
+        """
+        Prefixes of community members in the order they were added
+
+        :rtype: list of str
+        """
+        return self.__blocks.keys()
+
+    @property
+    def environment(self):
+        """
+        Names of shared environment metabolites (without prefix)
+
+        :rtype: list of str
+        """
+        seen = set()
+        return [n for b in self.__blocks.itervalues() for n in b.env_names if not (n in seen or seen.add(n))]
+
+    def __len__(self):
+        return len(self.__blocks)
+
+    def __contains__(self, prefix):
+        return prefix in self.__blocks
+
+    def add_member(self, model, prefix=None):
+        """
+        Add member to community
+
+        :param model: :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+        :param prefix: Prefix of member reactions and metabolites (default: :attr:`model_prefix` formatted with number
+                of members added so far)
+        :return: Member prefix
+        """
+        if prefix is None:
+            prefix = self.model_prefix.format(self.__counter)
+        if prefix in self.__blocks:
+            raise ValueError("Community already has member with prefix '{0}'".format(prefix))
+
+        matrix = ModelMatrix.from_model(model) if isinstance(model, Model) else model
+        self.__blocks[prefix] = _MemberBlock(matrix, prefix, self.__pattern)
+        self.__counter += 1
+        self.__matrix = None
+
+        return prefix
+
+    def add_member_files(self, paths, inf=1000, workers=None):
+        """
+        Parse bioopt files and add them as members. Files are parsed and turned into member reaction blocks in a pool
+        of worker processes, so only compact arrays are passed back. Every file gets a prefix, also files which failed
+        to parse, so prefixes only depend on position of a file. Lines which could not be parsed are skipped and
+        reported in :attr:`MemberFileResult.diagnostics`.
+
+        :param paths: List of file paths
+        :param inf: Infinity value of parsed models
+        :param workers: Number of worker processes (default: number of CPUs). With one worker files are parsed in the
+                current process.
+        :rtype: list of :class:`MemberFileResult` in the order of input paths
+        """
+        paths = list(paths)
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+
+        tasks = []
+        for i, path in enumerate(paths):
+            prefix = self.model_prefix.format(self.__counter + i)
+            if prefix in self.__blocks:
+                raise ValueError("Community already has member with prefix '{0}'".format(prefix))
+            tasks.append((path, prefix, self.__block, inf))
+
+        if workers <= 1 or len(paths) <= 1:
+            outcomes = [_member_file_worker(t) for t in tasks]
+        else:
+            pool = multiprocessing.Pool(min(workers, len(paths)))
+            try:
+                outcomes = pool.map(_member_file_worker, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+
+        for result, member in outcomes:
+            if member is not None:
+                self.__blocks[result.prefix] = member
+        self.__counter += len(paths)
+        self.__matrix = None
+
+        return [result for result, member in outcomes]
+
+    def exchange_matrix(self):
+        """
+        Boolean matrix of exchanged metabolites. Rows are environment metabolites (see :attr:`environment`), columns
+        are members (see :attr:`members`). Requires *scipy*.
+
+        :rtype: scipy.sparse.csc_matrix
+        """
+        import scipy.sparse
+
+        environment = self.environment
+        index = dict((name, i) for i, name in enumerate(environment))
+        rows = [index[name] for b in self.__blocks.itervalues() for name in b.env_names]
+        columns = [j for j, b in enumerate(self.__blocks.itervalues()) for name in b.env_names]
+
+        return scipy.sparse.csc_matrix((np.ones(len(rows), dtype=np.bool_), (rows, columns)),
+                                       shape=(len(environment), len(self.__blocks)))
+
+    def overlap(self):
+        """
+        Number of metabolites exchanged by both members for every pair of members (members x members). Diagonal holds
+        number of metabolites exchanged by a member. Requires *scipy*.
+
+        :rtype: numpy array
+        """
+        exchange = self.exchange_matrix().astype(np.int32)
+        return (exchange.T * exchange).toarray()
+
+    def remove_member(self, prefix):
+        """
+        Remove member from community. Environment metabolites which are not exchanged by other members are removed
+        together with their xtO/xtI reactions.
+
+        :param prefix: Member prefix returned by :meth:`add_member`
+        """
+        if prefix not in self.__blocks:
+            raise KeyError("Community has no member with prefix '{0}'".format(prefix))
+
+        del self.__blocks[prefix]
+        self.__matrix = None
+
+    def to_matrix(self):
+        """
+        Array view of community model. View is cached until members change.
+
+        :rtype: :class:`model_matrix.ModelMatrix`
+        """
+        if self.__matrix is None:
+            self.__matrix = _assemble(self.__blocks.values(), self.env_prefix, self.__pattern)
+
+        return self.__matrix
+
+    def to_model(self):
+        """
+        :rtype: :class:`model.Model`
+        """
+        return self.to_matrix().to_model()
+
+    def lp_matrix(self, exclude_boundary=True):
+        """
+        Arrays of flux balance linear program of community (see :meth:`model_matrix.ModelMatrix.lp_matrix`)
+
+        :rtype: :class:`model_matrix.LpMatrix`
+        """
+        return self.to_matrix().lp_matrix(exclude_boundary=exclude_boundary)
@@ -0,0 +1,244 @@
+import bz2
+import os
+import zlib
+
+GZIP = "gz"
+BZIP2 = "bz2"
+XZ = "xz"
+
+_magic = [
+    (b"\x1f\x8b", GZIP),
+    (b"BZh", BZIP2),
+    (b"\xfd7zXZ\x00", XZ),
+]
+_magic_length = max(len(m) for m, c in _magic)
+
+_extensions = {
+    ".gz": GZIP,
+    ".gzip": GZIP,
+    ".bz2": BZIP2,
+    ".xz": XZ,
+}
+
+
+def _lzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise ImportError("XZ compression requires 'lzma' module (install 'backports.lzma' on Python 2)")
+
+    return lzma
+
+
+def compression_from_path(path):
+    """
+    Guess compression type from file extension
+
+    :param path: File path
+    :return: :data:`GZIP`, :data:`BZIP2`, :data:`XZ` or None if file is not compressed
+    """
+    if not path:
+        return None
+
+    return _extensions.get(os.path.splitext(path)[1].lower())
+
+
+def compression_from_magic(head):
+    """
+    Detect compression type from the first bytes of a file
+
+    :param head: First bytes of a file
+    :return: :data:`GZIP`, :data:`BZIP2`, :data:`XZ` or None if file is not compressed
+    """
+    for magic, compression in _magic:
+        if head.startswith(magic):
+            return compression
+
+    return None
+
+
+def _decompressor(compression):
+    if compression == GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if compression == BZIP2:
+        return bz2.BZ2Decompressor()
+    if compression == XZ:
+        return _lzma().LZMADecompressor()
+
+    raise ValueError("Unknown compression type: {0}".format(compression))
+
+
+def _compressor(compression, level):
+    if compression == GZIP:
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if compression == BZIP2:
+        return bz2.BZ2Compressor(max(level, 1))
+    if compression == XZ:
+        lzma = _lzma()
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+
+    raise ValueError("Unknown compression type: {0}".format(compression))
+
+
+def _iter_decompressed(chunks, compression):
+    if compression is None:
+        for chunk in chunks:
+            yield chunk
+        return
+
+    d = _decompressor(compression)
+    for chunk in chunks:
+        while chunk:
+            try:
+                data = d.decompress(chunk)
+            except EOFError:
+                # Previous stream has ended, next chunk starts a new one (concatenated archives)
+                d = _decompressor(compression)
+                continue
+
+            if data:
+                yield data
+
+            chunk = d.unused_data
+            if chunk:
+                d = _decompressor(compression)
+
+    if hasattr(d, "flush"):
+        data = d.flush()
+        if data:
+            yield data
+
+
+def _iter_lines(chunks):
+    rest = b""
+    for chunk in chunks:
+        lines = (rest + chunk).splitlines(True)
+        rest = lines.pop() if lines else b""
+
+        # Last line may be incomplete. Line ending with "\r" is kept as well, it may be followed by "\n"
+        if rest.endswith(b"\n"):
+            lines.append(rest)
+            rest = b""
+
+        for line in lines:
+            yield line
+
+    if rest:
+        for line in rest.splitlines(True):
+            yield line
+
+
+def iter_lines(source, compression=None, chunk_size=1 << 16):
+    """
+    Iterate over lines of a (possibly compressed) file. Compressed data is decompressed in chunks while lines are
+    consumed, so the whole file is never held in memory.
+
+    :param source: File path or file object opened in binary mode
+    :param compression: Compression type. By default compression is detected from magic bytes at the start of file.
+    :param chunk_size: Size of chunks read from file
+    :return: Generator of lines (line endings are preserved)
+    """
+    if isinstance(source, basestring):
+        f = open(source, "rb")
+        close = True
+    else:
+        f = source
+        close = False
+
+    try:
+        head = f.read(_magic_length)
+        if compression is None:
+            compression = compression_from_magic(head)
+
+        def chunks():
+            yield head
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+        for line in _iter_lines(_iter_decompressed(chunks(), compression)):
+            yield line
+    finally:
+        if close:
+            f.close()
+
+
+class CompressedWriter(object):
+    """
+    File-like object compressing everything written to it
+
+    :param fileobj: File object opened for writing in binary mode
+    :param compression: Compression type (:data:`GZIP`, :data:`BZIP2`, :data:`XZ`) or None to write data as is
+    :param close_fileobj: Close file object when writer is closed
+    :param level: Compression level
+    :rtype: :class:`CompressedWriter`
+    """
+
+    def __init__(self, fileobj, compression=None, close_fileobj=False, level=6):
+        self.fileobj = fileobj
+        self.compression = compression
+        self.close_fileobj = close_fileobj
+        self.__compressor = _compressor(compression, level) if compression else None
+        self.closed = False
+
+    def write(self, data):
+        if self.__compressor:
+            data = self.__compressor.compress(data)
+
+        if data:
+            self.fileobj.write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        if self.__compressor:
+            self.fileobj.write(self.__compressor.flush())
+
+        if self.close_fileobj:
+            self.fileobj.close()
+        else:
+            self.fileobj.flush()
+
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def open_output(target, compression=None, level=6):
+    """
+    Open (possibly compressed) file for writing.
+
+    :param target: File path or file object opened for writing in binary mode
+    :param compression: Compression type. By default compression is guessed from file extension (file objects are
+            checked by their ``name`` attribute).
+    :param level: Compression level
+    :rtype: :class:`CompressedWriter`
+    """
+    if isinstance(target, basestring):
+        if compression is None:
+            compression = compression_from_path(target)
+
+        return CompressedWriter(open(target, "wb"), compression, close_fileobj=True, level=level)
+
+    if compression is None:
+        name = getattr(target, "name", None)
+        compression = compression_from_path(name) if isinstance(name, basestring) else None
+
+    return CompressedWriter(target, compression, close_fileobj=False, level=level)
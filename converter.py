@@ -358,3 +358,135 @@ class Bioopt2SbmlConverter:
 
         return doc
 
+
+
+class Bioopt2ColumnsConverter:
+    """
+    Bioopt model object to column tables converter. Model is exported as three tables with a stable column order:
+
+    * **reactions** - :attr:`reaction_columns` (direction is ``->`` or ``<->``)
+    * **members** - :attr:`member_columns`, one row per reaction member. Reaction and metabolite are row indices in
+      reactions and metabolites tables, coefficients of reactants are negative.
+    * **metabolites** - :attr:`metabolite_columns`
+
+    Tables are built with array operations from :meth:`model.Model.matrix` view (requires *numpy*).
+
+    :param inf: A number to substitute infinite bounds (default: infinite bounds are kept)
+    :param compartment_pattern: Regular expression pattern describing how to extract compartment information from
+            metabolite name (see :class:`Bioopt2SbmlConverter`). Compartment is empty if name doesn't match pattern.
+    :rtype: :class:`Bioopt2ColumnsConverter`
+    """
+    reaction_columns = ("name", "direction", "lb", "ub", "objective")
+    member_columns = ("reaction", "metabolite", "coefficient")
+    metabolite_columns = ("name", "boundary", "compartment")
+    tables = ("reactions", "members", "metabolites")
+
+    def __init__(self, inf=None, compartment_pattern=r"_(\w+)$"):
+        if inf is None or isinstance(inf, (float, int)):
+            self.inf = inf
+        else:
+            raise ValueError("Infinity value '{0}' is not a number".format(inf))
+
+        if not compartment_pattern:
+            self.compartment_pattern = None
+        elif isinstance(compartment_pattern, str):
+            self.compartment_pattern = re.compile(compartment_pattern)
+        elif hasattr(compartment_pattern, "search"):
+            self.compartment_pattern = compartment_pattern
+        else:
+            raise ValueError("Compartment pattern '{0}' is not regular expression pattern".format(compartment_pattern))
+
+    def __compartment(self, name):
+        m = self.compartment_pattern.search(name) if self.compartment_pattern else None
+        return m.group(1) if m else ""
+
+    def convert(self, bioopt_model):
+        """
+        Convert BioOpt model to column tables
+
+        :param bioopt_model: BioOpt model of type :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+        :return: dictionary of tables, every table is a list of (column name, numpy array) pairs
+        """
+        import numpy as np
+        from model_matrix import ModelMatrix
+
+        matrix = ModelMatrix.from_model(bioopt_model) if isinstance(bioopt_model, Model) else bioopt_model
+
+        lb, ub = matrix.lb, matrix.ub
+        if self.inf is not None:
+            lb = np.clip(lb, -self.inf, None)
+            ub = np.clip(ub, None, self.inf)
+
+        rows = np.repeat(np.arange(matrix.n_reactions, dtype=np.int32), np.diff(matrix.indptr))
+        metabolite_names = list(matrix.metabolite_names)
+
+        return {
+            "reactions": [
+                ("name", np.array(list(matrix.reaction_names), dtype=str)),
+                ("direction", np.where(matrix.directions == ModelMatrix.FORWARD, "->", "<->")),
+                ("lb", np.asarray(lb, dtype=np.float64)),
+                ("ub", np.asarray(ub, dtype=np.float64)),
+                ("objective", matrix.objective_coefficients()),
+            ],
+            "members": [
+                ("reaction", rows),
+                ("metabolite", np.asarray(matrix.indices, dtype=np.int32)),
+                ("coefficient", matrix.signed_coefficients()),
+            ],
+            "metabolites": [
+                ("name", np.array(metabolite_names, dtype=str)),
+                ("boundary", np.asarray(matrix.metabolite_boundary, dtype=np.bool_)),
+                ("compartment", np.array([self.__compartment(n) for n in metabolite_names], dtype=str)),
+            ],
+        }
+
+    def save_npz(self, bioopt_model, path, compressed=False):
+        """
+        Save column tables in numpy ``.npz`` archive. Arrays are named ``<table>.<column>``, i.e. ``reactions.lb``
+
+        :param bioopt_model: BioOpt model of type :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+        :param path: Output file path
+        :param compressed: Compress archive
+        """
+        import numpy as np
+
+        tables = self.convert(bioopt_model)
+        arrays = dict(("{0}.{1}".format(t, c), a) for t in self.tables for c, a in tables[t])
+        (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+    def save_delimited(self, bioopt_model, prefix, delimiter="\t", extension=".tsv", precision=17):
+        """
+        Save column tables in delimited text files ``<prefix>reactions<extension>``, ``<prefix>members<extension>``
+        and ``<prefix>metabolites<extension>``. First line of every file contains column names.
+
+        :param bioopt_model: BioOpt model of type :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+        :param prefix: Output path prefix
+        :param delimiter: Column delimiter
+        :param extension: File extension
+        :param precision: Number of significant digits of floating point columns
+        :return: list of created files
+        """
+        import numpy as np
+
+        paths = []
+        for t, columns in sorted(self.convert(bioopt_model).iteritems(), key=lambda x: self.tables.index(x[0])):
+            text = None
+            for c, a in columns:
+                if a.dtype.kind == "f":
+                    a = np.char.mod("%.{0}g".format(precision), a)
+                elif a.dtype.kind == "b":
+                    a = np.where(a, "1", "0")
+                else:
+                    a = a.astype(str)
+
+                text = a if text is None else np.char.add(np.char.add(text, delimiter), a)
+
+            path = "{0}{1}{2}".format(prefix, t, extension)
+            with open(path, "w") as f:
+                f.write(delimiter.join(c for c, a in columns) + "\n")
+                if len(text):
+                    f.write("\n".join(text.tolist()))
+                    f.write("\n")
+            paths.append(path)
+
+        return paths
@@ -1,7 +1,12 @@
-import cplex
 import model
-from tempfile import NamedTemporaryFile
+import lp_backend
+from lp_backend import inf
+from model_matrix import ModelMatrix
+from copy import deepcopy
+import itertools
+import list_utils
 import random
+import numpy as np
 from itertools import chain
 
 
@@ -9,71 +14,158 @@ dir_fwd = model.Direction.forward()
 dir_rev = model.Direction.reversible()
 
 
-def is_positive(model):
-    obj = model.solution.get_objective_value()
-    return is_optimal(model) and obj > 1e-6
+def is_positive(lp):
+    return is_optimal(lp) and lp.objective_value() > 1e-6
 
 
-def is_nonzero(model):
-    return is_optimal(model) and abs(model.solution.get_objective_value()) > 1e-6
+def is_nonzero(lp):
+    return is_optimal(lp) and abs(lp.objective_value()) > 1e-6
 
 
-def is_optimal(model):
-    status = model.solution.get_status_string()
-    return status == 'optimal'
+def is_optimal(lp):
+    return lp.is_optimal()
 
 
-def copy(model):
-    with NamedTemporaryFile(delete=False) as f:
-        params_path = f.name
+def copy(lp):
+    """
+    Independent copy of linear program created in memory (see :meth:`lp_backend.LpBackend.copy`)
 
-    with NamedTemporaryFile(delete=False) as f:
-        problem_path = f.name
+    :param lp: :class:`lp_backend.LpBackend`
+    :rtype: :class:`lp_backend.LpBackend`
+    """
+    return lp.copy()
 
-    model.parameters.write_file(params_path + ".prm")
-    model.write(problem_path + ".sav")
 
-    model_copy = cplex.Cplex()
-    model_copy.parameters.read_file(params_path)
-    model_copy.read(problem_path + ".sav")
+class FbaBounds:
+    def __init__(self, lb, ub):
+        self.lb = lb
+        self.ub = ub
 
-    return model_copy
 
+class IndexMap(object):
+    """
+    Names of linear program rows or columns. Position of a name in :attr:`names` is its index, dictionary used to find
+    index of a name is created on the first lookup.
 
+    :param names: List of names
+    """
 
-class FbaBounds:
-    def __init__(self, lb, ub):
+    def __init__(self, names):
+        self.names = names
+        self.__index = None
+
+    def __index_dict(self):
+        if self.__index is None:
+            self.__index = dict(itertools.izip(self.names, xrange(len(self.names))))
+        return self.__index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.__index_dict()
+
+    def __getitem__(self, name):
+        return self.__index_dict()[name]
+
+    def get(self, name, default=None):
+        return self.__index_dict().get(name, default)
+
+    def iteritems(self):
+        return itertools.izip(self.names, xrange(len(self.names)))
+
+    def indices(self, names):
+        """
+        Indices of names. Names which are not in map are skipped.
+
+        :rtype: numpy array of int
+        """
+        index = self.__index_dict()
+        return np.array([index[n] for n in names if n in index], dtype=np.int64)
+
+
+class FbaProblem(object):
+    """
+    Flux balance linear program. Rows are metabolites, columns are reactions (or their directions when reversible
+    reactions are split) followed by exchange reactions ``EX_<metabolite>`` of boundary metabolites. Properties of
+    columns are stored in arrays indexed by column.
+
+    :param lp: :class:`lp_backend.LpBackend`
+    :param reactions: Names of model reactions and exchange reactions
+    :param columns: Names of columns
+    :param compounds: Names of rows
+    :param lb: Default lower bounds of columns
+    :param ub: Default upper bounds of columns
+    :param fwd: Column of every reaction (forward direction if reaction is split)
+    :param rev: Column of reverse direction of every reaction (-1 if reaction is not split)
+    :param compound: Row of metabolite exchanged by every column (-1 if column is not an exchange reaction)
+    :param obj: Name of objective reaction
+    """
+
+    def __init__(self, lp, reactions, columns, compounds, lb, ub, fwd, rev, compound, obj):
+        self.lp = lp
+        self.reactions = IndexMap(reactions)
+        self.rxn2i = IndexMap(columns)
+        self.cpd2i = IndexMap(compounds)
+        self.i2rxn = self.rxn2i.names
+        self.i2cpd = self.cpd2i.names
         self.lb = lb
         self.ub = ub
-
-class FbaProblem:
-    def __init__(self, model, rxn2i, cpd2i, rxn2ext, rxn2cpd, rxn2dir, rxn2bounds, obj):
-        self.model = model
-        self.rxn2i = rxn2i
-        self.rxn2i_external = {r_id: r_i for r_id, r_i in self.rxn2i.iteritems() if rxn2ext[r_id]}
-        self.rxn2i_internal = {r_id: r_i for r_id, r_i in self.rxn2i.iteritems() if not rxn2ext[r_id]}
-        self.rxn2ext = rxn2ext
-        self.rxn2cpd = rxn2cpd
-        self.cpd2i = cpd2i
-        self.i2rxn = [x[0] for x in sorted(rxn2i.iteritems(), key=lambda x: x[1])]
-        self.i2cpd = [x[0] for x in sorted(cpd2i.iteritems(), key=lambda x: x[1])]
-        self.rxn2bounds = rxn2bounds
-        self.i2bounds = {self.rxn2i[rxn]: bounds for rxn, bounds in self.rxn2bounds.iteritems()}
-        self.rxnnum = len(self.rxn2i)
-        self.cpdnum = len(self.cpd2i)
+        self.fwd = fwd
+        self.rev = rev
+        self.compound = compound
+        self.external = compound >= 0
         self.obj = obj
-        self.is_reversible = len(rxn2dir) == 0
-        self.rxn2dir = rxn2dir
-        self.rxn2fwd = {rxn: r[dir_fwd] for rxn, r in rxn2dir.iteritems()}
-        self.rxn2rev = {rxn: r[dir_rev] for rxn, r in rxn2dir.iteritems() if "rev" in r}
-        self.fwd2rxn = {fwd: rxn for rxn, fwd in self.rxn2fwd.iteritems()}
-        self.rev2rxn = {rev: rxn for rxn, rev in self.rxn2rev.iteritems()}
-        self.dir2rxn = {fwd: rxn for rxn, fwd in self.rxn2fwd.iteritems()}
-        self.dir2rxn.update({rev: rxn for rxn, rev in self.rxn2rev.iteritems()})
-        self.rxnnum_external = len(self.rxn2i_external)
-        self.rxnnum_internal = len(self.rxn2i_internal)
         self.coupling = {'allow': {}, 'depend': {}}
 
+    @property
+    def rxnnum(self):
+        return len(self.rxn2i)
+
+    @property
+    def cpdnum(self):
+        return len(self.cpd2i)
+
+    @property
+    def rxnnum_external(self):
+        return int(np.count_nonzero(self.external))
+
+    @property
+    def rxnnum_internal(self):
+        return self.rxnnum - self.rxnnum_external
+
+    @property
+    def is_reversible(self):
+        return not np.any(self.rev >= 0)
+
+    def copy(self):
+        """
+        Copy of problem with its own linear program (see :meth:`lp_backend.LpBackend.copy`). Index maps and default
+        bounds are not modified by problem methods and are shared with the copy.
+
+        :rtype: :class:`FbaProblem`
+        """
+        other = FbaProblem.__new__(FbaProblem)
+        other.__dict__.update(self.__dict__)
+        other.lp = self.lp.copy()
+        other.coupling = deepcopy(self.coupling)
+        return other
+
+    def column_reaction(self):
+        """
+        Reaction of every column
+
+        :rtype: numpy array of reaction indices
+        """
+        ret = np.empty(self.rxnnum, dtype=np.int64)
+        ret[self.fwd] = np.arange(len(self.fwd))
+        split = self.rev >= 0
+        ret[self.rev[split]] = np.flatnonzero(split)
+        return ret
+
     def set_coupling(self, coupling_table):
         for c in coupling_table:
             if c['REACTION1'] not in self.coupling['depend']: self.coupling['depend'][c['REACTION1']] = {dir_fwd: set(), dir_rev: set()}
@@ -96,9 +188,9 @@ class FbaProblem:
 
     def set_media(self, media):
         media_dict = {r['UPTAKE']: FbaBounds(r['LB'], r['UB']) for r in media}
-        cplex_lb = []
-        cplex_ub = []
-        default_bounds = FbaBounds(-cplex.infinity, 0)
+        new_lb = []
+        new_ub = []
+        default_bounds = FbaBounds(-inf, 0)
 
         for rxn, i in self.rxn2i.iteritems():
             if rxn == self.obj:
@@ -108,17 +200,14 @@ class FbaProblem:
                 lb = media_dict.get(rxn, default_bounds).lb
                 ub = media_dict.get(rxn, default_bounds).ub
 
-                if self.rxn2bounds[rxn].lb != lb:
-                    cplex_lb.append((i, -cplex.infinity if lb <= 100 else lb))
-
-                if self.rxn2bounds[rxn].ub != ub:
-                    cplex_ub.append((i, cplex.infinity if ub >= 100 else ub))
+                if self.lb[i] != lb:
+                    new_lb.append((i, -inf if lb <= 100 else lb))
 
-        if cplex_lb:
-            self.model.variables.set_lower_bounds(cplex_lb)
+                if self.ub[i] != ub:
+                    new_ub.append((i, inf if ub >= 100 else ub))
 
-        if cplex_ub:
-            self.model.variables.set_upper_bounds(cplex_ub)
+        self.lp.set_lower_bounds(new_lb)
+        self.lp.set_upper_bounds(new_ub)
 
     def switch_reactions(self, indices, values=None):
         """
@@ -126,71 +215,65 @@ class FbaProblem:
         """
         indices_range = range(len(indices))
 
-        raw_lb = self.model.variables.get_lower_bounds(indices_range)
-        raw_ub = self.model.variables.get_upper_bounds(indices_range)
-
-        inf = float("Inf")
+        raw_lb = self.lp.lower_bounds(indices_range)
+        raw_ub = self.lp.upper_bounds(indices_range)
 
         backup_lb, backup_ub = {}, {}
         new_lb, new_ub = [], []
         for i in indices_range:
             ub_bin = int(raw_ub[i] != 0)
-            ub = values[i] if values else self.i2bounds[i].ub
-            ub = ub if ub < inf else cplex.infinity
+            ub = values[i] if values else self.ub[i]
             ub_changed = ub_bin != indices[i] or (values and raw_ub[i] != ub)
             if ub_changed:
                 backup_ub[i] = raw_ub[i]
                 new_ub.append((i, (ub if indices[i] else 0.0), ))
 
             lb_bin = int(raw_lb[i] != 0)
-            lb = -values[i] if values and self.i2bounds[i].lb < 0 and -values[i] else self.i2bounds[i].lb
-            lb = lb if lb > -inf else -cplex.infinity
-            if lb > ub: lb = self.i2bounds[i].lb
+            lb = -values[i] if values and self.lb[i] < 0 and -values[i] else self.lb[i]
+            if lb > ub: lb = self.lb[i]
             lb_changed = lb_bin != indices[i] or (values and raw_lb[i] != lb)
             if lb_changed:
                 backup_lb[i] = raw_lb[i]
                 new_lb.append((i, (lb if indices[i] else 0.0), ))
 
-        if len(new_lb):
-            self.model.variables.set_lower_bounds(new_lb)
-        if len(new_ub):
-            self.model.variables.set_upper_bounds(new_ub)
+        self.lp.set_lower_bounds(new_lb)
+        self.lp.set_upper_bounds(new_ub)
 
         return backup_lb, backup_ub
 
     def active_reactions2(self, tested_reactions_init):
-        m = self.model
-        reversible_reactions = set(r_i for r_i, b in self.i2bounds.iteritems() if b.lb < 0)
+        m = self.lp
+        reversible_reactions = set(np.flatnonzero(self.lb < 0).tolist())
 
         active_reactions2 = {}
-        m.objective.set_linear([(r_i, 0) for r_i in xrange(self.rxnnum)])
+        m.set_objective([(r_i, 0) for r_i in xrange(self.rxnnum)])
         for r_i in tested_reactions_init:
-            m.objective.set_linear([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
-            m.objective.set_linear(r_i, 1)
+            m.set_objective([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
+            m.set_objective([(r_i, 1)])
             m.solve()
-            status = m.solution.get_status_string()
-            obj = m.solution.get_objective_value() if status == "optimal" else 0
+            status = m.status()
+            obj = m.objective_value() if status == "optimal" else 0
 
             if status == "optimal" and abs(obj) > 1e-9:
                 active_reactions2[r_i] = obj
                 continue
 
-                backup_lb = m.variables.get_lower_bounds(r_i)
-                backup_ub = m.variables.get_upper_bounds(r_i)
-                m.variables.set_lower_bounds(r_i, obj)
-                m.variables.set_upper_bounds(r_i, obj)
-                m.objective.set_linear([(r_ii, -1) for r_ii in xrange(self.rxnnum)])
+                backup_lb = m.lower_bounds([r_i])[0]
+                backup_ub = m.upper_bounds([r_i])[0]
+                m.set_lower_bounds([(r_i, obj)])
+                m.set_upper_bounds([(r_i, obj)])
+                m.set_objective([(r_ii, -1) for r_ii in xrange(self.rxnnum)])
                 m.solve()
-                active_reactions2[r_i] = sum([v > 0 for v in m.solution.get_values()])
-                m.variables.set_lower_bounds(r_i, backup_lb)
-                m.variables.set_upper_bounds(r_i, backup_ub)
+                active_reactions2[r_i] = sum([v > 0 for v in m.values()])
+                m.set_lower_bounds([(r_i, backup_lb)])
+                m.set_upper_bounds([(r_i, backup_ub)])
 
             if r_i in reversible_reactions and obj == 0:
-                m.objective.set_linear([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
-                m.objective.set_linear(r_i, -1)
+                m.set_objective([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
+                m.set_objective([(r_i, -1)])
                 m.solve()
-                status_rev = m.solution.get_status_string()
-                obj_rev = m.solution.get_objective_value() if status_rev == "optimal" else 0
+                status_rev = m.status()
+                obj_rev = m.objective_value() if status_rev == "optimal" else 0
 
                 if abs(obj_rev) > 1e-9:
                     active_reactions2[r_i] = obj_rev
@@ -198,19 +281,19 @@ class FbaProblem:
                 continue
 
                 if status_rev == "optimal" and obj_rev != 0:
-                    backup_lb = m.variables.get_lower_bounds(r_i)
-                    backup_ub = m.variables.get_upper_bounds(r_i)
-                    m.variables.set_lower_bounds(r_i, -obj_rev)
-                    m.variables.set_upper_bounds(r_i, -obj_rev)
-                    m.objective.set_linear([(r_ii, -1) for r_ii in xrange(self.rxnnum)])
+                    backup_lb = m.lower_bounds([r_i])[0]
+                    backup_ub = m.upper_bounds([r_i])[0]
+                    m.set_lower_bounds([(r_i, -obj_rev)])
+                    m.set_upper_bounds([(r_i, -obj_rev)])
+                    m.set_objective([(r_ii, -1) for r_ii in xrange(self.rxnnum)])
                     m.solve()
-                    active_reactions2[r_i] = sum([v > 0 for v in m.solution.get_values()])
-                    m.variables.set_lower_bounds(r_i, backup_lb)
-                    m.variables.set_upper_bounds(r_i, backup_ub)
+                    active_reactions2[r_i] = sum([v > 0 for v in m.values()])
+                    m.set_lower_bounds([(r_i, backup_lb)])
+                    m.set_upper_bounds([(r_i, backup_ub)])
             # if r_i in active_reactions2:
             #     print active_reactions2[r_i]
 
-            m.objective.set_linear([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
+            m.set_objective([(r_ii, 0) for r_ii in xrange(self.rxnnum)])
 
         return active_reactions2
 
@@ -221,16 +304,16 @@ class FbaProblem:
         It is expected to run 15-20 simulations
         """
         tested_reactions_init = set(r_i for r_i, s in enumerate(individual) if s > 0)
-        individual_vals = [s*(10000 if self.i2rxn[r_i] in self.rxn2i_external else 1) for r_i, s in enumerate(individual)]
+        individual_vals = [s*(10000 if external else 1) for s, external in zip(individual, self.external.tolist())]
         backup_lb, backup_ub = self.switch_reactions(individual, values=individual_vals)
-        backup_obj = self.model.objective.get_linear()
+        backup_obj = self.lp.objective()
 
-        m = self.model
+        m = self.lp
 
         # Find potentially active reactions
         active_reactions = {}
         tested_reactions = tested_reactions_init
-        reversible_reactions = set(r_i for r_i, b in self.i2bounds.iteritems() if b.lb < 0)
+        reversible_reactions = set(np.flatnonzero(self.lb < 0).tolist())
         added_reactions = []
 
         dir = "fwd"
@@ -258,10 +341,10 @@ class FbaProblem:
 
             iactive = {}
             for tested_reactions_chunk in list_utils.chunkify(tested_reactions_this_list, sample_n, jumpy=True):
-                m.objective.set_linear([(r_i, int(sign*r_i in tested_reactions_chunk)) for r_i in xrange(self.rxnnum)])
+                m.set_objective([(r_i, int(sign*r_i in tested_reactions_chunk)) for r_i in xrange(self.rxnnum)])
                 m.solve()
 
-                fluxes = zip(tested_reactions_chunk, m.solution.get_values(tested_reactions_chunk))
+                fluxes = zip(tested_reactions_chunk, m.values(tested_reactions_chunk))
                 iactive.update({r_i: val for r_i, val in fluxes if abs(val) > 1e-9})
 
             # iactive_coupled = {}
@@ -308,198 +391,150 @@ class FbaProblem:
 
         # print "{}: {}".format(i, len(active_reactions))
 
-        m.variables.set_lower_bounds(backup_lb.items())
-        m.variables.set_upper_bounds(backup_ub.items())
-        m.objective.set_linear([(r_i, val) for r_i, val in enumerate(backup_obj)])
+        m.set_lower_bounds(backup_lb.items())
+        m.set_upper_bounds(backup_ub.items())
+        m.set_objective([(r_i, val) for r_i, val in enumerate(backup_obj)])
 
         return active_reactions
 
-def sbml2cplex(model, objective=None):
-    obj_reaction = objective
-    all_reactions, columns, lb, ub, obj = [], [], [], [], []
+def _create_problem(backend, S, lb, ub, reversible, boundary, reaction_names, compound_names, split, obj_reaction):
+    """
+    Create flux balance problem from stoichiometric matrix (metabolites x reactions). Reversible reactions (except
+    objective) are split into forward and reverse columns if **split** is set. Exchange reaction is added for every
+    boundary metabolite.
+    """
+    import scipy.sparse
+
+    n_reactions = len(reaction_names)
+    lb = np.asarray(lb, dtype=np.float64)
+    ub = np.asarray(ub, dtype=np.float64)
+    obj_i = reaction_names.index(obj_reaction) if obj_reaction in reaction_names else -1
+
+    split_reactions = np.zeros(n_reactions, dtype=np.bool_)
+    if split:
+        split_reactions[:] = reversible
+        if obj_i >= 0:
+            split_reactions[obj_i] = False
+
+    # Split reaction has forward column followed by reverse column with negated coefficients
+    counts = 1 + split_reactions
+    fwd = np.zeros(n_reactions, dtype=np.int64)
+    np.cumsum(counts[:-1], out=fwd[1:])
+    rev = np.where(split_reactions, fwd + 1, -1)
+
+    columns = np.repeat(np.arange(n_reactions), counts)
+    sign = np.ones(len(columns))
+    sign[rev[split_reactions]] = -1
+    col_lb = lb[columns]
+    col_ub = ub[columns]
+    col_lb[fwd[split_reactions]] = 0.0
+    col_ub[fwd[split_reactions]] = np.maximum(ub[split_reactions], 0.0)
+    col_lb[rev[split_reactions]] = 0.0
+    col_ub[rev[split_reactions]] = np.maximum(-lb[split_reactions], 0.0)
+
+    names = [reaction_names[i] for i in columns.tolist()]
+    for r_i in np.flatnonzero(split_reactions).tolist():
+        names[fwd[r_i]] = "{0}_{1}".format(reaction_names[r_i], dir_fwd)
+        names[rev[r_i]] = "{0}_{1}".format(reaction_names[r_i], dir_rev)
+
+    # Exchange reactions of boundary metabolites
+    exchanged = np.flatnonzero(boundary)
+    n_exchange = len(exchanged)
+    n_columns = len(columns)
+    exchange_names = ["EX_{0}".format(compound_names[i]) for i in exchanged.tolist()]
+    exchange_fwd = n_columns + np.arange(n_exchange) * (1 + split)
+    exchange_rev = exchange_fwd + 1 if split else np.full(n_exchange, -1, dtype=np.int64)
+    if split:
+        exchange_rows = np.repeat(exchanged, 2)
+        exchange_values = np.tile([1.0, -1.0], n_exchange)
+        exchange_lb = np.zeros(2*n_exchange)
+        exchange_columns = ["{0}_{1}".format(n, d) for n in exchange_names for d in (dir_fwd, dir_rev)]
+    else:
+        exchange_rows = exchanged
+        exchange_values = np.ones(n_exchange)
+        exchange_lb = np.full(n_exchange, -inf)
+        exchange_columns = exchange_names
 
-    all_compounds_dict = {m.id: m for m in model.species}
-    all_compounds_set = set(m.id for m in model.species)
-    all_compounds = list(all_compounds_set)
-    all_compounds_ind = {cpd: i for i, cpd in enumerate(all_compounds)}
-    all_reactions_ind, rxn2external, rxn2compound, rxn2bounds = {}, {}, {}, {}
+    S = scipy.sparse.csc_matrix(S)
+    A = scipy.sparse.hstack([
+        S[:, columns] * scipy.sparse.diags(sign),
+        scipy.sparse.csc_matrix((exchange_values, exchange_rows, np.arange(len(exchange_rows) + 1)),
+                                shape=(len(compound_names), len(exchange_rows)))], format="csc")
 
-    rxn2dir = {}
-    r_i = 0
-    for r in model.reactions:
-        rxn2dir[r.id] = {dir_fwd: r.id}
-        rxn2external[r.id] = False
-        all_reactions.append(r.id)
-        all_reactions_ind[r.id] = r_i
+    c = np.zeros(A.shape[1])
+    if obj_i >= 0:
+        c[fwd[obj_i]] = 1.0
+
+    column_lb = np.concatenate([col_lb, exchange_lb])
+    column_ub = np.concatenate([col_ub, np.full(len(exchange_rows), inf)])
+    compound = np.full(A.shape[1], -1, dtype=np.int64)
+    compound[n_columns:] = exchange_rows
+
+    lp = lp_backend.create_backend(backend, A, column_lb, column_ub, c, row_names=compound_names,
+                                   column_names=names + exchange_columns)
 
-        cpds = []
-        coefs = []
+    return FbaProblem(lp=lp, reactions=list(reaction_names) + exchange_names, columns=names + exchange_columns,
+                      compounds=compound_names, lb=column_lb, ub=column_ub,
+                      fwd=np.concatenate([fwd, exchange_fwd]), rev=np.concatenate([rev, exchange_rev]),
+                      compound=compound, obj=obj_reaction)
+
+
+def sbml2cplex(model, objective=None, backend=None):
+    import scipy.sparse
+
+    compounds = [m.id for m in model.species]
+    compounds_ind = dict((cpd, i) for i, cpd in enumerate(compounds))
+
+    reactions, reversible, indptr, indices, data = [], [], [0], [], []
+    for r in model.reactions:
+        reactions.append(r.id)
+        reversible.append(r.reversible)
         for m in r.reactants:
-            cpds.append(all_compounds_ind[m.species])
-            coefs.append(-m.stoichiometry)
+            indices.append(compounds_ind[m.species])
+            data.append(-m.stoichiometry)
         for m in r.products:
-            cpds.append(all_compounds_ind[m.species])
-            coefs.append(m.stoichiometry)
+            indices.append(compounds_ind[m.species])
+            data.append(m.stoichiometry)
+        indptr.append(len(indices))
 
-        columns.append(cplex.SparsePair(cpds, coefs))
-        r_bounds = FbaBounds(0 if r.reversible else -cplex.infinity, cplex.infinity)
-        rxn2bounds[r.id] = r_bounds
-        lb.append(r_bounds.lb)
-        ub.append(r_bounds.ub)
-        obj.append(float(r.id == obj_reaction))
+    S = scipy.sparse.csc_matrix((data, indices, indptr), shape=(len(compounds), len(reactions)))
+    reversible = np.array(reversible, dtype=np.bool_)
+    lb = np.where(reversible, -inf, 0.0)
+    ub = np.full(len(reactions), inf)
+    boundary = np.array([m.boundary_condition for m in model.species], dtype=np.bool_)
 
-        r_i += 1
+    return _create_problem(backend, S, lb, ub, reversible, boundary, reactions, compounds, False, objective)
 
-    for cpd in all_compounds:
-        if not all_compounds_dict[cpd].boundary_condition:
-            continue
 
-        r_id = "EX_{}".format(cpd)
-        all_reactions.append(r_id)
-        rxn2external[r_id] = True
-        all_reactions_ind[r_id] = len(all_reactions_ind)
-        rxn2bounds[r_id] = FbaBounds(-cplex.infinity, cplex.infinity)
-        rxn2compound[r_id] = cpd
-        columns.append(cplex.SparsePair([all_compounds_ind[cpd]], [1]))
-        lb.append(-cplex.infinity)
-        ub.append(cplex.infinity)
-        obj.append(0)
-
-    prob = cplex.Cplex()
-    prob.objective.set_sense(prob.objective.sense.maximize)
-    prob.linear_constraints.add(rhs=[0]*len(all_compounds), senses='E'*len(all_compounds), names=all_compounds)
-    prob.variables.add(ub=ub, lb=lb, names=all_reactions, columns=columns, obj=obj)
-    #prob.parameters.lpmethod.set(prob.parameters.lpmethod.values.auto)
-    #prob.parameters.preprocessing.reduce.set(3)
-    prob.parameters.advance.set(0)
-    prob.set_log_stream(None)
-    prob.set_error_stream(None)
-    prob.set_warning_stream(None)
-    prob.set_results_stream(None)
-
-    return FbaProblem(model=prob, rxn2i=all_reactions_ind, cpd2i=all_compounds_ind, rxn2ext=rxn2external, rxn2cpd=rxn2compound,
-               rxn2bounds=rxn2bounds, rxn2dir=rxn2dir, obj=obj_reaction)
-
-
-def bioopt2cplex(bioopt, split_reversible=False, objective=None):
-    obj_reaction = bioopt.objective.operands[0].name if objective is None and bioopt.objective is not None else objective
-    all_reactions, columns, lb, ub, obj = [], [], [], [], []
-
-    all_compounds_dict = {m.name: m for m in bioopt.find_metabolites()}
-    all_compounds_set = set(m.name for m in bioopt.find_metabolites())
-    all_compounds = list(all_compounds_set)
-    all_compounds_ind = {cpd: i for i, cpd in enumerate(all_compounds)}
-    all_reactions_ind, rxn2external, rxn2compound, rxn2bounds = {}, {}, {}, {}
-
-    rxn2dir = {}
-    r_i = 0
-    for r in bioopt.reactions:
-        if split_reversible and r.direction == dir_rev and obj_reaction != r.name:
-            rxn2dir[r.name] = {}
-            for dir in [dir_fwd, dir_rev]:
-                r_id_dir = "{}_{}".format(r.name, dir)
-                rxn2dir[r.name][dir] = r.name_dir
-                rxn2external[r.name_dir] = False
-
-                all_reactions.append(r_id_dir)
-                all_reactions_ind[r_id_dir] = r_i
-
-                cpds = []
-                coefs = []
-                for m in r.reactants:
-                    cpds.append(all_compounds_ind[m.metabolite.name])
-                    coefs.append(-m.coefficient)
-                for m in r.products:
-                    cpds.append(all_compounds_ind[m.metabolite.name])
-                    coefs.append(m.coefficient)
-
-                r_lb = 0.0
-                r_ub = r.bounds.ub if dir == dir_fwd else r.bounds.ub
-                r_ub = r_ub if r_ub != r.bounds.inf() else cplex.infinity
-
-                columns.append(cplex.SparsePair(cpds, coefs))
-                lb.append(r_lb)
-                ub.append(r_ub)
-                rxn2bounds["{}_{}".format(r.name, dir)] = FbaBounds(r_lb, r_ub)
-                obj.append(float(r.name == obj_reaction))
-
-                r_i += 1
-        else:
-            rxn2dir[r.name] = {dir_fwd: r.name}
-            rxn2external[r.name] = False
-            all_reactions.append(r.name)
-            all_reactions_ind[r.name] = r_i
-
-            cpds = []
-            coefs = []
-            for m in r.reactants:
-                cpds.append(all_compounds_ind[m.metabolite.name])
-                coefs.append(-m.coefficient)
-            for m in r.products:
-                cpds.append(all_compounds_ind[m.metabolite.name])
-                coefs.append(m.coefficient)
-
-            columns.append(cplex.SparsePair(cpds, coefs))
-            r_lb = r.bounds.lb if r.bounds.lb_is_finite else -cplex.infinity
-            r_ub = r.bounds.ub if r.bounds.ub_is_finite else cplex.infinity
-            lb.append(r_lb)
-            ub.append(r_ub)
-            rxn2bounds[r.name] = FbaBounds(r.bounds.lb, r.bounds.ub)
-            obj.append(float(r.name == obj_reaction))
-
-            r_i += 1
-
-    for cpd in all_compounds:
-        if not all_compounds_dict[cpd].boundary:
-            continue
+def bioopt2cplex(bioopt, split_reversible=False, objective=None, backend=None):
+    """
+    Create flux balance problem from model arrays (see :class:`model_matrix.ModelMatrix`)
+
+    :param bioopt: :class:`model.Model` or :class:`model_matrix.ModelMatrix`
+    :param split_reversible: Split reversible reactions into forward and reverse irreversible columns
+    :param objective: Objective reaction (default: first reaction of model objective)
+    :param backend: Linear programming backend (see :func:`lp_backend.create_backend`)
+    :rtype: :class:`FbaProblem`
+    """
+    matrix = ModelMatrix.from_model(bioopt) if isinstance(bioopt, model.Model) else bioopt
+
+    obj_reaction = objective
+    if obj_reaction is None and matrix.objective is not None:
+        operands = matrix.objective[1]
+        operands = operands[operands >= 0]
+        if len(operands):
+            names = list(matrix.reaction_names) + list(matrix.objective_names)
+            obj_reaction = names[operands[0]]
+
+    reversible = np.asarray(matrix.directions) == ModelMatrix.REVERSIBLE
+    return _create_problem(backend, matrix.stoichiometry(), matrix.lb, matrix.ub, reversible,
+                           np.asarray(matrix.metabolite_boundary, dtype=np.bool_), list(matrix.reaction_names),
+                           list(matrix.metabolite_names), split_reversible, obj_reaction)
+
 
-        r_id = "EX_{}".format(cpd)
-        if split_reversible:
-            rxn2dir[r_id] = {}
-            for dir in [model.Direction.forward(), dir_rev]:
-                r_id_dir = "{}_{}".format(r_id, dir)
-                rxn2dir[r_id][dir] = r_id_dir
-                all_reactions.append(r_id_dir)
-                rxn2external[r_id_dir] = True
-                all_reactions_ind[r_id_dir] = len(all_reactions_ind)
-                rxn2bounds["{}_{}".format(r_id, dir)] = model.Bounds(0, cplex.infinity)
-                rxn2compound[r_id_dir] = cpd
-                columns.append(cplex.SparsePair([all_compounds_ind[cpd]], [1]))
-                lb.append(0)
-                ub.append(cplex.infinity)
-                obj.append(0)
-        else:
-            r_id = "EX_{}".format(cpd)
-            all_reactions.append(r_id)
-            rxn2external[r_id] = True
-            all_reactions_ind[r_id] = len(all_reactions_ind)
-            rxn2bounds[r_id] = model.Bounds(-cplex.infinity, cplex.infinity)
-            rxn2compound[r_id] = cpd
-            columns.append(cplex.SparsePair([all_compounds_ind[cpd]], [1]))
-            lb.append(-cplex.infinity)
-            ub.append(cplex.infinity)
-            obj.append(0)
-
-
-    prob = cplex.Cplex()
-    prob.objective.set_sense(prob.objective.sense.maximize)
-    prob.linear_constraints.add(rhs=[0]*len(all_compounds), senses='E'*len(all_compounds), names=all_compounds)
-    prob.variables.add(ub=ub, lb=lb, names=all_reactions, columns=columns, obj=obj)
-    #prob.parameters.lpmethod.set(prob.parameters.lpmethod.values.auto)
-    #prob.parameters.preprocessing.reduce.set(3)
-    prob.parameters.advance.set(0)
-    prob.set_log_stream(None)
-    prob.set_error_stream(None)
-    prob.set_warning_stream(None)
-    prob.set_results_stream(None)
-
-    return FbaProblem(model=prob, rxn2i=all_reactions_ind, cpd2i=all_compounds_ind, rxn2ext=rxn2external, rxn2cpd=rxn2compound,
-               rxn2bounds=rxn2bounds, rxn2dir=rxn2dir, obj=obj_reaction)
-
-
-def summary_dual(model, map={}):
+def summary_dual(lp, map={}):
     str = ""
-    res = zip([map.get(n, n) for n in model.linear_constraints.get_names()], model.solution.get_dual_values())
+    res = zip([map.get(n, n) for n in lp.row_names()], lp.dual_values())
     res = sorted([(n, dual) for n, dual in res if dual != 0], key=lambda x: x[0])
     res_str = "{{:<{}}} --> {{}}\n".format(max(len(n) for n, dual in res))
 
@@ -509,27 +544,27 @@ def summary_dual(model, map={}):
     return str
 
 
-def summary_primal(model, map={}):
+def summary_primal(lp, map={}):
     str = ""
-    for rxn, val in zip(model.variables.get_names(), model.solution.get_values()):
+    for rxn, val in zip(lp.column_names(), lp.values()):
         if val != 0:
             str += "{:<20}{}\n".format(map.get(rxn, rxn), val)
 
     return str
 
 
-def summary(model, primal=False, dual=False, map={}):
-    status = model.solution.get_status_string()
+def summary(lp, primal=False, dual=False, map={}):
+    status = lp.status()
 
     if status == "optimal":
-        obj = model.solution.get_objective_value()
+        obj = lp.objective_value()
         ret = "{} ({})".format(status, obj)
         if primal:
             ret += "\nPrimal\n=================\n"
-            ret += summary_primal(model, map=map)
+            ret += summary_primal(lp, map=map)
         if dual:
             ret += "\nDual\n=================\n"
-            ret += summary_dual(model, map=map)
+            ret += summary_dual(lp, map=map)
     else:
         ret = status
 
@@ -537,13 +572,13 @@ def summary(model, primal=False, dual=False, map={}):
 
 
 def reaction_members(prob, reaction, hide_inf=True, map={}, members="all", print_results=True):
-    obj_bck = list(enumerate(prob.model.objective.get_linear()))
+    obj_bck = list(enumerate(prob.lp.objective()))
     obj = [(i, 0.0) for i in xrange(prob.rxnnum)]
-    prob.model.objective.set_linear(obj)
+    prob.lp.set_objective(obj)
 
-    rcol = prob.model.variables.get_cols(prob.rxn2i[reaction])
+    rows, values = prob.lp.column(prob.rxn2i[reaction])
     res = []
-    for cpd_i, coef in zip(rcol.ind, rcol.val):
+    for cpd_i, coef in zip(rows, values):
         if coef == 0:
             continue
 
@@ -555,17 +590,17 @@ def reaction_members(prob, reaction, hide_inf=True, map={}, members="all", print
 
         cpd = prob.i2cpd[cpd_i]
 
-        prob.model.variables.add(lb=[0], ub=[1000], names=["MET_EXPORT_TEST"], columns=[cplex.SparsePair([cpd_i], [-1])], obj=[1])
-        prob.model.solve()
+        prob.lp.add_column([cpd_i], [-1], lb=0, ub=1000, obj=1, name="MET_EXPORT_TEST")
+        prob.lp.solve()
 
-        obj = prob.model.solution.get_objective_value()
-        if not is_optimal(prob.model) or (is_optimal(prob.model) and (not hide_inf or obj < 100)):
-            status = prob.model.solution.get_status_string()
-            value = prob.model.solution.get_objective_value() if status.startswith("optimal") else 0
+        obj = prob.lp.objective_value() if is_optimal(prob.lp) else 0
+        if not is_optimal(prob.lp) or (is_optimal(prob.lp) and (not hide_inf or obj < 100)):
+            status = prob.lp.status()
+            value = prob.lp.objective_value() if status.startswith("optimal") else 0
             res.append((cpd, coef, status, value))
-        prob.model.variables.delete(prob.rxnnum)
+        prob.lp.delete_column(prob.rxnnum)
 
-    prob.model.objective.set_linear(obj_bck)
+    prob.lp.set_objective(obj_bck)
 
     cmd_max = max([len(c[0]) for c in res])
     res_str = "{{:>{}}} {{:>8}}: {{}}({{}})".format(cmd_max)
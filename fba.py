@@ -1,7 +1,10 @@
 import cplex_utils
+import knockout_utils
+import knockout_results
+import knockout_cache
+import lp_backend
 import gtrass
 from bioopt_parser import BiooptParser
-from cplex import infinity as cplex_inf
 import itertools
 import argparse
 from operator import attrgetter as _a
@@ -10,19 +13,7 @@ import re
 import sys
 
 
-def chunkify(lst, n, jumpy=False):
-    if jumpy:
-        return [lst[i::n] for i in xrange(n)]
-
-    avg = len(lst) / float(n)
-    out = []
-    last = 0.0
-
-    while last < len(lst):
-        out.append(lst[int(last):int(last + avg)])
-        last += avg
-
-def geneko2reactionko(knockouts_g, associations, genes):
+def geneko2reactionko(prob, knockouts_g, associations, genes):
         genes_values = {g: 1 for g in genes}
 
         ga_cache = {rxn: {} for rxn in associations}
@@ -38,94 +29,141 @@ def geneko2reactionko(knockouts_g, associations, genes):
                     ga_cache[rxn][ga_cache_rxn] = r_active
 
                 if not r_active:
-                    ko_reactions.add(cplex.rxn2i[rxn])
+                    ko_reactions.add(prob.rxn2i[rxn])
 
             yield ko_reactions
             for g in ko_genes: genes_values[g] = 1
 
-def main_knockouts(cplex, args):
+def main_knockouts(prob, args):
     # Find reactions candidates for knockouts
     excluded_ko_reactions = set(r.name for r in bioopt.find_reactions("(xtI|xtO|xtX)", True))
     reactions = sorted([r for r in bioopt.reactions if r.name not in excluded_ko_reactions], key=_a('name'))
-    reactions_i = [cplex.rxn2i[r.name] for r in reactions]
+    reactions_i = [prob.rxn2i[r.name] for r in reactions]
 
+    # Share of knockouts solved by this process, shards are ranges of knockout ranks
+    def share(total):
+        return knockout_utils.shard_range(total, *args.shard) if args.shard else (0, total)
+
+    # Knockouts are created once the number of knockouts already written is known, resumed screen starts at the rank
+    # of the first missing knockout
     if args.gtrass:
         reactions, genes, associations = gtrass.parse_file(args.gtrass)
         if re.match("^\d+$", args.knockouts):
-            knockouts_g = itertools.combinations(genes, int(args.knockouts))
+            ko_size = int(args.knockouts)
+            start, stop = share(knockout_utils.n_combinations(len(genes), ko_size))
+            knockouts = lambda first: knockout_utils.combinations(genes, ko_size, "lexicographic", first, stop)
         else:
             knockouts_g = [set(l.strip().split("\t")) for l in open(args.knockouts)]
-
-        knockouts_i = geneko2reactionko(knockouts_g, associations, genes)
+            ko_size = max([len(ko) for ko in knockouts_g] or [0])
+            start, stop = share(len(knockouts_g))
+            knockouts = lambda first: knockouts_g[first:stop]
     else:
-        if re.match("^\d+$", args.knockouts):
-            knockouts_i = itertools.combinations(reactions_i, int(args.knockouts))
+        if re.match("^\d+$", args.knockouts) and args.prune:
+            knockouts = None
+            ko_size = int(args.knockouts)
+            start, stop = 0, None
+        elif re.match("^\d+$", args.knockouts):
+            ko_size = int(args.knockouts)
+            start, stop = share(knockout_utils.n_combinations(len(reactions_i), ko_size))
+            knockouts = lambda first: knockout_utils.combinations(reactions_i, ko_size, args.order, first, stop)
         else:
             knockouts_i = list()
             for l in open(args.knockouts):
-                knockouts_i.append(set(l.strip().split("\t")))
-
-        knockouts_g = [""]*len(knockouts_i)
+                knockouts_i.append(tuple(prob.rxn2i[rxn] for rxn in l.strip().split("\t")))
+            ko_size = max([len(ko) for ko in knockouts_i] or [0])
+            start, stop = share(len(knockouts_i))
+            knockouts = lambda first: knockouts_i[first:stop]
+
+    # Results file, items are genes for gene knockouts and problem columns for reaction knockouts
+    writer = None
+    if args.output:
+        items = genes if args.gtrass else prob.i2rxn
+        description = {"model": args.model, "objective": args.objective, "gtrass": args.gtrass,
+                       "knockouts": args.knockouts, "prune": args.prune, "order": args.order}
+        if args.shard:
+            description.update({"shard": list(args.shard), "start": start, "stop": stop})
+        writer = knockout_results.KnockoutWriter(args.output, items, ko_size, description=description,
+                                                 resume=args.resume, checkpoint=args.checkpoint)
+        item2i = dict((item, i) for i, item in enumerate(items))
 
     # Run knockouts
-    print "Genes\tReactions\tStatus\tObjective"
-    for ko_genes, ko_res in itertools.izip(knockouts_g, loop_knockouts(cplex, knockouts_i)):
-        ko_i, ko_status, ko_obj = ko_res
-        ko_rxn = ",".join([cplex.i2rxn[r_i] for r_i in ko_i])
-        ko_genes = ",".join(ko_genes)
-        print "{}\t{}\t{}\t{}".format(ko_genes, ko_rxn, ko_status, ko_obj)
-
-
-def loop_knockouts(cplex, knockouts_i):
-    cm = cplex.model
-    cm.parameters.lpmethod.set(cm.parameters.lpmethod.values.primal)
-    cm.parameters.preprocessing.reduce.set(3)
-
-    lb_default = {r_i: -cplex_inf if b.lb <= -cplex_inf else b.lb for r_i, b in cplex.i2bounds.iteritems()}
-    ub_default = {r_i: cplex_inf if b.ub >= cplex_inf else b.ub for r_i, b in cplex.i2bounds.iteritems()}
-
-    for i, rxns in enumerate(knockouts_i):
-        new_bounds, bck_ub, bck_lb = [], [], []
-        for r_i in rxns:
-            cplex_bounds = (r_i, 0.0)
-            new_bounds.append(cplex_bounds)
-            bck_lb.append((r_i, lb_default[r_i]))
-            bck_ub.append((r_i, ub_default[r_i]))
-
-        if len(rxns):
-            cm.variables.set_lower_bounds([(r_i, 0.0) for r_i in rxns])
-            cm.variables.set_upper_bounds([(r_i, 0.0) for r_i in rxns])
-
-        cm.solve()
-        status = cm.solution.get_status_string()
-        value = cm.solution.get_objective_value() if cplex_utils.is_optimal(cm) else 0.0
-
-        yield rxns, status, value
-
-        if len(rxns):
-            cm.variables.set_lower_bounds(bck_lb)
-            cm.variables.set_upper_bounds(bck_ub)
-
-def main_simple(cplex, args):
-    cm = cplex.model
-    cm.set_log_stream(sys.stdout)
-    cm.set_error_stream(sys.stdout)
-    cm.set_warning_stream(sys.stdout)
-    cm.set_results_stream(sys.stdout)
-    cm.solve()
-
-    status = cm.solution.get_status_string()
-    value = cm.solution.get_objective_value() if cplex_utils.is_optimal(cm) else 0.0
+    spec = knockout_utils.ProblemSpec(bioopt.matrix(refresh=True), args.objective, backend=args.backend)
+    screen = knockout_utils.WildTypeScreen(prob) if args.screen else None
+    # Different gene knockouts often block the same reactions
+    cache = None
+    if args.gtrass or args.cache:
+        cache = knockout_cache.OutcomeCache(spec.fingerprint(), max_size=args.cache_size, path=args.cache)
+    solve = lambda kos: knockout_utils.run_knockouts(spec, kos, workers=args.workers, chunk_size=args.chunk_size, screen=screen, cache=cache)
+    skip = writer.position if writer else 0
+    knockouts_g_out = itertools.repeat("")
+    if knockouts is None:
+        # Pruning depends on results of smaller knockouts, so written results are read back instead of skipped
+        if skip:
+            solve = knockout_results.resumed(knockout_results.KnockoutResults(args.output, mmap=False), solve)
+        pruned = knockout_utils.PrunedKnockouts(reactions_i, int(args.knockouts), order=args.order)
+        results = pruned.run(solve)
+    else:
+        pruned = None
+        if args.gtrass:
+            # Gene knockouts are consumed both by reaction knockouts and by output
+            knockouts_g, knockouts_g_out = itertools.tee(knockouts(start + skip))
+            knockouts_i = (tuple(sorted(ko)) for ko in geneko2reactionko(prob, knockouts_g, associations, genes))
+        else:
+            knockouts_i = knockouts(start + skip)
+        results = solve(knockouts_i)
+        skip = 0
+
+    if writer is None:
+        print "Genes\tReactions\tStatus\tObjective"
+
+    try:
+        for ko_genes, ko_res in itertools.izip(knockouts_g_out, results):
+            ko_i, ko_status, ko_obj = ko_res
+            if writer is not None:
+                if skip:
+                    skip -= 1
+                else:
+                    writer.write(sorted(item2i[g] for g in ko_genes) if args.gtrass else ko_i, ko_status, ko_obj)
+                continue
+
+            ko_rxn = ",".join([prob.i2rxn[r_i] for r_i in ko_i])
+            ko_genes = ",".join(ko_genes)
+            print "{}\t{}\t{}\t{}".format(ko_genes, ko_rxn, ko_status, ko_obj)
+    finally:
+        if writer is not None:
+            writer.close()
+        if cache is not None:
+            cache.close()
+
+    if writer is not None:
+        sys.stderr.write("Wrote {0} knockouts to {1}\n".format(writer.position, args.output))
+    if cache is not None:
+        sys.stderr.write("Knockout cache: {0} hits, {1} misses\n".format(cache.hits, cache.misses))
+    if pruned is not None:
+        sys.stderr.write("Solved {0} knockouts, pruned {1} knockouts containing lethal knockouts\n".format(pruned.solved, pruned.pruned))
+
+
+def loop_knockouts(prob, knockouts_i):
+    prob.lp.set_method("primal")
+    return knockout_utils.solve_knockouts(prob, knockouts_i)
+
+def main_simple(prob, args):
+    lp = prob.lp
+    lp.set_output(sys.stdout)
+    lp.solve()
+
+    status = lp.status()
+    value = lp.objective_value() if cplex_utils.is_optimal(lp) else 0.0
 
     print "Solution: {} ({})".format(value, status)
 
-    if cplex_utils.is_optimal(cm):
+    if cplex_utils.is_optimal(lp):
         if args.show_fluxes:
             show_all_fluxes = args.show_fluxes == "*"
             if not show_all_fluxes:
                 re_show_fluxes = re.compile(args.show_fluxes, re.M | re.I)
 
-            primal = sorted([(cplex.i2rxn[r_i], val) for r_i, val in enumerate(cm.solution.get_values())], key=_i(0))
+            primal = sorted([(prob.i2rxn[r_i], val) for r_i, val in enumerate(lp.values())], key=_i(0))
 
             print "Fluxes\n==============================="
             for rxn, val in primal:
@@ -139,7 +177,7 @@ def main_simple(cplex, args):
             if not show_all_dual:
                 re_show_dual = re.compile(args.show_dual, re.M | re.I)
 
-            dual = sorted([(cplex.i2cpd[c_i], val) for c_i, val in enumerate(cm.solution.get_dual_values())], key=_i(0))
+            dual = sorted([(prob.i2cpd[c_i], val) for c_i, val in enumerate(lp.dual_values())], key=_i(0))
             print "Dual\n==============================="
             for cpd, val in dual:
                 if val != 0 and (show_all_dual or re_show_dual.search(cpd)):
@@ -155,7 +193,29 @@ if __name__ == "__main__":
     parser.add_argument('--knockouts', dest='knockouts', required=False, action='store', help="Either file or number of knockouts", default=0)
     parser.add_argument('--show-fluxes', dest='show_fluxes', required=False, action='store')
     parser.add_argument('--show-dual', dest='show_dual', required=False, action='store')
+    parser.add_argument('--workers', dest='workers', required=False, type=int, action='store', help="Number of worker processes solving knockouts (default: number of CPUs)", default=None)
+    parser.add_argument('--chunk-size', dest='chunk_size', required=False, type=int, action='store', help="Number of knockouts sent to a worker at once (default: 100)", default=100)
+    parser.add_argument('--prune', dest='prune', required=False, action='store_true', help="Knock out 1 to KNOCKOUTS reactions, skipping knockouts containing lethal knockouts")
+    parser.add_argument('--order', dest='order', required=False, action='store', choices=["lexicographic", "revolving-door"], help="Order of reaction knockouts, in revolving door order consecutive knockouts differ in one reaction (default: lexicographic)", default="lexicographic")
+    parser.add_argument('--no-screen', dest='screen', required=False, action='store_false', help="Solve knockouts of reactions without wild type flux instead of copying wild type objective")
+    parser.add_argument('--output', dest='output', required=False, action='store', help="Write knockout results to a binary file (see knockout_results.KnockoutResults) instead of standard output", default=None)
+    parser.add_argument('--resume', dest='resume', required=False, action='store_true', help="Continue knockouts written to OUTPUT by an interrupted run")
+    parser.add_argument('--checkpoint', dest='checkpoint', required=False, type=float, action='store', help="Seconds between flushes of OUTPUT to disk (default: 60)", default=60)
+    parser.add_argument('--shard', dest='shard', required=False, action='store', help="Solve share I/N of knockouts (I from 0 to N-1), shards can run on different nodes and their OUTPUT files are combined by fba_merge.py", default=None)
+    parser.add_argument('--cache', dest='cache', required=False, action='store', help="SQLite file with outcomes of solved knockouts, shared by runs on the same model", default=None)
+    parser.add_argument('--cache-size', dest='cache_size', required=False, type=int, action='store', help="Number of knockout outcomes cached in memory (default: 100000)", default=100000)
+    parser.add_argument('--backend', dest='backend', required=False, action='store', choices=[b.name for b in lp_backend.backends], help="Linear programming solver (default: first available of {0})".format(", ".join(b.name for b in lp_backend.backends)), default=None)
     args = parser.parse_args()
+    if args.resume and not args.output:
+        parser.error("--resume requires --output")
+    if args.shard:
+        if not re.match("^\d+/\d+$", args.shard):
+            parser.error("--shard must be I/N")
+        args.shard = tuple(int(i) for i in args.shard.split("/"))
+        if args.shard[0] >= args.shard[1]:
+            parser.error("--shard I/N requires I from 0 to N-1")
+        if args.prune:
+            parser.error("--prune can't be combined with --shard, pruning depends on results of all smaller knockouts")
 
     # Read model
     parser = BiooptParser()
@@ -164,11 +224,11 @@ if __name__ == "__main__":
         print "Objective {} not found".format(args.objective)
         exit()
 
-    cplex = cplex_utils.bioopt2cplex(bioopt, objective=args.objective)
-    cplex.model.objective.set_linear(cplex.rxn2i[args.objective], 1.0)
+    prob = cplex_utils.bioopt2cplex(bioopt, objective=args.objective, backend=args.backend)
+    prob.lp.set_objective([(prob.rxn2i[args.objective], 1.0)])
 
     if args.knockouts:
-        main_knockouts(cplex, args)
+        main_knockouts(prob, args)
     else:
-        main_simple(cplex, args)
+        main_simple(prob, args)
 
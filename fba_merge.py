@@ -0,0 +1,23 @@
+import knockout_results
+import argparse
+import sys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Combine knockout results written by shards of a screen (see fba.py --shard)')
+    parser.add_argument('shards', nargs='+', action='store', help='Files written by every shard with fba.py --output')
+    parser.add_argument('--output', dest='output', required=False, action='store', help="Write combined results to a binary file instead of standard output", default=None)
+    args = parser.parse_args()
+
+    try:
+        if args.output:
+            n = knockout_results.merge_shards(args.shards, args.output)
+            sys.stderr.write("Wrote {0} knockouts from {1} shards to {2}\n".format(n, len(args.shards), args.output))
+        else:
+            print "Knockout\tStatus\tObjective"
+            for results in knockout_results.shard_results(args.shards):
+                for ko, status, value in results:
+                    print "{}\t{}\t{}".format(",".join(results.items[i] for i in ko), status, value)
+    except ValueError, ex:
+        sys.stderr.write("{0}\n".format(ex))
+        exit(1)
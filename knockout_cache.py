@@ -0,0 +1,135 @@
+"""
+Cache of knockout outcomes (status and objective value). Outcome is keyed by fingerprint of the problem (see
+:meth:`knockout_utils.ProblemSpec.fingerprint`) and set of knocked out columns, so knockouts mapped to the same
+columns (e.g. different gene knockouts blocking the same reactions) are solved once. Cache can be stored in a SQLite
+file shared by consecutive runs and by different problems.
+"""
+import collections
+import sqlite3
+
+
+_schema = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    fingerprint TEXT NOT NULL,
+    knockout TEXT NOT NULL,
+    status TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (fingerprint, knockout)
+);
+"""
+
+
+class OutcomeCache(object):
+    """
+    Outcomes of knockouts of one problem. Recently used outcomes are kept in memory, least recently used outcome is
+    evicted when there are more than **max_size** of them. With **path** outcomes are also written to SQLite database
+    (in transactions of **commit_interval** outcomes) and outcomes evicted from memory are looked up there.
+
+    Knockouts are keyed by bitsets (integers with bit *i* set for column *i*), order and repetition of columns in
+    knockout don't matter.
+
+    :param fingerprint: Fingerprint of the problem, e.g. :meth:`knockout_utils.ProblemSpec.fingerprint`
+    :param max_size: Number of outcomes kept in memory
+    :param path: Database file (default: outcomes are only kept in memory)
+    :param commit_interval: Number of new outcomes written to database at once
+    :rtype: :class:`OutcomeCache`
+    """
+
+    def __init__(self, fingerprint, max_size=100000, path=None, commit_interval=1000):
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self.__memory = collections.OrderedDict()
+        self.__pending = {}
+        self.connection = None
+
+        if path is not None:
+            self.connection = sqlite3.connect(path)
+            self.connection.text_factory = str
+            self.connection.executescript(_schema)
+
+    @staticmethod
+    def key(knockout):
+        """
+        :param knockout: Iterable of column indices
+        :rtype: int
+        """
+        bits = 0
+        for i in knockout:
+            bits |= 1 << i
+        return bits
+
+    def get(self, knockout):
+        """
+        :param knockout: Iterable of column indices
+        :return: Tuple ``(status, objective value)`` or None if knockout is not in cache
+        """
+        key = self.key(knockout)
+        outcome = self.__memory.pop(key, None)
+        if outcome is None and self.connection is not None:
+            outcome = self.__pending.get(key)
+            if outcome is None:
+                outcome = self.connection.execute("SELECT status, value FROM outcomes WHERE fingerprint = ? AND knockout = ?",
+                                                  (self.fingerprint, "{0:x}".format(key))).fetchone()
+
+        if outcome is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__remember(key, tuple(outcome))
+        return tuple(outcome)
+
+    def put(self, knockout, status, value):
+        """
+        Add outcome of knockout
+
+        :param knockout: Iterable of column indices
+        :param status: Solution status
+        :param value: Objective value
+        """
+        key = self.key(knockout)
+        self.__remember(key, (status, value))
+
+        if self.connection is not None:
+            self.__pending[key] = (status, value)
+            if len(self.__pending) >= self.commit_interval:
+                self.flush()
+
+    def __remember(self, key, outcome):
+        self.__memory.pop(key, None)
+        self.__memory[key] = outcome
+        while len(self.__memory) > self.max_size:
+            self.__memory.popitem(last=False)
+
+    def flush(self):
+        """
+        Write new outcomes to database
+        """
+        if self.connection is None or not self.__pending:
+            return
+
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO outcomes (fingerprint, knockout, status, value) VALUES (?, ?, ?, ?)",
+                                        ((self.fingerprint, "{0:x}".format(key), status, value)
+                                         for key, (status, value) in self.__pending.iteritems()))
+        self.__pending = {}
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        self.flush()
+        self.connection.close()
+        self.connection = None
+
+    def __len__(self):
+        return len(self.__memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
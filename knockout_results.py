@@ -0,0 +1,285 @@
+"""
+Compact binary files of knockout screen results. File starts with a header (magic, version and JSON description:
+knocked out items, status codes, screen parameters) followed by fixed size records: indices of knocked out items
+(padded with the largest index value), status code and objective value as float32. A knockout of up to 3 of less than
+65535 reactions takes 11 bytes.
+
+Records are written in the order of knockouts, so number of complete records is the position of the screen.
+:class:`KnockoutWriter` flushes records to disk periodically and continues an interrupted file when resumed. Files
+of a screen split between processes (see :func:`knockout_utils.shard_range`) are combined by :func:`merge_shards`.
+"""
+import itertools
+import json
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b"BIOOPTKO"
+VERSION = 1
+ALIGNMENT = 64
+
+_header = struct.Struct("<8sII")
+
+#: Statuses with their own codes, other statuses are stored as "other"
+STATUSES = ["optimal", "infeasible", "unbounded", "infeasible or unbounded", "iteration limit",
+            "numerical difficulties", "other"]
+
+
+def record_dtype(size, n_items):
+    """
+    Record of knockout of up to **size** of **n_items** items
+
+    :rtype: numpy.dtype
+    """
+    index = "<u2" if n_items < 0xffff else "<u4"
+    return np.dtype([("knockout", index, (size,)), ("status", "u1"), ("objective", "<f4")])
+
+
+def _read_header(f, path):
+    head = f.read(_header.size)
+    if len(head) < _header.size:
+        raise IOError("File is not a knockout results file: {0}".format(path))
+
+    magic, version, header_length = _header.unpack(head)
+    if magic != MAGIC:
+        raise IOError("File is not a knockout results file: {0}".format(path))
+    if version > VERSION:
+        raise IOError("Knockout results version {0} is not supported (maximum: {1}): {2}".format(version, VERSION, path))
+
+    header = json.loads(f.read(header_length))
+    data_start = (_header.size + header_length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    return header, data_start
+
+
+class KnockoutWriter(object):
+    """
+    Buffered writer of knockout results. Records are collected in a buffer and written in blocks, buffered records
+    are written and file is flushed to disk at least every **checkpoint** seconds. When resumed, incomplete record at the end of the file (left by an
+    interrupted screen) is removed and :attr:`position` is the number of knockouts already written.
+
+    :param path: File path
+    :param items: Names of knocked out items (reactions or genes)
+    :param size: Largest number of items knocked out at once
+    :param description: JSON serializable description of the screen. Resumed file must have the same description.
+    :param resume: Continue existing file (new file is created if it doesn't exist)
+    :param buffer_size: Number of records written at once
+    :param checkpoint: Seconds between flushes to disk
+    :rtype: :class:`KnockoutWriter`
+    """
+
+    def __init__(self, path, items, size, description=None, resume=False, buffer_size=65536, checkpoint=60):
+        self.path = path
+        self.items = list(items)
+        self.size = size
+        self.description = description
+        self.dtype = record_dtype(size, len(self.items))
+        self.checkpoint = checkpoint
+        self.position = 0
+        self.__padding = np.iinfo(self.dtype["knockout"].base).max
+        self.__status_codes = dict((s, i) for i, s in enumerate(STATUSES))
+        self.__buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self.__n = 0
+        self.__last_sync = time.time()
+
+        if resume and os.path.exists(path):
+            with open(path, "rb") as f:
+                header, data_start = _read_header(f, path)
+            if header["size"] != size or header["items"] != self.items or header["description"] != description:
+                raise ValueError("Knockout results in {0} belong to a different screen".format(path))
+
+            self.position = (os.path.getsize(path) - data_start) // self.dtype.itemsize
+            self.file = open(path, "r+b")
+            self.file.truncate(data_start + self.position * self.dtype.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            header = json.dumps({"size": size, "items": self.items, "statuses": STATUSES, "description": description,
+                                 "dtype": self.dtype.descr})
+            data_start = (_header.size + len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+            self.file = open(path, "wb")
+            self.file.write(_header.pack(MAGIC, VERSION, len(header)))
+            self.file.write(header)
+            self.file.write(b"\x00" * (data_start - _header.size - len(header)))
+
+    def write(self, knockout, status, value):
+        """
+        Add knockout result
+
+        :param knockout: Tuple of item indices
+        :param status: Solution status
+        :param value: Objective value
+        """
+        record = self.__buffer[self.__n]
+        record["knockout"][:len(knockout)] = knockout
+        record["knockout"][len(knockout):] = self.__padding
+        record["status"] = self.__status_codes.get(status, len(STATUSES) - 1)
+        record["objective"] = value
+        self.__n += 1
+        self.position += 1
+
+        if self.__n == len(self.__buffer) or time.time() - self.__last_sync >= self.checkpoint:
+            self.flush()
+
+    def write_records(self, records):
+        """
+        Add records read from another file with the same items and knockout size (see :attr:`KnockoutResults.records`)
+
+        :param records: Structured array of records
+        """
+        self.flush()
+        for start in xrange(0, len(records), len(self.__buffer)):
+            self.file.write(np.asarray(records[start:start + len(self.__buffer)], dtype=self.dtype).tostring())
+        self.position += len(records)
+
+    def flush(self, sync=False):
+        """
+        Write buffered records. File is synced to disk if **sync** is set or last sync was more than
+        :attr:`checkpoint` seconds ago.
+        """
+        if self.__n:
+            self.file.write(self.__buffer[:self.__n].tostring())
+            self.__n = 0
+
+        if sync or time.time() - self.__last_sync >= self.checkpoint:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.__last_sync = time.time()
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        self.flush(sync=True)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class KnockoutResults(object):
+    """
+    Knockout results read from a file written by :class:`KnockoutWriter`. Incomplete record at the end of the file is
+    ignored.
+
+    :param path: File path
+    :param mmap: Memory map records (otherwise file is read into memory)
+    :rtype: :class:`KnockoutResults`
+    """
+
+    def __init__(self, path, mmap=True):
+        with open(path, "rb") as f:
+            header, data_start = _read_header(f, path)
+
+        self.path = path
+        self.size = header["size"]
+        self.items = [str(i) for i in header["items"]]
+        self.statuses = [str(s) for s in header["statuses"]]
+        self.description = header["description"]
+        self.dtype = record_dtype(self.size, len(self.items))
+
+        n = (os.path.getsize(path) - data_start) // self.dtype.itemsize
+        if mmap and n:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=data_start, shape=(n,))
+        else:
+            with open(path, "rb") as f:
+                f.seek(data_start)
+                self.records = np.fromfile(f, dtype=self.dtype, count=n)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        """
+        :return: Generator of ``(knockout, status, objective value)`` tuples, knockout is a tuple of item indices
+        """
+        padding = np.iinfo(self.dtype["knockout"].base).max
+        for knockout, status, value in self.records.tolist():
+            yield tuple(i for i in knockout if i != padding), self.statuses[status], value
+
+
+def resumed(results, solve):
+    """
+    Solve function which takes results of the first knockouts from **results** and solves the rest with **solve**.
+    Knockouts must be enumerated in the same order as when results were written. Works with
+    :meth:`knockout_utils.PrunedKnockouts.run`, which calls solve function once for every knockout size.
+
+    :param results: Iterable of ``(knockout, status, objective value)`` tuples (e.g. :class:`KnockoutResults`)
+    :param solve: Function solving iterable of knockouts (see :func:`knockout_utils.run_knockouts`)
+    :rtype: function
+    """
+    stored = iter(results)
+
+    def resumed_solve(knockouts):
+        knockouts = iter(knockouts)
+        for knockout in knockouts:
+            res = next(stored, None)
+            if res is None:
+                for res in solve(itertools.chain([knockout], knockouts)):
+                    yield res
+                return
+
+            if tuple(res[0]) != tuple(knockout):
+                raise ValueError("Stored result of knockout {0} doesn't match enumerated knockout {1}".format(res[0], knockout))
+            yield tuple(knockout), res[1], res[2]
+
+    return resumed_solve
+
+
+
+def shard_results(paths):
+    """
+    Results of all shards of a screen in the order of shards. Shard of every file is in its description (``shard``:
+    index and number of shards, ``start`` and ``stop``: ranks of its knockouts). All shards must be present and
+    complete, otherwise :class:`ValueError` is raised.
+
+    :param paths: Files written by shards (in any order)
+    :rtype: list of :class:`KnockoutResults`
+    """
+    shards = [KnockoutResults(path) for path in paths]
+    if not shards:
+        raise ValueError("No shards to merge")
+
+    first = shards[0]
+    for results in shards:
+        if not results.description or "shard" not in results.description:
+            raise ValueError("{0} is not written by a shard".format(results.path))
+        if results.items != first.items or results.size != first.size or _screen(results.description) != _screen(first.description):
+            raise ValueError("{0} and {1} belong to different screens".format(first.path, results.path))
+
+    shards.sort(key=lambda results: results.description["shard"][0])
+    n = first.description["shard"][1]
+    if [results.description["shard"] for results in shards] != [[i, n] for i in xrange(n)]:
+        raise ValueError("Expected shards 0 to {0} of {1}, got: {2}".format(n - 1, n, ", ".join(
+            "{0}/{1}".format(*results.description["shard"]) for results in shards)))
+
+    for results in shards:
+        expected = results.description["stop"] - results.description["start"]
+        if len(results) != expected:
+            raise ValueError("Shard {0}/{1} is incomplete ({2} of {3} knockouts): {4}".format(
+                results.description["shard"][0], n, len(results), expected, results.path))
+
+    return shards
+
+
+def merge_shards(paths, output):
+    """
+    Combine files written by shards of a screen (see :func:`shard_results`) into one file, as if the screen was run by
+    one process.
+
+    :param paths: Files written by shards (in any order)
+    :param output: Path of the combined file
+    :return: Number of knockouts
+    """
+    shards = shard_results(paths)
+    with KnockoutWriter(output, shards[0].items, shards[0].size, description=_screen(shards[0].description)) as writer:
+        for results in shards:
+            writer.write_records(results.records)
+
+    return writer.position
+
+
+def _screen(description):
+    return dict((k, v) for k, v in description.iteritems() if k not in ("shard", "start", "stop"))
@@ -0,0 +1,549 @@
+"""
+Knockout screening of flux balance problems (see :class:`cplex_utils.FbaProblem`). Knockouts are tuples of column
+indices, knocked out columns have both bounds set to zero. Stream of knockouts can be split into chunks solved by
+worker processes, each worker creates its own problem once from a :class:`ProblemSpec`. Knockouts which can't change
+the objective are found from the wild type solution (see :class:`WildTypeScreen`) and are not solved. Knockouts
+containing lethal knockouts are not enumerated (see :class:`PrunedKnockouts`). Large screens can be split by
+combination rank between independent processes (see :func:`shard_range`). Outcomes can be cached between runs (see
+:class:`knockout_cache.OutcomeCache`).
+"""
+from collections import namedtuple
+from knockout_cache import OutcomeCache
+from list_utils import chunks
+from lp_backend import LpBackend
+import collections
+import cplex_utils
+import hashlib
+import itertools
+import multiprocessing
+import numpy as np
+
+
+class ProblemSpec(namedtuple("ProblemSpec", ["matrix", "objective", "split_reversible", "backend"])):
+    """
+    Picklable description of a flux balance problem (see :func:`cplex_utils.bioopt2cplex`)
+
+    :param matrix: :class:`model_matrix.ModelMatrix`
+    :param objective: Objective reaction (maximized)
+    :param split_reversible: Split reversible reactions
+    :param backend: Linear programming backend
+    """
+    __slots__ = ()
+
+    def __new__(cls, matrix, objective, split_reversible=False, backend=None):
+        return super(ProblemSpec, cls).__new__(cls, matrix, objective, split_reversible, backend)
+
+    def create(self):
+        """
+        :rtype: :class:`cplex_utils.FbaProblem`
+        """
+        prob = cplex_utils.bioopt2cplex(self.matrix, split_reversible=self.split_reversible, objective=self.objective,
+                                        backend=self.backend)
+        prob.lp.set_objective([(prob.rxn2i[self.objective], 1.0)])
+        prob.lp.set_method("primal")
+        return prob
+
+    def fingerprint(self):
+        """
+        Digest of model (see :meth:`model_matrix.ModelMatrix.fingerprint`) and problem parameters
+
+        :return: Hexadecimal MD5 digest
+        """
+        return hashlib.md5(repr((self.matrix.fingerprint(), self.objective, self.split_reversible, self.backend))).hexdigest()
+
+
+class WildTypeScreen(object):
+    """
+    Knockouts which can't change the objective. Wild type problem is solved once: if all knocked out columns have zero
+    flux in an optimal wild type solution, this solution is feasible for the knockout and the knockout has the wild
+    type objective value. This also holds for multiple knockouts.
+
+    Optimal solutions are often not unique, so a second optimum with as few non-zero fluxes as possible is searched
+    (unless **minimize_flux** is False): columns with zero flux are fixed at zero, other columns keep the direction of
+    wild type flux, objective is fixed at the wild type optimum and the sum of absolute fluxes is minimized. Columns
+    with zero flux in this solution are added to the screen. This is one linear program, while a complete flux
+    variability analysis would need as many as the knockouts it could screen.
+
+    Problem bounds and objective are restored after screening.
+
+    :param prob: :class:`cplex_utils.FbaProblem` with objective set
+    :param tolerance: Fluxes with smaller absolute value are zero
+    :param minimize_flux: Search for an optimum with fewer non-zero fluxes
+    :rtype: :class:`WildTypeScreen`
+    """
+
+    def __init__(self, prob, tolerance=1e-6, minimize_flux=True):
+        lp = prob.lp
+        lp.solve()
+        self.status = lp.status()
+        self.value = lp.objective_value() if cplex_utils.is_optimal(lp) else 0.0
+        self.zero = np.zeros(prob.rxnnum, dtype=np.bool_)
+
+        # Knockouts of infeasible or unbounded wild type still have to be solved
+        if not cplex_utils.is_optimal(lp):
+            return
+
+        fluxes = np.array(lp.values())
+        self.zero = np.abs(fluxes) <= tolerance
+        if minimize_flux:
+            self.zero |= self.__minimal_flux_zero(prob, fluxes, tolerance)
+
+    def __minimal_flux_zero(self, prob, fluxes, tolerance):
+        lp = prob.lp
+        c = np.array(lp.objective())
+        objective = np.flatnonzero(c)
+        if len(objective) != 1:
+            return np.zeros(len(fluxes), dtype=np.bool_)
+
+        lb, ub = np.array(lp.lower_bounds()), np.array(lp.upper_bounds())
+        new_lb = np.where(fluxes > tolerance, np.maximum(lb, 0.0), lb)
+        new_ub = np.where(fluxes < -tolerance, np.minimum(ub, 0.0), ub)
+        new_lb[self.zero] = 0.0
+        new_ub[self.zero] = 0.0
+
+        # Objective column is kept at the wild type optimum (up to relative tolerance)
+        o = objective[0]
+        target = fluxes[o] - tolerance * max(1.0, abs(fluxes[o]))*np.sign(c[o])
+        if c[o] > 0:
+            new_lb[o] = min(target, new_ub[o])
+        else:
+            new_ub[o] = max(target, new_lb[o])
+
+        try:
+            lp.set_lower_bounds(enumerate(new_lb.tolist()))
+            lp.set_upper_bounds(enumerate(new_ub.tolist()))
+            # Slightly different weights make the optimum unique (equal alternative routes are not mixed)
+            weights = 1.0 + 1e-3*np.arange(len(fluxes))/len(fluxes)
+            lp.set_objective(enumerate((-np.sign(fluxes) * weights * (~self.zero)).tolist()))
+            lp.solve()
+            if not cplex_utils.is_optimal(lp):
+                return np.zeros(len(fluxes), dtype=np.bool_)
+            return np.abs(np.array(lp.values())) <= tolerance
+        finally:
+            lp.set_lower_bounds(enumerate(lb.tolist()))
+            lp.set_upper_bounds(enumerate(ub.tolist()))
+            lp.set_objective(enumerate(c.tolist()))
+
+    def unaffected(self, knockout):
+        """
+        Check whether knockout keeps the wild type objective value
+
+        :param knockout: Tuple of column indices
+        :rtype: bool
+        """
+        return all(self.zero[r_i] for r_i in knockout)
+
+
+def revolving_door(items, k, start=0):
+    """
+    Combinations of **k** items in revolving door order (Knuth, TAOCP 7.2.1.3, Algorithm R): consecutive combinations
+    differ in one item, so only bounds of two reactions change between consecutive knockouts. Items in every
+    combination are in the order of **items**.
+
+    :param items: List of items
+    :param k: Number of items in combination
+    :param start: Rank of the first combination
+    :rtype: generator of tuples
+    """
+    items = list(items)
+    n = len(items)
+    if start >= n_combinations(n, k):
+        return
+    if k == 0:
+        yield ()
+        return
+    if k == 1:
+        for item in items[start:]:
+            yield (item,)
+        return
+
+    # c[1] < c[2] < ... < c[k] are item positions, c[k+1] = n is a sentinel
+    c = [None] + _unrank_revolving_door(n, k, start) + [n]
+    while True:
+        yield tuple(items[c[j]] for j in xrange(1, k + 1))
+
+        # Easy cases move c[1] only
+        if k % 2:
+            if c[1] + 1 < c[2]:
+                c[1] += 1
+                continue
+            decrease = True
+        else:
+            if c[1] > 0:
+                c[1] -= 1
+                continue
+            decrease = False
+
+        j = 2
+        while True:
+            if decrease:
+                if c[j] >= j:
+                    c[j] = c[j-1]
+                    c[j-1] = j - 2
+                    break
+                j += 1
+
+            if c[j] + 1 < c[j+1]:
+                c[j-1] = c[j]
+                c[j] += 1
+                break
+            j += 1
+            if j > k:
+                return
+            decrease = True
+
+
+def solve_knockouts(prob, knockouts, screen=None, warm_start=True, cache=None):
+    """
+    Solve knockouts one by one on the same problem. Only bounds of columns which differ from the previous knockout are
+    changed (see :func:`revolving_door` for an order in which consecutive knockouts differ in one column), default
+    bounds of knocked out columns are restored when generator is finished or closed.
+
+    :param prob: :class:`cplex_utils.FbaProblem`
+    :param knockouts: Iterable of column index tuples
+    :param screen: :class:`WildTypeScreen`, knockouts which don't change the objective are not solved
+    :param warm_start: Start every solution from the basis of the previous knockout (backends without basis information
+            ignore it)
+    :param cache: :class:`knockout_cache.OutcomeCache`, cached knockouts are not solved and outcomes of solved
+            knockouts are added
+    :return: Generator of ``(knockout, status, objective value)`` tuples, objective is 0 if solution is not optimal
+    """
+    lp = prob.lp
+    lb_default = prob.lb.tolist()
+    ub_default = prob.ub.tolist()
+    current = set()
+    basis = None
+
+    try:
+        for rxns in knockouts:
+            if screen is not None and screen.unaffected(rxns):
+                yield rxns, screen.status, screen.value
+                continue
+            if cache is not None:
+                outcome = cache.get(rxns)
+                if outcome is not None:
+                    yield rxns, outcome[0], outcome[1]
+                    continue
+
+            target = set(rxns)
+            restore = sorted(current - target)
+            knock = sorted(target - current)
+            if restore:
+                lp.set_lower_bounds([(r_i, lb_default[r_i]) for r_i in restore])
+                lp.set_upper_bounds([(r_i, ub_default[r_i]) for r_i in restore])
+            if knock:
+                lp.set_lower_bounds([(r_i, 0.0) for r_i in knock])
+                lp.set_upper_bounds([(r_i, 0.0) for r_i in knock])
+            current = target
+
+            if warm_start and basis is not None:
+                lp.set_basis(basis)
+            lp.solve()
+            status = lp.status()
+            value = lp.objective_value() if cplex_utils.is_optimal(lp) else 0.0
+            if warm_start:
+                basis = lp.basis()
+            if cache is not None:
+                cache.put(rxns, status, value)
+
+            yield rxns, status, value
+    finally:
+        restore = sorted(current)
+        lp.set_lower_bounds([(r_i, lb_default[r_i]) for r_i in restore])
+        lp.set_upper_bounds([(r_i, ub_default[r_i]) for r_i in restore])
+
+
+class PrunedKnockouts(object):
+    """
+    Knockouts of 1 to **max_size** reactions enumerated in increasing size. Knockout is lethal if it has no optimal
+    solution or its objective is not larger than **threshold**. Knockouts containing a lethal knockout are lethal too
+    (knocking out more reactions can't increase the objective), so they are not enumerated. Lethal knockouts are stored
+    as bitsets (integers with bit *i* set for *i*-th reaction), every knockout is checked by looking up bitsets of its
+    subsets.
+
+    Results of all knockouts of one size must be recorded (see :meth:`record`) before knockouts of the next size are
+    enumerated, :meth:`run` does this.
+
+    :param reactions: Column indices of reactions which can be knocked out
+    :param max_size: Largest number of reactions knocked out at once
+    :param threshold: Largest objective value of lethal knockout
+    :param order: Order of knockouts of the same size, "lexicographic" or "revolving-door" (see
+            :func:`revolving_door`)
+    :rtype: :class:`PrunedKnockouts`
+    """
+
+    def __init__(self, reactions, max_size, threshold=1e-6, order="lexicographic"):
+        self.reactions = list(reactions)
+        self.max_size = max_size
+        self.threshold = threshold
+        self.order = order
+        self.lethal = set()
+        self.solved = 0
+        self.pruned = 0
+        self.__bits = dict((r_i, 1 << i) for i, r_i in enumerate(self.reactions))
+        self.__lethal_sizes = set()
+
+    def bitset(self, knockout):
+        """
+        :param knockout: Tuple of column indices
+        :rtype: int
+        """
+        bits = 0
+        for r_i in knockout:
+            bits |= self.__bits[r_i]
+        return bits
+
+    def is_lethal(self, status, value):
+        return status != LpBackend.OPTIMAL or value <= self.threshold
+
+    def record(self, knockout, status, value):
+        """
+        Record result of a knockout
+        """
+        self.solved += 1
+        if self.is_lethal(status, value):
+            self.lethal.add(self.bitset(knockout))
+            self.__lethal_sizes.add(len(knockout))
+
+    def knockouts(self, size):
+        """
+        Knockouts of **size** reactions which don't contain lethal knockouts. Generator must be consumed completely,
+        number of skipped knockouts is added to :attr:`pruned` at the end.
+
+        :rtype: generator of column index tuples
+        """
+        lethal = self.lethal
+        bits = self.__bits
+        viable = [r_i for r_i in self.reactions if bits[r_i] not in lethal]
+        sizes = sorted(k for k in self.__lethal_sizes if 1 < k < size)
+
+        enumerated = 0
+        for knockout in combinations(viable, size, self.order):
+            knockout_bits = [bits[r_i] for r_i in knockout]
+            if any(sum(subset) in lethal for k in sizes for subset in itertools.combinations(knockout_bits, k)):
+                continue
+
+            enumerated += 1
+            yield knockout
+
+        self.pruned += n_combinations(len(self.reactions), size) - enumerated
+
+    def run(self, solve):
+        """
+        Enumerate and solve knockouts of all sizes
+
+        :param solve: Function solving iterable of knockouts, e.g. ``lambda kos: run_knockouts(spec, kos)``, returning
+                ``(knockout, status, objective value)`` tuples
+        :return: Generator of ``(knockout, status, objective value)`` tuples of enumerated knockouts
+        """
+        for size in xrange(1, self.max_size + 1):
+            for rxns, status, value in solve(self.knockouts(size)):
+                self.record(rxns, status, value)
+                yield rxns, status, value
+
+
+def combinations(items, k, order="lexicographic", start=0, stop=None):
+    """
+    Combinations of **k** items with ranks from **start** to **stop** (exclusive) in the given order. Combinations
+    before **start** are not enumerated, so a range of ranks is a cheap share of a large screen (see
+    :func:`shard_range`).
+
+    :param order: "lexicographic" (same as :func:`itertools.combinations`) or "revolving-door" (see
+            :func:`revolving_door`)
+    :param start: Rank of the first combination
+    :param stop: Rank after the last combination (default: all combinations)
+    :rtype: iterator of tuples
+    """
+    if order == "lexicographic":
+        if start == 0:
+            combs = itertools.combinations(items, k)
+        else:
+            combs = _lexicographic(items, k, start)
+    elif order == "revolving-door":
+        combs = revolving_door(items, k, start)
+    else:
+        raise ValueError("Unknown order of combinations '{0}'".format(order))
+
+    if stop is not None:
+        combs = itertools.islice(combs, max(0, stop - start))
+    return combs
+
+
+def shard_range(total, shard, shards):
+    """
+    Ranks of combinations solved by one of independent processes sharing a screen. Shards are consecutive ranges of
+    (almost) equal size, together they cover all **total** combinations.
+
+    :param total: Number of combinations
+    :param shard: Shard index (0 to **shards** - 1)
+    :param shards: Number of shards
+    :return: Tuple ``(start, stop)``
+    """
+    if not 0 <= shard < shards:
+        raise ValueError("Shard {0} is not in range 0 to {1}".format(shard, shards - 1))
+
+    return total * shard // shards, total * (shard + 1) // shards
+
+
+def _lexicographic(items, k, start):
+    items = list(items)
+    n = len(items)
+    if start >= n_combinations(n, k):
+        return
+
+    # Unrank: count combinations skipped by every choice of the next position
+    c = []
+    x = 0
+    for i in xrange(k):
+        # Combinations with c[i] = x, updated as x advances: C(m - 1, r) = C(m, r) * (m - r) / m
+        skipped = n_combinations(n - x - 1, k - i - 1)
+        while skipped <= start:
+            start -= skipped
+            skipped = skipped * (n - x - 1 - (k - i - 1)) // (n - x - 1)
+            x += 1
+        c.append(x)
+        x += 1
+
+    while True:
+        yield tuple(items[i] for i in c)
+
+        i = k - 1
+        while i >= 0 and c[i] == n - k + i:
+            i -= 1
+        if i < 0:
+            return
+        c[i] += 1
+        for j in xrange(i + 1, k):
+            c[j] = c[j-1] + 1
+
+
+def _unrank_revolving_door(n, k, rank):
+    # Rank of c[1] < ... < c[k] is sum((-1)**(k-i) * (C(c[i]+1, i) - 1)) (Kreher & Stinson, Algorithm 2.12)
+    c = [0] * k
+    x = n
+    below = n_combinations(n, k)
+    for i in xrange(k, 0, -1):
+        # below = C(x, i), updated as x decreases: C(x - 1, i) = C(x, i) * (x - i) / x
+        while below > rank:
+            below = below * (x - i) // x
+            x -= 1
+        c[i-1] = x
+        # C(x + 1, i) = C(x, i) + C(x, i - 1)
+        smaller = n_combinations(x, i - 1)
+        rank = below + smaller - rank - 1
+        below = smaller
+
+    return c
+
+
+def n_combinations(n, k):
+    """
+    Number of combinations of **k** of **n** items
+
+    :rtype: int
+    """
+    if k < 0 or k > n:
+        return 0
+
+    k = min(k, n - k)
+    count = 1
+    for i in xrange(k):
+        count = count * (n - i) // (i + 1)
+    return count
+
+
+_worker_problem = None
+
+
+def _init_worker(spec):
+    global _worker_problem
+    _worker_problem = spec.create()
+
+
+def _solve_chunk(knockouts):
+    return [(status, value) for rxns, status, value in solve_knockouts(_worker_problem, knockouts)]
+
+
+def run_knockouts(spec, knockouts, workers=None, chunk_size=100, screen=None, cache=None):
+    """
+    Solve stream of knockouts in worker processes. Knockouts are sent to workers in chunks, at most two chunks per
+    worker are queued at a time, so **knockouts** can be a long generator (e.g. ``itertools.combinations``).
+
+    :param spec: :class:`ProblemSpec`
+    :param knockouts: Iterable of column index tuples
+    :param workers: Number of worker processes (default: number of CPUs). With one worker knockouts are solved in the
+            current process.
+    :param chunk_size: Number of knockouts sent to a worker at once
+    :param screen: :class:`WildTypeScreen`, knockouts which don't change the objective are not sent to workers
+    :param cache: :class:`knockout_cache.OutcomeCache` of the problem (see :meth:`ProblemSpec.fingerprint`), cached
+            knockouts are not sent to workers. Cache is used by the current process only. Knockouts repeated while
+            they are queued are sent to workers once.
+    :return: Generator of ``(knockout, status, objective value)`` tuples in the order of **knockouts**
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if workers <= 1:
+        for res in solve_knockouts(spec.create(), knockouts, screen, cache=cache):
+            yield res
+        return
+
+    # Knockouts sent to workers by key (see OutcomeCache.key): outcome (once collected) and number of occurrences
+    # not yet collected. Repeated knockouts are solved once.
+    in_flight = {}
+
+    def submit(chunk):
+        outcomes = []
+        solve = []
+        for rxns in chunk:
+            if screen is not None and screen.unaffected(rxns):
+                outcomes.append((screen.status, screen.value))
+                continue
+
+            key = OutcomeCache.key(rxns)
+            if key not in in_flight:
+                outcome = cache.get(rxns) if cache is not None else None
+                if outcome is not None:
+                    outcomes.append(outcome)
+                    continue
+                in_flight[key] = [None, 0]
+                solve.append(rxns)
+            in_flight[key][1] += 1
+            outcomes.append(key)
+
+        return chunk, outcomes, pool.apply_async(_solve_chunk, (solve,))
+
+    def collect(chunk, outcomes, result):
+        solved = iter(result.get())
+        for rxns, outcome in zip(chunk, outcomes):
+            if not isinstance(outcome, tuple):
+                key = outcome
+                entry = in_flight[key]
+                if entry[0] is None:
+                    entry[0] = next(solved)
+                    if cache is not None:
+                        cache.put(rxns, *entry[0])
+                elif cache is not None:
+                    # Repeated knockout is a cache hit, as when knockouts are solved in one process
+                    cache.get(rxns)
+                outcome = entry[0]
+                entry[1] -= 1
+                if not entry[1]:
+                    del in_flight[key]
+            yield rxns, outcome[0], outcome[1]
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(spec,))
+    try:
+        pending = collections.deque()
+        for chunk in chunks(knockouts, chunk_size):
+            pending.append(submit(chunk))
+            if len(pending) >= 2*workers:
+                for res in collect(*pending.popleft()):
+                    yield res
+
+        while pending:
+            for res in collect(*pending.popleft()):
+                yield res
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,41 @@
+import itertools
+
+
+def chunkify(lst, n, jumpy=False):
+    """
+    Split list into **n** chunks of (almost) equal size
+
+    :param lst: List
+    :param n: Number of chunks
+    :param jumpy: Take every n-th element into a chunk (otherwise chunks are consecutive slices)
+    :rtype: list of lists
+    """
+    if jumpy:
+        return [lst[i::n] for i in xrange(n)]
+
+    avg = len(lst) / float(n)
+    out = []
+    last = 0.0
+
+    while last < len(lst):
+        out.append(lst[int(last):int(last + avg)])
+        last += avg
+
+    return out
+
+
+def chunks(iterable, size):
+    """
+    Split iterable into consecutive lists of **size** elements (last list can be shorter). Iterable is consumed lazily,
+    so it can be a generator of unknown length.
+
+    :param iterable: Iterable
+    :param size: Number of elements in a chunk
+    :rtype: generator of lists
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,542 @@
+"""
+Solver independent interface to linear programs used by flux balance analysis (see :class:`cplex_utils.FbaProblem`).
+Problems have equality constraints ``A * x = rhs`` and variable bounds ``lb <= x <= ub``. Infinite bounds are always
+given as ``float("inf")``, backends translate them to their own representation.
+"""
+import numpy as np
+
+inf = float("inf")
+
+
+class LpBackend(object):
+    """
+    Linear program solved by a specific solver. Rows are constraints (metabolites) and columns are variables
+    (reactions). Bounds and objective coefficients are read and updated as lists of ``(index, value)`` pairs.
+
+    :param A: Constraint matrix (``scipy.sparse`` matrix, rows x columns)
+    :param lb: Lower bounds of columns
+    :param ub: Upper bounds of columns
+    :param c: Objective coefficients of columns
+    :param rhs: Right hand sides of rows (default: zeros)
+    :param row_names: Names of rows
+    :param column_names: Names of columns
+    :param maximize: Maximize objective (otherwise minimize)
+    """
+    name = None
+
+    #: Status of solved problem with an optimal solution
+    OPTIMAL = "optimal"
+
+    def __init__(self, A, lb, ub, c, rhs=None, row_names=None, column_names=None, maximize=True):
+        raise NotImplementedError()
+
+    @staticmethod
+    def available():
+        """
+        Check whether solver used by the backend can be imported
+
+        :rtype: bool
+        """
+        raise NotImplementedError()
+
+    @property
+    def n_rows(self):
+        raise NotImplementedError()
+
+    @property
+    def n_columns(self):
+        raise NotImplementedError()
+
+    def row_names(self):
+        raise NotImplementedError()
+
+    def column_names(self):
+        raise NotImplementedError()
+
+    def lower_bounds(self, indices=None):
+        """
+        :param indices: Column indices (default: all columns)
+        :rtype: list of float
+        """
+        raise NotImplementedError()
+
+    def upper_bounds(self, indices=None):
+        """
+        :param indices: Column indices (default: all columns)
+        :rtype: list of float
+        """
+        raise NotImplementedError()
+
+    def set_lower_bounds(self, bounds):
+        """
+        :param bounds: List of ``(index, value)`` pairs
+        """
+        raise NotImplementedError()
+
+    def set_upper_bounds(self, bounds):
+        """
+        :param bounds: List of ``(index, value)`` pairs
+        """
+        raise NotImplementedError()
+
+    def objective(self):
+        """
+        Objective coefficients of all columns
+
+        :rtype: list of float
+        """
+        raise NotImplementedError()
+
+    def set_objective(self, coefficients):
+        """
+        Change objective coefficients. Coefficients of other columns are not changed.
+
+        :param coefficients: List of ``(index, value)`` pairs
+        """
+        raise NotImplementedError()
+
+    def set_maximize(self, maximize):
+        """
+        :param maximize: Maximize objective (otherwise minimize)
+        """
+        raise NotImplementedError()
+
+    def column(self, index):
+        """
+        Non-zero coefficients of a column
+
+        :return: Tuple of row indices and coefficients
+        """
+        raise NotImplementedError()
+
+    def add_column(self, rows, values, lb=0.0, ub=inf, obj=0.0, name=None):
+        """
+        Add column at the end of the problem
+
+        :param rows: Row indices of non-zero coefficients
+        :param values: Non-zero coefficients
+        :return: Index of added column
+        """
+        raise NotImplementedError()
+
+    def delete_column(self, index):
+        """
+        Remove column. Indices of following columns are decreased by one.
+        """
+        raise NotImplementedError()
+
+    def set_method(self, method):
+        """
+        Select algorithm used to solve problem. Backends which don't support selected algorithm ignore it.
+
+        :param method: "auto", "primal", "dual" or "barrier"
+        """
+        pass
+
+    def set_output(self, stream):
+        """
+        Send solver log to stream
+
+        :param stream: File object (None to disable log)
+        """
+        pass
+
+    def solve(self):
+        raise NotImplementedError()
+
+    def status(self):
+        """
+        Status of the last solution (:data:`OPTIMAL` if optimal solution was found, otherwise solver specific
+        description)
+
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def is_optimal(self):
+        return self.status() == LpBackend.OPTIMAL
+
+    def objective_value(self):
+        raise NotImplementedError()
+
+    def values(self, indices=None):
+        """
+        Primal values of the last solution
+
+        :param indices: Column indices (default: all columns)
+        :rtype: list of float
+        """
+        raise NotImplementedError()
+
+    def dual_values(self):
+        """
+        Dual values of rows in the last solution
+
+        :rtype: list of float
+        """
+        raise NotImplementedError()
+
+    def basis(self):
+        """
+        Basis of the last solution which can be used to warm start a similar problem (see :meth:`set_basis`). Backends
+        without basis information return None.
+        """
+        return None
+
+    def set_basis(self, basis):
+        """
+        Start next :meth:`solve` from a basis returned by :meth:`basis`. Backends without basis information ignore it.
+        """
+        pass
+
+    def copy(self):
+        """
+        Independent copy of the problem created in memory. Solution of the problem is not copied.
+
+        :rtype: :class:`LpBackend`
+        """
+        raise NotImplementedError()
+
+
+class CplexBackend(LpBackend):
+    """
+    Backend using IBM ILOG CPLEX Python API
+    """
+    name = "cplex"
+
+    _methods = {"auto": 0, "primal": 1, "dual": 2, "barrier": 4}
+
+    def __init__(self, A, lb, ub, c, rhs=None, row_names=None, column_names=None, maximize=True):
+        import cplex
+
+        A = A.tocoo()
+        A.sum_duplicates()
+        n_rows, n_columns = A.shape
+        prob = cplex.Cplex()
+        prob.objective.set_sense(prob.objective.sense.maximize if maximize else prob.objective.sense.minimize)
+        prob.linear_constraints.add(rhs=[0.0]*n_rows if rhs is None else np.asarray(rhs, dtype=np.float64).tolist(),
+                                    senses="E"*n_rows, names=list(row_names) if row_names is not None else None)
+        prob.variables.add(lb=self.__to_cplex(lb), ub=self.__to_cplex(ub), obj=np.asarray(c, dtype=np.float64).tolist(),
+                           names=list(column_names) if column_names is not None else None)
+
+        # All non-zero coefficients are set in one call instead of creating a sparse pair for every column
+        prob.linear_constraints.set_coefficients(zip(A.row.tolist(), A.col.tolist(), A.data.tolist()))
+
+        prob.parameters.advance.set(0)
+        prob.set_log_stream(None)
+        prob.set_error_stream(None)
+        prob.set_warning_stream(None)
+        prob.set_results_stream(None)
+
+        self.cplex = prob
+
+    @staticmethod
+    def available():
+        try:
+            import cplex
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def __to_cplex(values):
+        import cplex
+        return np.clip(np.asarray(values, dtype=np.float64), -cplex.infinity, cplex.infinity).tolist()
+
+    @staticmethod
+    def __from_cplex(values):
+        import cplex
+        return [inf if v >= cplex.infinity else -inf if v <= -cplex.infinity else v for v in values]
+
+    @property
+    def n_rows(self):
+        return self.cplex.linear_constraints.get_num()
+
+    @property
+    def n_columns(self):
+        return self.cplex.variables.get_num()
+
+    def row_names(self):
+        return self.cplex.linear_constraints.get_names()
+
+    def column_names(self):
+        return self.cplex.variables.get_names()
+
+    def lower_bounds(self, indices=None):
+        v = self.cplex.variables
+        return self.__from_cplex(v.get_lower_bounds() if indices is None else v.get_lower_bounds(list(indices)))
+
+    def upper_bounds(self, indices=None):
+        v = self.cplex.variables
+        return self.__from_cplex(v.get_upper_bounds() if indices is None else v.get_upper_bounds(list(indices)))
+
+    def set_lower_bounds(self, bounds):
+        bounds = list(bounds)
+        if bounds:
+            self.cplex.variables.set_lower_bounds(zip((i for i, v in bounds), self.__to_cplex([v for i, v in bounds])))
+
+    def set_upper_bounds(self, bounds):
+        bounds = list(bounds)
+        if bounds:
+            self.cplex.variables.set_upper_bounds(zip((i for i, v in bounds), self.__to_cplex([v for i, v in bounds])))
+
+    def objective(self):
+        return self.cplex.objective.get_linear()
+
+    def set_objective(self, coefficients):
+        coefficients = list(coefficients)
+        if coefficients:
+            self.cplex.objective.set_linear(coefficients)
+
+    def set_maximize(self, maximize):
+        sense = self.cplex.objective.sense
+        self.cplex.objective.set_sense(sense.maximize if maximize else sense.minimize)
+
+    def column(self, index):
+        column = self.cplex.variables.get_cols(index)
+        return column.ind, column.val
+
+    def add_column(self, rows, values, lb=0.0, ub=inf, obj=0.0, name=None):
+        import cplex
+
+        self.cplex.variables.add(lb=self.__to_cplex([lb]), ub=self.__to_cplex([ub]), obj=[obj],
+                                 names=[name] if name is not None else None,
+                                 columns=[cplex.SparsePair(list(rows), list(values))])
+        return self.n_columns - 1
+
+    def delete_column(self, index):
+        self.cplex.variables.delete(index)
+
+    def set_method(self, method):
+        self.cplex.parameters.lpmethod.set(CplexBackend._methods[method])
+
+    def set_output(self, stream):
+        self.cplex.set_log_stream(stream)
+        self.cplex.set_error_stream(stream)
+        self.cplex.set_warning_stream(stream)
+        self.cplex.set_results_stream(stream)
+
+    def solve(self):
+        self.cplex.solve()
+
+    def status(self):
+        return self.cplex.solution.get_status_string()
+
+    def objective_value(self):
+        return self.cplex.solution.get_objective_value()
+
+    def values(self, indices=None):
+        s = self.cplex.solution
+        return s.get_values() if indices is None else s.get_values(list(indices))
+
+    def dual_values(self):
+        return self.cplex.solution.get_dual_values()
+
+    def basis(self):
+        try:
+            return self.cplex.solution.basis.get_basis()
+        except Exception:
+            return None
+
+    def set_basis(self, basis):
+        if basis is not None:
+            self.cplex.parameters.advance.set(1)
+            self.cplex.start.set_start(col_status=basis[0], row_status=basis[1], col_primal=[], row_primal=[],
+                                       col_dual=[], row_dual=[])
+
+    def copy(self):
+        import cplex
+
+        # Copy constructor copies problem data, but not parameters and streams
+        prob = cplex.Cplex(self.cplex)
+        prob.parameters.lpmethod.set(self.cplex.parameters.lpmethod.get())
+        prob.parameters.advance.set(self.cplex.parameters.advance.get())
+        prob.set_log_stream(None)
+        prob.set_error_stream(None)
+        prob.set_warning_stream(None)
+        prob.set_results_stream(None)
+
+        other = CplexBackend.__new__(CplexBackend)
+        other.cplex = prob
+        return other
+
+
+class ScipyBackend(LpBackend):
+    """
+    Backend using :func:`scipy.optimize.linprog`. HiGHS solvers are used when they are available (scipy 1.6 and newer),
+    otherwise the interior point method. Linprog doesn't expose a basis, so problems are always solved from scratch.
+    Dual values are only available with HiGHS.
+    """
+    name = "scipy"
+
+    _statuses = {0: LpBackend.OPTIMAL, 1: "iteration limit", 2: "infeasible", 3: "unbounded", 4: "numerical difficulties"}
+    _highs_methods = {"auto": "highs", "primal": "highs-ds", "dual": "highs-ds", "barrier": "highs-ipm"}
+
+    def __init__(self, A, lb, ub, c, rhs=None, row_names=None, column_names=None, maximize=True):
+        import scipy.sparse
+
+        self.A = scipy.sparse.csc_matrix(A, dtype=np.float64)
+        n_rows, n_columns = self.A.shape
+        self.lb = np.array(lb, dtype=np.float64)
+        self.ub = np.array(ub, dtype=np.float64)
+        self.c = np.array(c, dtype=np.float64)
+        self.rhs = np.zeros(n_rows) if rhs is None else np.array(rhs, dtype=np.float64)
+        self.__row_names = list(row_names) if row_names is not None else [None]*n_rows
+        self.__column_names = list(column_names) if column_names is not None else [None]*n_columns
+        self.maximize = maximize
+        self.method = "highs" if ScipyBackend.__has_highs() else "interior-point"
+        self.__result = None
+
+    @staticmethod
+    def available():
+        try:
+            import scipy.optimize
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def __has_highs():
+        import scipy
+        from distutils.version import LooseVersion
+        return LooseVersion(scipy.__version__) >= LooseVersion("1.6")
+
+    @property
+    def n_rows(self):
+        return self.A.shape[0]
+
+    @property
+    def n_columns(self):
+        return self.A.shape[1]
+
+    def row_names(self):
+        return list(self.__row_names)
+
+    def column_names(self):
+        return list(self.__column_names)
+
+    def lower_bounds(self, indices=None):
+        return (self.lb if indices is None else self.lb[list(indices)]).tolist()
+
+    def upper_bounds(self, indices=None):
+        return (self.ub if indices is None else self.ub[list(indices)]).tolist()
+
+    def set_lower_bounds(self, bounds):
+        for i, v in bounds:
+            self.lb[i] = v
+
+    def set_upper_bounds(self, bounds):
+        for i, v in bounds:
+            self.ub[i] = v
+
+    def objective(self):
+        return self.c.tolist()
+
+    def set_objective(self, coefficients):
+        for i, v in coefficients:
+            self.c[i] = v
+
+    def set_maximize(self, maximize):
+        self.maximize = maximize
+
+    def column(self, index):
+        start, end = self.A.indptr[index], self.A.indptr[index+1]
+        return self.A.indices[start:end].tolist(), self.A.data[start:end].tolist()
+
+    def add_column(self, rows, values, lb=0.0, ub=inf, obj=0.0, name=None):
+        import scipy.sparse
+
+        column = scipy.sparse.csc_matrix((list(values), (list(rows), [0]*len(rows))), shape=(self.n_rows, 1))
+        self.A = scipy.sparse.hstack([self.A, column], format="csc")
+        self.lb = np.append(self.lb, lb)
+        self.ub = np.append(self.ub, ub)
+        self.c = np.append(self.c, obj)
+        self.__column_names.append(name)
+        return self.n_columns - 1
+
+    def delete_column(self, index):
+        keep = np.arange(self.n_columns) != index
+        self.A = self.A[:, keep]
+        self.lb = self.lb[keep]
+        self.ub = self.ub[keep]
+        self.c = self.c[keep]
+        del self.__column_names[index]
+
+    def set_method(self, method):
+        if ScipyBackend.__has_highs():
+            self.method = ScipyBackend._highs_methods[method]
+
+    def solve(self):
+        from scipy.optimize import linprog
+
+        bounds = [(None if l == -inf else l, None if u == inf else u) for l, u in zip(self.lb.tolist(), self.ub.tolist())]
+        # Default factorization and starting point fail to converge on degenerate flux balance problems
+        options = {"sparse": True, "cholesky": False, "sym_pos": False, "ip": True} if self.method == "interior-point" else {}
+        self.__result = linprog(-self.c if self.maximize else self.c, A_eq=self.A, b_eq=self.rhs, bounds=bounds,
+                                method=self.method, options=options)
+
+    def status(self):
+        return ScipyBackend._statuses.get(self.__result.status, "unknown") if self.__result is not None else "not solved"
+
+    def objective_value(self):
+        return -self.__result.fun if self.maximize else self.__result.fun
+
+    def values(self, indices=None):
+        x = self.__result.x
+        return (x if indices is None else x[list(indices)]).tolist()
+
+    def dual_values(self):
+        eqlin = getattr(self.__result, "eqlin", None)
+        if eqlin is None:
+            raise NotImplementedError("Dual values are only available with HiGHS solvers (scipy 1.6 or newer)")
+
+        duals = np.asarray(eqlin["marginals"])
+        return (-duals if self.maximize else duals).tolist()
+
+    def copy(self):
+        # Constraint matrix is never modified in place, so it is shared
+        other = ScipyBackend.__new__(ScipyBackend)
+        other.A = self.A
+        other.lb = self.lb.copy()
+        other.ub = self.ub.copy()
+        other.c = self.c.copy()
+        other.rhs = self.rhs.copy()
+        other.__row_names = list(self.__row_names)
+        other.__column_names = list(self.__column_names)
+        other.maximize = self.maximize
+        other.method = self.method
+        other.__result = None
+        return other
+
+
+#: Backends in order of preference
+backends = [CplexBackend, ScipyBackend]
+
+
+def available_backends():
+    """
+    Names of backends which can be used in this environment
+
+    :rtype: list of str
+    """
+    return [b.name for b in backends if b.available()]
+
+
+def create_backend(backend, A, lb, ub, c, rhs=None, row_names=None, column_names=None, maximize=True):
+    """
+    Create linear program with selected backend
+
+    :param backend: Backend name (see :data:`backends`) or None for the first available backend
+    :rtype: :class:`LpBackend`
+    """
+    if backend is None:
+        names = available_backends()
+        if not names:
+            raise ImportError("No linear programming solver is available (install cplex or scipy)")
+        backend = names[0]
+
+    for b in backends:
+        if b.name == backend:
+            return b(A, lb, ub, c, rhs=rhs, row_names=row_names, column_names=column_names, maximize=maximize)
+
+    raise ValueError("Unknown linear programming backend '{0}' (available: {1})".format(backend, ", ".join(b.name for b in backends)))
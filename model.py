@@ -4,6 +4,8 @@ import thread
 import itertools
 import warnings
 import math
+import cStringIO
+from compression import open_output
 
 def _is_number(s):
     if s in ['0', '1', '2', '1000']:
@@ -18,6 +20,17 @@ def _is_number(s):
 def _starts_with_number(s):
     return s[0] in ['-', '1', '2', '3', '4', '5', '6', '7', '8', '9', '0']
 
+def intern_name(name):
+    """
+    Shared copy of a metabolite or reaction name. Names of :class:`Metabolite` and :class:`Reaction` objects are
+    interned, so equal names of different models (or of community members, see :meth:`Model.commune`) are stored once
+    and can be compared by identity. Names which are not used by any object are released.
+
+    :param name: Name
+    :rtype: str
+    """
+    return intern(name) if type(name) is str else name
+
 class Bounds(object):
     """
     :class:`Bounds` holds description of reactions constraints
@@ -133,7 +146,7 @@ class Metabolite(object):
     def __init__(self, name, boundary=False):
         self.__assert_name(name)
         self.__assert_boundary(boundary)
-        self.__name = name
+        self.__name = intern_name(name)
         self.__boundary = boundary
         self.__order_boundary = 0
 
@@ -148,6 +161,11 @@ class Metabolite(object):
 
         return m
 
+    def __setstate__(self, state):
+        # Names of unpickled metabolites are shared with other models as well
+        state["_Metabolite__name"] = intern_name(state["_Metabolite__name"])
+        self.__dict__.update(state)
+
     @property
     def name(self):
         """
@@ -158,7 +176,7 @@ class Metabolite(object):
     @name.setter
     def name(self, name):
         self.__assert_name(name)
-        self.__name = name
+        self.__name = intern_name(name)
 
     @property
     def boundary(self):
@@ -361,6 +379,10 @@ class Direction(object):
 
         return Direction.__reversible
 
+    def __reduce__(self):
+        # Unpickled directions are resolved to singletons
+        return _direction, (self.__type, )
+
     def __eq__(self, other):
         return type(self) == type(other) and self.__type == other.__type
 
@@ -373,6 +395,10 @@ class Direction(object):
         if self.__type == "r":
             return "<->"
 
+def _direction(type):
+    return Direction.forward() if type == "f" else Direction.reversible()
+
+
 class ReactionMemberList(list):
     """
     :class:`ReactionMemberList` is a list of :class:`ReactionMember` instances. :class:`ReactionMemberList` inherits
@@ -459,7 +485,7 @@ class Reaction(object):
         self.__assert_direction(direction)
         self.__assert_bounds(bounds)
 
-        self.__name = name
+        self.__name = intern_name(name)
         self.__direction = direction
         self.__bounds = bounds
 
@@ -485,6 +511,11 @@ class Reaction(object):
         r = Reaction(self.name, reactants, products, direction=self.__direction.copy(), bounds=bounds)
         return r
 
+    def __setstate__(self, state):
+        # Names of unpickled reactions are shared with other models as well
+        state["_Reaction__name"] = intern_name(state["_Reaction__name"])
+        self.__dict__.update(state)
+
     @property
     def name(self):
         """
@@ -495,7 +526,7 @@ class Reaction(object):
     @name.setter
     def name(self, name):
         self.__assert_name(name)
-        self.__name = name
+        self.__name = intern_name(name)
 
 
     @property
@@ -769,10 +800,22 @@ class Operation(object):
         """
         return Operation.__create_singleton(True, "-", Operation.__negation)
 
+    def __reduce__(self):
+        # Operations are compared by identity, so unpickled operations have to be resolved to singletons
+        return _operation, (self.symbol, self.is_unary)
+
     def __repr__(self):
         return self.symbol
 
 
+def _operation(symbol, is_unary):
+    if is_unary:
+        return Operation.negation()
+
+    factories = {"+": Operation.addition, "-": Operation.subtraction, "*": Operation.multiplication, "/": Operation.division}
+    return factories[symbol]()
+
+
 class MathExpression(object):
     def __init__(self, operation, operands):
         """
@@ -888,6 +931,7 @@ class Model(object):
         self.__reactions = list()
         self.__objective = None
         self.__design_objective = None
+        self.__matrix = None
 
     @property
     def reactions(self):
@@ -902,6 +946,7 @@ class Model(object):
     def reactions(self, reactions):
         # TODO: assert
         self.__reactions = reactions
+        self.__matrix = None
 
     @property
     def objective(self):
@@ -916,6 +961,7 @@ class Model(object):
     def objective(self, objective):
         self.__assert_objective(objective)
         self.__objective = objective
+        self.__matrix = None
 
     @staticmethod
     def __extract_expression(expression):
@@ -966,6 +1012,22 @@ class Model(object):
     def design_objective(self, design_objective):
         self.__assert_objective(design_objective)
         self.__design_objective = design_objective
+        self.__matrix = None
+
+    def matrix(self, refresh=False):
+        """
+        Array view of the model (requires *numpy*). View is created on the first call and cached until reactions or
+        objectives of the model are replaced. Use **refresh** after reactions were modified in place. Functions taking
+        a model (e.g. :func:`bioopt_binary.save_binary`) don't use the cached view, they create a new one.
+
+        :param refresh: Recreate cached view
+        :rtype: :class:`model_matrix.ModelMatrix`
+        """
+        if self.__matrix is None or refresh:
+            from model_matrix import ModelMatrix
+            self.__matrix = ModelMatrix.from_model(self)
+
+        return self.__matrix
 
     def find_reaction(self, names=None, regex=False):
         """
@@ -1157,7 +1219,7 @@ class Model(object):
         return mb
 
     @staticmethod
-    def commune(models, model_prefix="ML{0:04d}_", env_prefix="ENV_", block=[]):
+    def commune(models, model_prefix="ML{0:04d}_", env_prefix="ENV_", block=[], lazy=False):
         """
         Merge two or more models into community model. Community model allows organisms represented by models to share
         metabolites. Briefly, the algorithm first appends reaction and metabolite names in original models with ML****_
@@ -1168,137 +1230,201 @@ class Model(object):
         Originally this merging framework was described in `"OptCom: A Multi-Level Optimization Framework for the Metabolic Modeling and Analysis of Microbial Communities" <http://journals.plos.org/ploscompbiol/article?id=10.1371/journal.pcbi.1002363>`_
         by Ali R. Zomorrodi and Costas D. Maranas.
 
+        Community is assembled from array views of models (see :meth:`matrix`): member stoichiometries are stacked
+        block-diagonally and exchange reactions are generated in bulk (requires *numpy*). Exchange reactions follow
+        the order in which boundary metabolites appear in member models.
+
         :param models: List of :class:`Model` to join
         :param model_prefix: Model prefix, Model prefix is added to all reaction names to avoid name collision in joined model.
         :param env_prefix: Prefix of metabolites in shared environment.
         :param block: List of names (in original models) of metabolites which should be not allowed to be exchanged between
                 organisms. An obvious example of such metabolite is biomass.
+        :param lazy: Return :class:`model_matrix.ModelMatrix` instead of :class:`Model`. Model objects are created
+                only when :meth:`model_matrix.ModelMatrix.to_model` is called.
         :rtype: :class:`Model`
         """
-        block = [block] if not isinstance(block, list) else block
-        block = [re.compile(b) for b in block]
-
-        boundary_metabolites = {}
-
-        fwd = Direction.forward()
-
-        model = Model()
-        for i, mod in enumerate(models):
-            env_reactions = []
-            for m in mod.find_boundary_metabolites():
-                m_in = Metabolite(model_prefix.format(i) + m.name)
-                m_out = Metabolite(env_prefix + m.name)
-                boundary_metabolites[m_out.name] = m_out
-
-                r_out = Reaction(model_prefix.format(i) + 'OUT_' + m.name, ReactionMemberList([ReactionMember(m_in, 1)]),
-                    ReactionMemberList([ReactionMember(m_out, 1)]), Direction.forward(), Bounds(0, Bounds.inf()))
-                r_in = Reaction(model_prefix.format(i) + 'IN_' + m.name, ReactionMemberList([ReactionMember(m_out, 1)]),
-                    ReactionMemberList([ReactionMember(m_in, 1)]), Direction.forward(), Bounds(0, Bounds.inf()))
-                env_reactions.extend([r_out, r_in])
-
-            reactions = []
-            metabolites = set()
-            for r in mod.reactions:
-                r = r.copy()
-                r.name = model_prefix.format(i) + r.name
-                for m in r.reactants:
-                    metabolites.add(m.metabolite)
-                for m in r.products:
-                    metabolites.add(m.metabolite)
-
-                reactions.append(r)
-
-            for m in metabolites:
-                m.name = model_prefix.format(i) + m.name
-                m.boundary = False
-
-            for r in reactions:
-                if not any(b.search(r.name) for b in block):
-                    model.reactions.append(r)
-
-            for r in env_reactions:
-                if not any(b.search(r.name) for b in block):
-                    model.reactions.append(r)
-
-        model.unify_references()
+        from community import commune
 
-        for m_name, m_out in boundary_metabolites.items():
-            m_ext = Metabolite("{0}xtX".format(m_name), True)
+        matrix = commune(models, model_prefix=model_prefix, env_prefix=env_prefix, block=block)
+        return matrix if lazy else matrix.to_model()
 
-            r_out = Reaction(m_out.name+"xtO", ReactionMemberList([ReactionMember(m_out)]), ReactionMemberList([ReactionMember(m_ext)]), fwd)
-            r_in = Reaction(m_out.name+"xtI", ReactionMemberList([ReactionMember(m_ext)]), ReactionMemberList([ReactionMember(m_out)]), fwd)
-
-            if not any(b.search(r_out.name) for b in block):
-                model.reactions.append(r_out)
+    @staticmethod
+    def merge(models, names=None, lazy=False):
+        """
+        Build union (pan-model) of related models, e.g. strains of one species, and presence of union reactions in
+        every model. Reactions are deduplicated by a hash of their content (members and direction), so merging is
+        linear in the total number of reactions. Models are processed one by one and can be given as file paths, which
+        are parsed only when they are merged, so only the union is kept in memory. See :class:`pan_model.PanModel`
+        for details.
 
-            if not any(b.search(r_in.name) for b in block):
-                model.reactions.append(r_in)
+        :param models: Iterable of :class:`Model` or paths to files in bioopt format
+        :param names: Strain names (default: file names or ``strain<number>``)
+        :param lazy: Return :class:`pan_model.PanModel` instead of union model and membership matrix
+        :return: Tuple of union :class:`Model` and membership matrix (``scipy.sparse.csr_matrix`` of bool, models x
+                union reactions)
+        """
+        from pan_model import merge
 
-        return model
+        pan = merge(models, names=names)
+        return pan if lazy else (pan.to_model(), pan.membership())
 
     def __assert_objective(self, objective):
         if not (objective is None or isinstance(objective, MathExpression)):
             raise TypeError("Objective is not None or <MathExpression>: {0}".format(type(objective)))
 
-    def save(self, path=None, inf=1000):
+    def save(self, path=None, inf=1000, precision=5):
         """
         Save model on disc in bioopt format
 
-        :param path: The name or full pathname of the file where the BioOpt model is to be written.
+        :param path: The name or full pathname of the file where the BioOpt model is to be written or a file object. Files
+                with ``.gz``, ``.bz2`` or ``.xz`` extension are compressed. If path is not specified model text is
+                returned.
         :param inf: Number which would be used for constraints with infinite bounds
+        :param precision: Number of significant digits used for coefficients and constraints
         """
-        ret = "-REACTIONS\n"
-        for r in self.reactions:
-            reactants = " + ".join("{0}{1}".format("" if abs(m.coefficient) == 1 else "{0:.5g} ".format(m.coefficient), m.metabolite.name) for m in r.reactants)
-            products = " + ".join("{0}{1}".format("" if abs(m.coefficient) == 1 else "{0:.5g} ".format(m.coefficient), m.metabolite.name) for m in r.products)
-            dir = "->" if r.direction == Direction.forward() else "<->"
-            ret += "{name}\t:\t{lhs} {dir} {rhs}".format(name=r.name, lhs=reactants, dir=dir, rhs=products) + "\n"
-        ret += "\n"
+        if path:
+            f = open_output(path)
+            try:
+                self.write(f, inf=inf, precision=precision)
+            finally:
+                f.close()
+        else:
+            f = cStringIO.StringIO()
+            self.write(f, inf=inf, precision=precision)
+            return f.getvalue()
 
-        ret += "-CONSTRAINTS\n"
+    def write(self, f, inf=1000, precision=5, buffer_lines=4096):
+        """
+        Write model in bioopt format to a file object. Sections are written line by line through a buffer of a fixed
+        size, so saving time is linear in model size and model text is never held in memory.
+
+        :param f: File object opened for writing (see :meth:`save` for writing to a path)
+        :param inf: Number which would be used for constraints with infinite bounds
+        :param precision: Number of significant digits used for coefficients and constraints
+        :param buffer_lines: Number of lines written to file object at once
+        """
+        num = "{{0:.{0}g}}".format(int(precision)).format
+        constraint = ("{0}\t[" + "{{1:.{0}g}}, {{2:.{0}g}}".format(int(precision)) + "]\n").format
+        fwd = Direction.forward()
+        pos_inf = Bounds.inf()
+        neg_inf = -pos_inf
+
+        buf = []
+        def emit(line):
+            buf.append(line)
+            if len(buf) >= buffer_lines:
+                f.write("".join(buf))
+                del buf[:]
+
+        def members(members):
+            return " + ".join(m.metabolite.name if abs(m.coefficient) == 1 else num(m.coefficient) + " " + m.metabolite.name for m in members)
+
+        # Boundary metabolites are collected while reactions are written (each instance once, in order of appearance)
+        b_seen = set()
+        b_metabolites = []
+        emit("-REACTIONS\n")
         for r in self.reactions:
-            lb = -inf if r.bounds.lb == -Bounds.inf() else r.bounds.lb
-            ub = inf if r.bounds.ub == Bounds.inf() else r.bounds.ub
-            if not (r.bounds.direction == Direction.forward() and r.bounds == Bounds(0)) and \
-                    not (r.bounds.direction == Direction.reversible() and r.bounds == Bounds()):
-                ret += "{0}\t[{1:.5g}, {2:.5g}]".format(r.name, lb, ub) + "\n"
+            for m in itertools.chain(r.reactants, r.products):
+                m = m.metabolite
+                if m.boundary and id(m) not in b_seen:
+                    b_seen.add(id(m))
+                    b_metabolites.append(m)
 
-        ret += "\n"
+            dir = "->" if r.direction == fwd else "<->"
+            emit("{0}\t:\t{1} {2} {3}\n".format(r.name, members(r.reactants), dir, members(r.products)))
+        emit("\n")
 
-        ret += "-EXTERNAL METABOLITES\n"
+        emit("-CONSTRAINTS\n")
+        for r in self.reactions:
+            lb, ub = r.bounds.lb, r.bounds.ub
+            # Default bounds of forward ([0, inf]) and reversible ([-inf, inf]) reactions are not written
+            if ub == pos_inf and (lb == 0 or lb == neg_inf):
+                continue
+
+            emit(constraint(r.name, -inf if lb == neg_inf else lb, inf if ub == pos_inf else ub))
+        emit("\n")
 
-        b_metabolites = self.find_boundary_metabolites()
-        b_metabolites = sorted(b_metabolites, key=lambda x: x.order_boundary)
+        emit("-EXTERNAL METABOLITES\n")
+        b_metabolites.sort(key=lambda x: x.order_boundary)
         for m in b_metabolites:
-            ret += m.name + "\n"
-        ret += "\n"
+            emit(m.name + "\n")
+        emit("\n")
 
         if self.objective:
-            ret += "-OBJECTIVE\n"
-            ret += " ".join(str(MathExpression.format_var(o)) for o in self.objective.operands)
-            ret += "\n\n"
+            emit("-OBJECTIVE\n")
+            emit(" ".join(str(MathExpression.format_var(o)) for o in self.objective.operands))
+            emit("\n\n")
 
         if self.design_objective:
-            ret += "-DESIGN OBJECTIVE\n"
-            ret += " ".join(str(MathExpression.format_var(o)) for o in self.design_objective.operands)
-            ret += "\n\n"
+            emit("-DESIGN OBJECTIVE\n")
+            emit(" ".join(str(MathExpression.format_var(o)) for o in self.design_objective.operands))
+            emit("\n\n")
 
-        if path:
-            f = open(path, 'w')
-            f.write(ret)
-            return f.close()
-        else:
-            return ret
+        if buf:
+            f.write("".join(buf))
+
+    #: Maximal number of reactions and objective terms shown by ``repr()``
+    repr_limit = 10
+
+    @staticmethod
+    def __repr_objective(expression, limit):
+        if isinstance(expression, MathExpression) and expression.operation == Operation.addition() and len(expression.operands) > limit:
+            head = MathExpression(expression.operation, expression.operands[:limit])
+            return "{0} + ... ({1} more terms)".format(head, len(expression.operands) - limit)
+
+        return str(expression)
 
     def __repr__(self):
-        ret = "-REACTIONS\n{0}\n\n".format("\n".join(r.__repr__() for r in self.reactions))
-        ret += "-CONSTRAINTS\n{0}\n\n".format("\n".join("{0}\t{1}".format(r.name, r.bounds) for r in self.reactions))
-        ret += "-EXTERNAL METABOLITES\n{0}\n\n".format("\n".join(m.__repr__() for m in self.find_boundary_metabolites()))
-        ret += "-OBJECTIVE\n{0}\n\n".format(self.objective)
-        ret += "-DESIGN OBJECTIVE\n{0}\n\n".format(self.design_objective)
+        # Only first reactions are shown, so that repr of a large model is cheap. Use dump() for full listing.
+        limit = Model.repr_limit
+        n = len(self.reactions)
+        head = self.reactions[:limit]
+        more = "\n... ({0} more)".format(n - limit) if n > limit else ""
+
+        # External metabolites of the shown reactions, more can be found in the rest of the model
+        external = []
+        names = set()
+        for r in head:
+            for m in itertools.chain(r.reactants, r.products):
+                if m.metabolite.boundary and m.metabolite.name not in names:
+                    names.add(m.metabolite.name)
+                    external.append(m.metabolite)
+        more_external = "\n..." if n > limit or len(external) > limit else ""
+
+        ret = "-REACTIONS ({0})\n{1}{2}\n\n".format(n, "\n".join(r.__repr__() for r in head), more)
+        ret += "-CONSTRAINTS ({0})\n{1}{2}\n\n".format(n, "\n".join("{0}\t{1}".format(r.name, r.bounds) for r in head), more)
+        ret += "-EXTERNAL METABOLITES\n{0}{1}\n\n".format("\n".join(m.__repr__() for m in external[:limit]), more_external)
+        ret += "-OBJECTIVE\n{0}\n\n".format(Model.__repr_objective(self.objective, limit))
+        ret += "-DESIGN OBJECTIVE\n{0}\n\n".format(Model.__repr_objective(self.design_objective, limit))
 
         return ret
 
+    def dump(self, f=None):
+        """
+        Write full human readable listing of the model (reactions, constraints, external metabolites and objectives).
+        Listing is written line by line. Unlike :meth:`save` it is not meant to be parsed.
+
+        :param f: File object opened for writing (default: standard output)
+        """
+        if f is None:
+            import sys
+            f = sys.stdout
+
+        f.write("-REACTIONS\n")
+        for r in self.reactions:
+            f.write(r.__repr__() + "\n")
+
+        f.write("\n-CONSTRAINTS\n")
+        for r in self.reactions:
+            f.write("{0}\t{1}\n".format(r.name, r.bounds))
+
+        f.write("\n-EXTERNAL METABOLITES\n")
+        for m in self.find_boundary_metabolites():
+            f.write(m.__repr__() + "\n")
+
+        f.write("\n-OBJECTIVE\n{0}\n\n".format(self.objective))
+        f.write("-DESIGN OBJECTIVE\n{0}\n\n".format(self.design_objective))
+
     def __eq__(self, other):
         return type(self) == type(other) and \
                self.reactions == other.reactions and \
@@ -0,0 +1,476 @@
+from model import *
+from compression import open_output
+from collections import namedtuple
+import cStringIO
+import hashlib
+import numpy as np
+
+
+class LpMatrix(namedtuple("LpMatrix", ["S", "lb", "ub", "c", "reactions", "metabolites"])):
+    """
+    Linear program arrays of a model: mass balance ``S * v = 0`` and bounds ``lb <= v <= ub`` (infinite bounds are
+    kept) for flux vector ``v``. ``c`` holds objective coefficients, ``reactions`` and ``metabolites`` name columns and
+    rows of ``S``.
+    """
+    __slots__ = ()
+
+
+class StringTable(object):
+    """
+    Immutable list of strings stored in a single byte buffer. Strings are decoded only when they are accessed, so
+    tables loaded from memory mapped files don't cost anything until used.
+
+    :param blob: uint8 array with concatenated strings
+    :param offsets: int64 array of string start positions, last element is the total length of blob
+    :rtype: :class:`StringTable`
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def from_strings(strings):
+        """
+        :param strings: list of strings
+        :rtype: :class:`StringTable`
+        """
+        if isinstance(strings, StringTable):
+            return strings
+
+        strings = list(strings)
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(s) for s in strings], dtype=np.int64)
+        blob = np.frombuffer("".join(strings), dtype=np.uint8) if strings else np.zeros(0, dtype=np.uint8)
+
+        return StringTable(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("String table index out of range")
+
+        return self.blob[self.offsets[i]:self.offsets[i+1]].tostring()
+
+    def __iter__(self):
+        data = self.blob.tostring()
+        offsets = self.offsets.tolist()
+        for i in xrange(len(self)):
+            yield data[offsets[i]:offsets[i+1]]
+
+    def tolist(self):
+        """
+        :rtype: list of str
+        """
+        return list(self)
+
+
+class ModelMatrix(object):
+    """
+    Array view of :class:`Model`. Reactions are stored as rows of a compressed sparse row (CSR) matrix: members of
+    reaction *i* are stored at positions ``indptr[i]:indptr[i+1]`` of ``indices`` (metabolite index), ``coefficients``
+    and ``sides`` (:data:`REACTANT` or :data:`PRODUCT`) arrays in the same order as in :class:`Reaction`.
+
+    Objectives are stored as sums of products: operands of term *k* are stored at positions
+    ``indptr[k]:indptr[k+1]`` of ``operands`` (reaction index, -1 for numbers) and ``values`` (numbers, NaN for
+    reactions) arrays. Operands referring to reactions missing in the model have indices starting from number of
+    reactions and are named by ``objective_names``.
+
+    :rtype: :class:`ModelMatrix`
+    """
+    FORWARD = 0
+    REVERSIBLE = 1
+
+    REACTANT = 0
+    PRODUCT = 1
+
+    def __init__(self, reaction_names, directions, lb, ub, indptr, indices, coefficients, sides,
+                 metabolite_names, metabolite_boundary, metabolite_order, objective=None, design_objective=None,
+                 objective_names=None):
+        self.reaction_names = reaction_names
+        self.directions = directions
+        self.lb = lb
+        self.ub = ub
+        self.indptr = indptr
+        self.indices = indices
+        self.coefficients = coefficients
+        self.sides = sides
+        self.metabolite_names = metabolite_names
+        self.metabolite_boundary = metabolite_boundary
+        self.metabolite_order = metabolite_order
+        self.objective = objective
+        self.design_objective = design_objective
+        self.objective_names = objective_names if objective_names is not None else []
+
+    @property
+    def n_reactions(self):
+        return len(self.directions)
+
+    @property
+    def n_metabolites(self):
+        return len(self.metabolite_boundary)
+
+    @staticmethod
+    def from_model(model):
+        """
+        Create array view of a model. Metabolites with the same name are treated as one metabolite, which is boundary
+        if any of its instances is boundary.
+
+        :param model: :class:`Model`
+        :rtype: :class:`ModelMatrix`
+        """
+        fwd = Direction.forward()
+        reaction_names = []
+        directions = []
+        lb = []
+        ub = []
+        indptr = [0]
+        indices = []
+        coefficients = []
+        sides = []
+
+        metabolites = {}
+        metabolite_names = []
+        metabolite_boundary = []
+        metabolite_order = []
+
+        for r in model.reactions:
+            reaction_names.append(r.name)
+            directions.append(ModelMatrix.FORWARD if r.direction == fwd else ModelMatrix.REVERSIBLE)
+            lb.append(r.bounds.lb)
+            ub.append(r.bounds.ub)
+
+            for side, members in ((ModelMatrix.REACTANT, r.reactants), (ModelMatrix.PRODUCT, r.products)):
+                for m in members:
+                    metabolite = m.metabolite
+                    i = metabolites.get(metabolite.name)
+                    if i is None:
+                        i = metabolites[metabolite.name] = len(metabolite_names)
+                        metabolite_names.append(metabolite.name)
+                        metabolite_boundary.append(metabolite.boundary)
+                        metabolite_order.append(metabolite.order_boundary)
+                    elif metabolite.boundary and not metabolite_boundary[i]:
+                        metabolite_boundary[i] = True
+                        metabolite_order[i] = metabolite.order_boundary
+
+                    indices.append(i)
+                    coefficients.append(m.coefficient)
+                    sides.append(side)
+
+            indptr.append(len(indices))
+
+        reactions = dict((name, i) for i, name in reversed(list(enumerate(reaction_names))))
+        objective_names = []
+        objective = ModelMatrix.__encode_objective(model.objective, reactions, len(reaction_names), objective_names)
+        design_objective = ModelMatrix.__encode_objective(model.design_objective, reactions, len(reaction_names), objective_names)
+
+        return ModelMatrix(
+            reaction_names=reaction_names,
+            directions=np.array(directions, dtype=np.uint8),
+            lb=np.array(lb, dtype=np.float64),
+            ub=np.array(ub, dtype=np.float64),
+            indptr=np.array(indptr, dtype=np.int64),
+            indices=np.array(indices, dtype=np.int32),
+            coefficients=np.array(coefficients, dtype=np.float64),
+            sides=np.array(sides, dtype=np.uint8),
+            metabolite_names=metabolite_names,
+            metabolite_boundary=np.array(metabolite_boundary, dtype=np.bool_),
+            metabolite_order=np.array(metabolite_order, dtype=np.float64),
+            objective=objective,
+            design_objective=design_objective,
+            objective_names=objective_names)
+
+    @staticmethod
+    def __encode_objective(expression, reactions, n_reactions, objective_names):
+        if expression is None:
+            return None
+
+        terms = expression.operands if expression.operation == Operation.addition() else [expression]
+        indptr = [0]
+        operands = []
+        values = []
+        for term in terms:
+            if not isinstance(term, MathExpression) or term.operation not in (None, Operation.multiplication()):
+                raise ValueError("Only objectives consisting of sums of products can be converted: {0}".format(expression))
+
+            for o in term.operands:
+                if isinstance(o, Reaction):
+                    i = reactions.get(o.name)
+                    if i is None:
+                        i = reactions[o.name] = n_reactions + len(objective_names)
+                        objective_names.append(o.name)
+                    operands.append(i)
+                    values.append(np.nan)
+                elif isinstance(o, (int, float)):
+                    operands.append(-1)
+                    values.append(o)
+                else:
+                    raise ValueError("Only objectives consisting of sums of products can be converted: {0}".format(expression))
+
+            indptr.append(len(operands))
+
+        return np.array(indptr, dtype=np.int64), np.array(operands, dtype=np.int32), np.array(values, dtype=np.float64)
+
+    def __decode_objective(self, objective, reactions):
+        if objective is None:
+            return None
+
+        indptr, operands, values = (a.tolist() for a in objective)
+        n = len(reactions)
+        terms = []
+        for k in xrange(len(indptr) - 1):
+            parts = []
+            for j in xrange(indptr[k], indptr[k+1]):
+                i = operands[j]
+                if i < 0:
+                    parts.append(values[j])
+                elif i < n:
+                    parts.append(reactions[i])
+                else:
+                    parts.append(Reaction(self.objective_names[i - n]))
+
+            terms.append(MathExpression(None, parts) if len(parts) == 1 else MathExpression(Operation.multiplication(), parts))
+
+        return terms[0] if len(terms) == 1 else MathExpression(Operation.addition(), terms)
+
+    def to_model(self):
+        """
+        Create :class:`Model` objects from arrays
+
+        :rtype: :class:`Model`
+        """
+        fwd = Direction.forward()
+        rev = Direction.reversible()
+
+        metabolites = []
+        order = self.metabolite_order.tolist()
+        for name, boundary, o in zip(self.metabolite_names, self.metabolite_boundary.tolist(), order):
+            m = Metabolite(name, boundary)
+            m.order_boundary = o
+            metabolites.append(m)
+
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        coefficients = self.coefficients.tolist()
+        sides = self.sides.tolist()
+        lb = self.lb.tolist()
+        ub = self.ub.tolist()
+        directions = self.directions.tolist()
+
+        reactions = []
+        for i, name in enumerate(self.reaction_names):
+            reactants = ReactionMemberList()
+            products = ReactionMemberList()
+            for j in xrange(indptr[i], indptr[i+1]):
+                member = ReactionMember(metabolites[indices[j]], coefficients[j])
+                (products if sides[j] == ModelMatrix.PRODUCT else reactants).append(member)
+
+            direction = fwd if directions[i] == ModelMatrix.FORWARD else rev
+            reactions.append(Reaction(name, reactants, products, direction, Bounds(lb[i], ub[i])))
+
+        model = Model()
+        model.reactions = reactions
+        model.objective = self.__decode_objective(self.objective, reactions)
+        model.design_objective = self.__decode_objective(self.design_objective, reactions)
+
+        return model
+
+    def fingerprint(self):
+        """
+        Digest of reactions, bounds, stoichiometry, metabolites and objectives. Equal models have equal fingerprints
+        whether their matrices are created from :class:`Model` or loaded from a file.
+
+        :return: Hexadecimal MD5 digest
+        """
+        digest = hashlib.md5()
+        for names in (self.reaction_names, self.metabolite_names, self.objective_names):
+            digest.update("\0".join(names))
+            digest.update("\1")
+
+        for array, dtype in ((self.directions, "<i8"), (self.lb, "<f8"), (self.ub, "<f8"), (self.indptr, "<i8"),
+                             (self.indices, "<i8"), (self.coefficients, "<f8"), (self.sides, "<i8"),
+                             (self.metabolite_boundary, "<i8"), (self.metabolite_order, "<f8")):
+            digest.update(np.ascontiguousarray(array, dtype=dtype).tostring())
+            digest.update("\1")
+
+        for objective in (self.objective, self.design_objective):
+            if objective is not None:
+                for array, dtype in zip(objective, ("<i8", "<i8", "<f8")):
+                    digest.update(np.ascontiguousarray(array, dtype=dtype).tostring())
+            digest.update("\1")
+
+        return digest.hexdigest()
+
+    def signed_coefficients(self):
+        """
+        Coefficients of members with reactants taken with negative sign
+
+        :rtype: numpy array
+        """
+        return np.where(self.sides == ModelMatrix.PRODUCT, self.coefficients, -self.coefficients)
+
+    def stoichiometry(self):
+        """
+        Stoichiometric matrix (metabolites x reactions). Coefficients of metabolites appearing in a reaction more than
+        once are summed. Requires *scipy*.
+
+        :rtype: scipy.sparse.csc_matrix
+        """
+        import scipy.sparse
+
+        return scipy.sparse.csc_matrix((self.signed_coefficients(), self.indices, self.indptr),
+                                       shape=(self.n_metabolites, self.n_reactions))
+
+    def objective_coefficients(self, design=False):
+        """
+        Objective coefficient of every reaction. Same as :attr:`Model.objective_dict`: coefficient of a reaction is the
+        first number in objective term containing this reaction, reactions not present in objective have zero
+        coefficient.
+
+        :param design: Use design objective instead of objective
+        :rtype: numpy array
+        """
+        objective = self.design_objective if design else self.objective
+        ret = np.zeros(self.n_reactions, dtype=np.float64)
+        if objective is None:
+            return ret
+
+        indptr, operands, values = objective
+        for k in xrange(len(indptr) - 1):
+            term = slice(indptr[k], indptr[k+1])
+            reactions = operands[term][(operands[term] >= 0) & (operands[term] < self.n_reactions)]
+            numbers = values[term][operands[term] < 0]
+            if len(reactions) and len(numbers):
+                ret[reactions[0]] = numbers[0]
+
+        return ret
+
+    def lp_matrix(self, exclude_boundary=True):
+        """
+        Arrays of flux balance linear program. Requires *scipy*.
+
+        :param exclude_boundary: Boundary metabolites don't have mass balance constraints (they can be freely
+                imported and exported)
+        :rtype: :class:`LpMatrix`
+        """
+        S = self.stoichiometry()
+        metabolites = np.arange(self.n_metabolites)
+        if exclude_boundary:
+            metabolites = np.flatnonzero(~np.asarray(self.metabolite_boundary, dtype=np.bool_))
+            S = S.tocsr()[metabolites].tocsc()
+
+        return LpMatrix(S=S, lb=np.array(self.lb, dtype=np.float64), ub=np.array(self.ub, dtype=np.float64),
+                        c=self.objective_coefficients(), reactions=self.reaction_names,
+                        metabolites=[self.metabolite_names[i] for i in metabolites.tolist()])
+
+    def save(self, path=None, inf=1000, precision=5):
+        """
+        Save arrays in bioopt format without creating model objects. Output is the same as of :meth:`Model.save` of
+        :meth:`to_model`.
+
+        :param path: The name or full pathname of the file where the BioOpt model is to be written or a file object. Files
+                with ``.gz``, ``.bz2`` or ``.xz`` extension are compressed. If path is not specified model text is
+                returned.
+        :param inf: Number which would be used for constraints with infinite bounds
+        :param precision: Number of significant digits used for coefficients and constraints
+        """
+        if path:
+            f = open_output(path)
+            try:
+                self.write(f, inf=inf, precision=precision)
+            finally:
+                f.close()
+        else:
+            f = cStringIO.StringIO()
+            self.write(f, inf=inf, precision=precision)
+            return f.getvalue()
+
+    def write(self, f, inf=1000, precision=5, buffer_lines=4096):
+        """
+        Write arrays in bioopt format to a file object (see :meth:`Model.write`)
+
+        :param f: File object opened for writing
+        :param inf: Number which would be used for constraints with infinite bounds
+        :param precision: Number of significant digits used for coefficients and constraints
+        :param buffer_lines: Number of lines written to file object at once
+        """
+        num = "{{0:.{0}g}}".format(int(precision)).format
+        constraint = ("{0}\t[" + "{{1:.{0}g}}, {{2:.{0}g}}".format(int(precision)) + "]\n").format
+        pos_inf = Bounds.inf()
+        neg_inf = -pos_inf
+
+        buf = []
+        def emit(line):
+            buf.append(line)
+            if len(buf) >= buffer_lines:
+                f.write("".join(buf))
+                del buf[:]
+
+        # Member strings are formatted once per distinct (metabolite, coefficient) pair
+        names = list(self.metabolite_names)
+        coefficients = self.coefficients.tolist()
+        indices = self.indices.tolist()
+        sides = self.sides.tolist()
+        indptr = self.indptr.tolist()
+        terms = {}
+        def term(j):
+            key = (indices[j], coefficients[j])
+            t = terms.get(key)
+            if t is None:
+                c = coefficients[j]
+                t = terms[key] = names[indices[j]] if abs(c) == 1 else num(c) + " " + names[indices[j]]
+            return t
+
+        emit("-REACTIONS\n")
+        for i, (name, direction) in enumerate(zip(self.reaction_names, self.directions.tolist())):
+            reactants = []
+            products = []
+            for j in xrange(indptr[i], indptr[i+1]):
+                (products if sides[j] == ModelMatrix.PRODUCT else reactants).append(term(j))
+
+            dir = "->" if direction == ModelMatrix.FORWARD else "<->"
+            emit("{0}\t:\t{1} {2} {3}\n".format(name, " + ".join(reactants), dir, " + ".join(products)))
+        emit("\n")
+
+        emit("-CONSTRAINTS\n")
+        for name, lb, ub in zip(self.reaction_names, self.lb.tolist(), self.ub.tolist()):
+            # Default bounds of forward ([0, inf]) and reversible ([-inf, inf]) reactions are not written
+            if ub == pos_inf and (lb == 0 or lb == neg_inf):
+                continue
+
+            emit(constraint(name, -inf if lb == neg_inf else lb, inf if ub == pos_inf else ub))
+        emit("\n")
+
+        # Boundary metabolites in order of first appearance, stable sorted by boundary order
+        emit("-EXTERNAL METABOLITES\n")
+        used, first = np.unique(np.asarray(self.indices), return_index=True)
+        boundary = np.asarray(self.metabolite_boundary, dtype=np.bool_)[used]
+        used, first = used[boundary], first[boundary]
+        order = np.asarray(self.metabolite_order)[used]
+        for j in used[np.lexsort((first, order))].tolist():
+            emit(names[j] + "\n")
+        emit("\n")
+
+        for title, objective in (("-OBJECTIVE", self.objective), ("-DESIGN OBJECTIVE", self.design_objective)):
+            if objective is None or len(objective[0]) < 2:
+                continue
+
+            # Only reactions referenced by objective are created
+            reactions = [None] * self.n_reactions
+            for i in np.unique(objective[1][(objective[1] >= 0) & (objective[1] < self.n_reactions)]).tolist():
+                reactions[i] = Reaction(self.reaction_names[i])
+
+            expression = self.__decode_objective(objective, reactions)
+            emit(title + "\n")
+            emit(" ".join(str(MathExpression.format_var(o)) for o in expression.operands))
+            emit("\n\n")
+
+        if buf:
+            f.write("".join(buf))
@@ -0,0 +1,297 @@
+from model import *
+from model_matrix import ModelMatrix
+import json
+import os
+import sqlite3
+import numpy as np
+
+
+_schema = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT,
+    objective TEXT,
+    design_objective TEXT,
+    objective_names TEXT
+);
+CREATE TABLE IF NOT EXISTS reactions (
+    model_id INTEGER NOT NULL REFERENCES models(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    direction INTEGER NOT NULL,
+    lb REAL NOT NULL,
+    ub REAL NOT NULL,
+    PRIMARY KEY (model_id, idx)
+);
+CREATE INDEX IF NOT EXISTS reactions_name ON reactions(name);
+CREATE TABLE IF NOT EXISTS metabolites (
+    model_id INTEGER NOT NULL REFERENCES models(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    boundary INTEGER NOT NULL,
+    order_boundary REAL NOT NULL,
+    PRIMARY KEY (model_id, idx)
+);
+CREATE INDEX IF NOT EXISTS metabolites_name ON metabolites(name);
+CREATE TABLE IF NOT EXISTS members (
+    model_id INTEGER NOT NULL REFERENCES models(id) ON DELETE CASCADE,
+    reaction INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    metabolite INTEGER NOT NULL,
+    coefficient REAL NOT NULL,
+    side INTEGER NOT NULL,
+    PRIMARY KEY (model_id, reaction, idx)
+);
+CREATE INDEX IF NOT EXISTS members_metabolite ON members(model_id, metabolite);
+"""
+
+
+def _encode_objective(objective):
+    if objective is None:
+        return None
+
+    indptr, operands, values = objective
+    return json.dumps([indptr.tolist(), operands.tolist(), [None if np.isnan(v) else v for v in values.tolist()]])
+
+
+def _decode_objective(text):
+    if text is None:
+        return None
+
+    indptr, operands, values = json.loads(text)
+    return (np.array(indptr, dtype=np.int64), np.array(operands, dtype=np.int32),
+            np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+
+
+class ModelStore(object):
+    """
+    Collection of models stored in an indexed SQLite database. Reactions, reaction members, bounds and metabolites of
+    every model are stored as table rows, so questions about many models (which models have a reaction, what are its
+    bounds in every model) are answered by index lookups without parsing model files. Models are recreated from stored
+    rows on demand (see :meth:`model`).
+
+    Models are identified by name (file name by default). Metabolites are stored per model, because the same metabolite
+    can be boundary in one model and internal in another.
+
+    :param path: Database file (default: in-memory database)
+    :rtype: :class:`ModelStore`
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.text_factory = str
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_schema)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def __contains__(self, name):
+        return self.__model_id(name) is not None
+
+    def __model_id(self, name):
+        row = self.connection.execute("SELECT id FROM models WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, model, name=None, path=None, replace=False):
+        """
+        Add model to store
+
+        :param model: :class:`Model`, :class:`model_matrix.ModelMatrix` or path to a file in bioopt format (parsed
+                with :class:`bioopt_parser.BiooptParser`)
+        :param name: Model name (default: file name)
+        :param path: Source file recorded with the model
+        :param replace: Replace stored model with the same name (otherwise ValueError is raised)
+        :return: Model name
+        """
+        if isinstance(model, basestring):
+            from bioopt_parser import BiooptParser
+            path = model
+            model = BiooptParser().parse_file(path)
+        if name is None:
+            if path is None:
+                raise ValueError("Name of model is not specified")
+            name = os.path.basename(path)
+
+        matrix = ModelMatrix.from_model(model) if isinstance(model, Model) else model
+        with self.connection:
+            model_id = self.__model_id(name)
+            if model_id is not None:
+                if not replace:
+                    raise ValueError("Store already has model '{0}'".format(name))
+                self.connection.execute("DELETE FROM models WHERE id = ?", (model_id,))
+
+            model_id = self.connection.execute(
+                "INSERT INTO models (name, path, objective, design_objective, objective_names) VALUES (?, ?, ?, ?, ?)",
+                (name, path, _encode_objective(matrix.objective), _encode_objective(matrix.design_objective),
+                 json.dumps(list(matrix.objective_names)))).lastrowid
+
+            self.connection.executemany(
+                "INSERT INTO reactions (model_id, idx, name, direction, lb, ub) VALUES (?, ?, ?, ?, ?, ?)",
+                ((model_id, i, n, d, lb, ub) for i, (n, d, lb, ub) in
+                 enumerate(zip(matrix.reaction_names, matrix.directions.tolist(), matrix.lb.tolist(), matrix.ub.tolist()))))
+
+            self.connection.executemany(
+                "INSERT INTO metabolites (model_id, idx, name, boundary, order_boundary) VALUES (?, ?, ?, ?, ?)",
+                ((model_id, i, n, b, o) for i, (n, b, o) in
+                 enumerate(zip(matrix.metabolite_names, np.asarray(matrix.metabolite_boundary).tolist(), np.asarray(matrix.metabolite_order).tolist()))))
+
+            # Reaction of every member is recovered from CSR row pointers
+            indptr = np.asarray(matrix.indptr)
+            reactions = np.repeat(np.arange(matrix.n_reactions), np.diff(indptr))
+            positions = np.arange(len(reactions)) - indptr[reactions]
+            self.connection.executemany(
+                "INSERT INTO members (model_id, reaction, idx, metabolite, coefficient, side) VALUES (?, ?, ?, ?, ?, ?)",
+                ((model_id, r, p, m, c, s) for r, p, m, c, s in
+                 zip(reactions.tolist(), positions.tolist(), np.asarray(matrix.indices).tolist(), matrix.coefficients.tolist(), matrix.sides.tolist())))
+
+        return name
+
+    def add_files(self, paths, workers=None, replace=False):
+        """
+        Parse files concurrently (see :meth:`bioopt_parser.BiooptParser.parse_files`) and add them to store. Files
+        which could not be parsed are skipped.
+
+        :param paths: List of file paths
+        :param workers: Number of worker processes (default: number of CPUs)
+        :param replace: Replace stored models with the same names
+        :rtype: list of :class:`bioopt_parser.BiooptParseResult` in the order of input paths
+        """
+        from bioopt_parser import BiooptParser
+
+        results = BiooptParser().parse_files(paths, workers=workers, frozen=True)
+        for res in results:
+            if res.ok:
+                self.add(res.model, path=res.path, replace=replace)
+
+        return results
+
+    def remove(self, name):
+        """
+        Remove model from store
+
+        :param name: Model name
+        """
+        with self.connection:
+            if not self.connection.execute("DELETE FROM models WHERE name = ?", (name,)).rowcount:
+                raise KeyError("Store has no model '{0}'".format(name))
+
+    def models(self):
+        """
+        Names of stored models
+
+        :rtype: list of str
+        """
+        return [r[0] for r in self.connection.execute("SELECT name FROM models ORDER BY id")]
+
+    def models_with_reaction(self, reaction):
+        """
+        Names of models containing a reaction
+
+        :param reaction: Reaction name
+        :rtype: list of str
+        """
+        return [r[0] for r in self.connection.execute(
+            "SELECT DISTINCT m.name FROM reactions r JOIN models m ON m.id = r.model_id WHERE r.name = ? ORDER BY m.id",
+            (reaction,))]
+
+    def models_with_metabolite(self, metabolite, boundary=None):
+        """
+        Names of models containing a metabolite
+
+        :param metabolite: Metabolite name
+        :param boundary: Only models where metabolite is boundary (True) or internal (False)
+        :rtype: list of str
+        """
+        query = "SELECT DISTINCT m.name FROM metabolites x JOIN models m ON m.id = x.model_id WHERE x.name = ?"
+        params = (metabolite,)
+        if boundary is not None:
+            query += " AND x.boundary = ?"
+            params += (int(boundary),)
+
+        return [r[0] for r in self.connection.execute(query + " ORDER BY m.id", params)]
+
+    def reaction_bounds(self, reaction):
+        """
+        Bounds of a reaction in every model containing it
+
+        :param reaction: Reaction name
+        :rtype: list of (model name, :class:`Bounds`) tuples
+        """
+        return [(name, Bounds(lb, ub)) for name, lb, ub in self.connection.execute(
+            "SELECT m.name, r.lb, r.ub FROM reactions r JOIN models m ON m.id = r.model_id WHERE r.name = ? ORDER BY m.id, r.idx",
+            (reaction,))]
+
+    def reactions_with_metabolite(self, metabolite):
+        """
+        Reactions consuming or producing a metabolite in every model
+
+        :param metabolite: Metabolite name
+        :rtype: list of (model name, reaction name) tuples
+        """
+        return [(m, r) for m, r in self.connection.execute(
+            "SELECT DISTINCT m.name, r.name FROM metabolites x "
+            "JOIN members y ON y.model_id = x.model_id AND y.metabolite = x.idx "
+            "JOIN reactions r ON r.model_id = y.model_id AND r.idx = y.reaction "
+            "JOIN models m ON m.id = x.model_id WHERE x.name = ? ORDER BY m.id, r.idx",
+            (metabolite,))]
+
+    def matrix(self, name):
+        """
+        Array view of a stored model
+
+        :param name: Model name
+        :rtype: :class:`model_matrix.ModelMatrix`
+        """
+        row = self.connection.execute(
+            "SELECT id, objective, design_objective, objective_names FROM models WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError("Store has no model '{0}'".format(name))
+        model_id, objective, design_objective, objective_names = row
+
+        reactions = self.connection.execute(
+            "SELECT name, direction, lb, ub FROM reactions WHERE model_id = ? ORDER BY idx", (model_id,)).fetchall()
+        metabolites = self.connection.execute(
+            "SELECT name, boundary, order_boundary FROM metabolites WHERE model_id = ? ORDER BY idx", (model_id,)).fetchall()
+        members = self.connection.execute(
+            "SELECT reaction, metabolite, coefficient, side FROM members WHERE model_id = ? ORDER BY reaction, idx", (model_id,)).fetchall()
+
+        counts = np.bincount(np.array([m[0] for m in members], dtype=np.int64), minlength=len(reactions))
+        indptr = np.zeros(len(reactions) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        return ModelMatrix(
+            reaction_names=[r[0] for r in reactions],
+            directions=np.array([r[1] for r in reactions], dtype=np.uint8),
+            lb=np.array([r[2] for r in reactions], dtype=np.float64),
+            ub=np.array([r[3] for r in reactions], dtype=np.float64),
+            indptr=indptr,
+            indices=np.array([m[1] for m in members], dtype=np.int32),
+            coefficients=np.array([m[2] for m in members], dtype=np.float64),
+            sides=np.array([m[3] for m in members], dtype=np.uint8),
+            metabolite_names=[m[0] for m in metabolites],
+            metabolite_boundary=np.array([m[1] for m in metabolites], dtype=np.bool_),
+            metabolite_order=np.array([m[2] for m in metabolites], dtype=np.float64),
+            objective=_decode_objective(objective),
+            design_objective=_decode_objective(design_objective),
+            objective_names=[str(n) for n in json.loads(objective_names)])
+
+    def model(self, name):
+        """
+        Recreate stored model
+
+        :param name: Model name
+        :rtype: :class:`Model`
+        """
+        return self.matrix(name).to_model()
@@ -5,12 +5,15 @@ import cobra.io, cobra.flux_analysis, cobra.manipulation
 import moma # when run on cluster
 from deap import base, creator, tools
 import random
+import hashlib
+import knockout_cache
 from cPickle import load, dump
 
 class OptGene(object):
     def __init__(self, objective_function='Yield', max_mutation=3, target_type='reaction',
                  target_list=None, generations=5000, population_size=125, mutation_rate=None, cx_fraction=0.8,
-                 cx_method='Two', record_file=None, flux_calculation='FBA', wt_flux=None, reduced=False, record_interval=0):
+                 cx_method='Two', record_file=None, flux_calculation='FBA', wt_flux=None, reduced=False, record_interval=0,
+                 cache=None, cache_size=100000):
         self.objective_function = objective_function
         self.max_mutation = max_mutation
         self.target_type = target_type
@@ -25,6 +28,9 @@ class OptGene(object):
         self.wt_flux = wt_flux
         self.reduced = reduced
         self.record_interval = record_interval
+        self.cache = cache # SQLite file with outcomes of evaluated deletions
+        self.cache_size = cache_size # number of outcomes cached in memory
+        self.outcomes = None
 
 
     def optimize(self, cobra_model, objective_reaction):
@@ -74,6 +80,10 @@ class OptGene(object):
             target = self.preprocessing(model) # define deletion target list, exchange reactions and lethal reactions are removed from target
         print 'number of target: %s' % len(target)
 
+        # individuals blocking the same reactions are evaluated once
+        self.outcomes = knockout_cache.OutcomeCache(self.fingerprint(model, objective_reaction), max_size=self.cache_size,
+                                                    path=self.cache)
+
         if not self.mutation_rate:
             self.mutation_rate = 1.0/len(target) # see paper
         print 'mutation rate: %s' % self.mutation_rate
@@ -204,6 +214,8 @@ class OptGene(object):
 
         print("-- End of (successful) evolution --")
         print("%s different mutants were evaluated" % len(Evaluated))
+        print("%s evaluations were found in cache" % self.outcomes.hits)
+        self.outcomes.close()
 
         best_ind = hof[0]
         delList = [target[i] for i, v in enumerate(best_ind) if not v]  # list of deletion for best individual
@@ -330,22 +342,56 @@ class OptGene(object):
         return target
 
 
+    def fingerprint(self, model, objective_reaction):
+        '''
+        Digest of model reactions and evaluation settings, outcomes of evaluations are cached by it
+        :param model: cobra.Model object
+        :param objective_reaction: reaction ID of design objective
+        :return: hexadecimal MD5 digest
+        '''
+        reactions = [(r.id, r.reaction, r.gene_reaction_rule, r.lower_bound, r.upper_bound, r.objective_coefficient)
+                     for r in model.reactions]
+        wt_flux = sorted(self.wt_flux.items()) if isinstance(self.wt_flux, dict) else None
+        settings = (objective_reaction, self.objective_function.lower(), self.flux_calculation.lower(),
+                    self.target_type.lower(), wt_flux)
+        return hashlib.md5(repr((reactions, settings))).hexdigest()
+
     def __evaluation(self, individual, objective_reaction):
         global model, target
         # get the index of deleted elements
         deletion_list = [target[i] for i, v in enumerate(individual) if not v]
 
         # deletion of genes (set upper and lower bound of reaction to zero according to gene-reaction rules)
-        delModel = model.copy()
+        delModel = None
         if self.target_type.lower() == 'gene':
+            delModel = model.copy()
             if not deletion_list == []: # avoid error in delete_model_genes
                 cobra.manipulation.delete_model_genes(delModel, deletion_list, cumulative_deletions=False)
+            # different gene deletions often block the same reactions
+            knocked = [i for i, (r, r_del) in enumerate(zip(model.reactions, delModel.reactions))
+                       if (r.lower_bound, r.upper_bound) != (r_del.lower_bound, r_del.upper_bound)]
         elif self.target_type.lower() == 'reaction':
-            for r in deletion_list:
-                delModel.reactions.get_by_id(r).knock_out()
+            knocked = [model.reactions.index(r) for r in deletion_list]
         else:
             print "target_type should be 'Gene' or 'Reaction'"
+            delModel = model.copy()
+            knocked = []
+
+        outcome = self.outcomes.get(knocked)
+        if outcome is None:
+            if delModel is None:
+                delModel = model.copy()
+                for r in deletion_list:
+                    delModel.reactions.get_by_id(r).knock_out()
+
+            outcome = self.__fitness(delModel, objective_reaction)
+            if outcome[1] is not None:
+                self.outcomes.put(knocked, *outcome)
+
+        return outcome[1],
 
+    def __fitness(self, delModel, objective_reaction):
+        # returns status and fitness of mutant
         # caluculate the flux distribution by FBA
         if self.flux_calculation.lower() == 'fba':
             sol = delModel.optimize()
@@ -354,7 +400,7 @@ class OptGene(object):
             try:
                 objective_flux = sol.x_dict[objective_reaction]
             except TypeError:
-                return 1e-16,
+                return status, 1e-16
 
         elif self.flux_calculation.lower() == 'moma':
             sol_dict = moma.moma(model, delModel, minimize_norm=True, norm_flux_dict=self.wt_flux)
@@ -363,18 +409,19 @@ class OptGene(object):
                 status = sol_dict['status']
                 objective_flux = abs(sol_dict['the_problem'].x_dict[objective_reaction])
             except:
-                return 1e-16,
+                return 'failed', 1e-16
 
         if status == "infeasible" or objective_flux <= 1e-16 or growth < 1e-16:
-                return 1e-16, # fitness shouldn't be zero to use selRoulette for the selection
+                return status, 1e-16 # fitness shouldn't be zero to use selRoulette for the selection
 
         # return objective values
         if self.objective_function.lower() == "yield":
-            return objective_flux,
+            return status, objective_flux
         elif self.objective_function.lower() == "bpcy":
-            return objective_flux * growth,
+            return status, objective_flux * growth
         else:
             print "object_function should be 'Yield' or 'BPCY'"
+            return status, None
 
     def __repair(self, individual):
         # get the index of mutated elements
@@ -421,6 +468,8 @@ if __name__ == "__main__":
     parser.add_argument('--reduced', dest="is_reduced", action='store_true', help='Model is already reduced')
     parser.add_argument('--record_interval', '-rec_step', dest="record_interval", default=0, action='store',
                         help='interval of recording results (default: no recording)', type=int)
+    parser.add_argument('--cache', dest="cache", default=None, action='store',
+                        help='SQLite file with outcomes of evaluated deletions, shared by runs on the same model', type=str)
 
     args = parser.parse_args()
 
@@ -445,5 +494,6 @@ if __name__ == "__main__":
                       max_mutation=args.max_mutation, target_type=args.target_type, target_list=args.target_list,
                       generations=args.generations, population_size=args.population_size, mutation_rate=args.mutation_rate,
                       cx_fraction=args.cx_fraction, cx_method=args.cx_method, flux_calculation=args.flux_calculation,
-                      record_file=args.record_file, wt_flux=args.wt_flux, reduced=args.is_reduced, record_interval=args.record_interval)
+                      record_file=args.record_file, wt_flux=args.wt_flux, reduced=args.is_reduced, record_interval=args.record_interval,
+                      cache=args.cache)
     optgene.optimize(cobra_model, objective_reaction=args.objective_reaction)
\ No newline at end of file
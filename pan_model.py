@@ -0,0 +1,176 @@
+from model import *
+import hashlib
+import os
+import numpy as np
+
+
+class PanModel(object):
+    """
+    Union (pan-reactome) of related models, e.g. models of many strains of one species. Models are added one by one and
+    only their reactions which are not yet in the union are kept, so memory depends on the size of the union and not on
+    the number of models.
+
+    Reactions are identified by content: reactants and products (metabolite names and coefficients) and direction.
+    Reaction names, member order and bounds are ignored, reversible reactions written in opposite directions are the
+    same reaction. Union reaction takes name of the first occurrence (reactions with other content but a name already
+    used in union get suffix ``_2``, ``_3``, ...) and bounds covering bounds of all occurrences. Metabolites are
+    identified by name and are boundary if they are boundary in any model.
+
+    :rtype: :class:`PanModel`
+    """
+
+    def __init__(self):
+        self.strains = []
+        self.__keys = {}
+        self.__names = set()
+        self.__reactions = []
+        self.__lb = []
+        self.__ub = []
+        self.__swapped = []
+        self.__metabolites = {}
+        self.__metabolite_names = []
+        self.__membership = []
+
+    @property
+    def n_reactions(self):
+        return len(self.__reactions)
+
+    @property
+    def reaction_names(self):
+        """
+        Names of union reactions in the order they were first seen
+
+        :rtype: list of str
+        """
+        return [r[0] for r in self.__reactions]
+
+    @staticmethod
+    def __members(members):
+        return sorted((m.metabolite.name, float(m.coefficient)) for m in members)
+
+    @staticmethod
+    def __key(reactants, products, reversible):
+        """
+        :return: Tuple ``(key, swapped)``, swapped is True if reactants and products were exchanged
+        """
+        swapped = reversible and (products, reactants) < (reactants, products)
+        if swapped:
+            reactants, products = products, reactants
+
+        text = "{0}|{1}|{2}".format(int(reversible), ";".join("{0}:{1!r}".format(*m) for m in reactants),
+                                    ";".join("{0}:{1!r}".format(*m) for m in products))
+        return hashlib.md5(text).digest(), swapped
+
+    def add(self, model, name=None):
+        """
+        Add model to union
+
+        :param model: :class:`Model` or path to a file in bioopt format (parsed when added)
+        :param name: Strain name (default: file name or ``strain<number>``)
+        :return: Union indices of model reactions (in the order of model reactions)
+        """
+        if not isinstance(model, Model):
+            from bioopt_parser import BiooptParser
+            if name is None:
+                name = os.path.basename(model)
+            model = BiooptParser().parse_file(model)
+        if name is None:
+            name = "strain{0}".format(len(self.strains))
+
+        fwd = Direction.forward()
+        indices = []
+        for r in model.reactions:
+            for m in itertools.chain(r.reactants, r.products):
+                m = m.metabolite
+                if m.name not in self.__metabolites:
+                    self.__metabolites[m.name] = m.boundary
+                    self.__metabolite_names.append(m.name)
+                elif m.boundary:
+                    self.__metabolites[m.name] = True
+
+            reactants = PanModel.__members(r.reactants)
+            products = PanModel.__members(r.products)
+            reversible = r.direction != fwd
+            key, swapped = PanModel.__key(reactants, products, reversible)
+
+            i = self.__keys.get(key)
+            if i is None:
+                i = self.__keys[key] = len(self.__reactions)
+                reaction_name = r.name
+                suffix = 2
+                while reaction_name in self.__names:
+                    reaction_name = "{0}_{1}".format(r.name, suffix)
+                    suffix += 1
+                self.__names.add(reaction_name)
+                self.__reactions.append((reaction_name, reactants, products, reversible))
+                self.__lb.append(r.bounds.lb)
+                self.__ub.append(r.bounds.ub)
+                self.__swapped.append(swapped)
+            else:
+                # Reaction written in the opposite direction than its first occurrence
+                if swapped != self.__swapped[i]:
+                    lb, ub = -r.bounds.ub, -r.bounds.lb
+                else:
+                    lb, ub = r.bounds.lb, r.bounds.ub
+                self.__lb[i] = min(self.__lb[i], lb)
+                self.__ub[i] = max(self.__ub[i], ub)
+
+            indices.append(i)
+
+        self.strains.append(name)
+        self.__membership.append(np.unique(np.array(indices, dtype=np.int32)))
+
+        return indices
+
+    def membership(self):
+        """
+        Presence of union reactions in added models (strains x reactions). Requires *scipy*.
+
+        :rtype: scipy.sparse.csr_matrix of bool
+        """
+        import scipy.sparse
+
+        indptr = np.zeros(len(self.__membership) + 1, dtype=np.int64)
+        np.cumsum([len(m) for m in self.__membership], out=indptr[1:])
+        indices = np.concatenate(self.__membership) if self.__membership else np.zeros(0, dtype=np.int32)
+
+        return scipy.sparse.csr_matrix((np.ones(len(indices), dtype=np.bool_), indices, indptr),
+                                       shape=(len(self.strains), self.n_reactions))
+
+    def to_model(self):
+        """
+        Union model. Model has no objective.
+
+        :rtype: :class:`Model`
+        """
+        metabolites = dict((name, Metabolite(name, self.__metabolites[name])) for name in self.__metabolite_names)
+        fwd = Direction.forward()
+        rev = Direction.reversible()
+
+        def members(members):
+            return ReactionMemberList([ReactionMember(metabolites[name], coefficient) for name, coefficient in members])
+
+        reactions = []
+        for (name, reactants, products, reversible), lb, ub in zip(self.__reactions, self.__lb, self.__ub):
+            reactions.append(Reaction(name, members(reactants), members(products), rev if reversible else fwd, Bounds(lb, ub)))
+
+        model = Model()
+        model.reactions = reactions
+
+        return model
+
+
+def merge(models, names=None):
+    """
+    Build union of models (see :meth:`model.Model.merge`)
+
+    :param models: Iterable of :class:`Model` or paths to files in bioopt format
+    :param names: Strain names (default: file names or ``strain<number>``)
+    :rtype: :class:`PanModel`
+    """
+    pan = PanModel()
+    names = list(names) if names is not None else []
+    for i, model in enumerate(models):
+        pan.add(model, names[i] if i < len(names) else None)
+
+    return pan
@@ -389,7 +389,138 @@ class TestModel(TestCase):
         com_model_true.unify_references()
 
         self.assertEquals(com_model, com_model_true)
+        self.assertEquals(com_model_true, Model.commune([model1, model2, model3], lazy=True).to_model())
 
+        com_model = Model.commune([model1, model2, model3], block=["^ML0001_", "ExtI$"])
+        com_model_true.reactions = [r for r in com_model_true.reactions if not r.name.startswith("ML0001_") and r.name != "ENV_ExtI"]
+        self.assertEquals(com_model, com_model_true)
+
+        from community import Community
+        community = Community([model1, model2, model3])
+        self.assertEquals(community.members, ["ML0000_", "ML0001_", "ML0002_"])
+        self.assertEquals(community.environment, ["E"])
+        self.assertEquals(community.to_model(), Model.commune([model1, model2, model3]))
+        self.assertRaises(ValueError, community.add_member, model1, "ML0000_")
+
+        community.remove_member("ML0001_")
+        self.assertEquals(community.to_model(), Model.commune([model1, model2, model3], block=["^ML0001_"]))
+        self.assertEquals(community.add_member(model2), "ML0003_")
+        self.assertRaises(KeyError, community.remove_member, "ML0001_")
+
+        lp = community.lp_matrix()
+        self.assertEquals(lp.S.shape, (len(lp.metabolites), len(lp.reactions)))
+        self.assertEquals(len(lp.reactions), 16)
+        self.assertTrue("ENV_ExtX" not in lp.metabolites)
+        self.assertEquals([[1, 1, 1], [1, 1, 1], [1, 1, 1]], community.overlap().tolist())
+        self.assertEquals(community.to_model().save(), community.to_matrix().save())
+
+        import os
+        import shutil
+        import tempfile
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(tmp_dir, "model1.bioopt"), os.path.join(tmp_dir, "missing.bioopt"), os.path.join(tmp_dir, "model3.bioopt")]
+            model1.save(paths[0])
+            model3.save(paths[2])
+            with open(paths[2], "a") as f:
+                f.write("-REACTIONS\nR_bad A => B\n")
+
+            community = Community()
+            results = community.add_member_files(paths, workers=2)
+            self.assertEquals([True, False, True], [r.ok for r in results])
+            self.assertEquals(1, len([d for d in results[2].diagnostics if "R_bad" in d.message]))
+            self.assertEquals(["ML0000_", "ML0002_"], community.members)
+            self.assertEquals(["E"], results[0].exchanged)
+            self.assertEquals(community.to_model(), Model.commune([model1, model2, model3], block=["^ML0001_"]))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+    def test_merge(self):
+        fwd = Direction.forward()
+        rev = Direction.reversible()
+
+        model1 = Model()
+        model1.reactions = [
+            R("R1", 1*M("A") + 1*M("B"), 3*M("C"), direction=fwd, bounds=B(0, 10)),
+            R("R2", 1*M("C"), 1*M("D", boundary=True), direction=rev),
+        ]
+        model2 = Model()
+        model2.reactions = [
+            R("R2b", 1*M("D"), 1*M("C"), direction=rev),
+            R("R1", 1*M("B") + 1*M("A"), 3*M("C"), direction=fwd, bounds=B(0, 100)),
+            R("R2", 1*M("C"), 1*M("E"), direction=fwd),
+        ]
+
+        union, membership = Model.merge([model1, model2])
+        union_true = Model()
+        union_true.reactions = [
+            R("R1", 1*M("A") + 1*M("B"), 3*M("C"), direction=fwd, bounds=B(0, 100)),
+            R("R2", 1*M("C"), 1*M("D", boundary=True), direction=rev),
+            R("R2_2", 1*M("C"), 1*M("E"), direction=fwd),
+        ]
+        union_true.unify_references()
+
+        self.assertEquals(union, union_true)
+        self.assertEquals([[True, True, False], [True, True, True]], membership.toarray().tolist())
+
+        pan = Model.merge([model1, model2, model1], names=["S1", "S2"], lazy=True)
+        self.assertEquals(["S1", "S2", "strain2"], pan.strains)
+        self.assertEquals(["R1", "R2", "R2_2"], pan.reaction_names)
+
+        model3 = Model()
+        model3.reactions = [R("R3", 1*M("A"), 1*M("B"), direction=rev, bounds=B(-10, 100))]
+        model4 = Model()
+        model4.reactions = [R("R3b", 1*M("B"), 1*M("A"), direction=rev, bounds=B(0, 50))]
+
+        union, membership = Model.merge([model3, model4])
+        self.assertEquals(1, len(union.reactions))
+        self.assertEquals("R3", union.reactions[0].name)
+        self.assertEquals((-50, 100), (union.reactions[0].bounds.lb, union.reactions[0].bounds.ub))
+
+    def test_store(self):
+        from model_store import ModelStore
+
+        model1 = Model()
+        r1 = R("R1", 1*M("A") + 1*M("B"), 3*M("C"), direction=Direction.forward(), bounds=B(0, 100))
+        r2 = R("R2", 1*M("B") + 1*M("C"), 1*M("E", boundary=True), direction=Direction.reversible())
+        model1.reactions = [r1, r2]
+        model1.unify_references()
+        model1.objective = ME(Operation.addition(), [ME(Operation.multiplication(), [r1, 1.0]), ME(Operation.multiplication(), [R("R3"), 2.0])])
+        model2 = Model()
+        model2.reactions = [R("R1", 1*M("A"), 1*M("C", boundary=True), direction=Direction.forward(), bounds=B(0, 10))]
+
+        store = ModelStore()
+        store.add(model1, "M1")
+        store.add(model2, "M2")
+        self.assertRaises(ValueError, store.add, model2, "M2")
+        self.assertEquals(["M1", "M2"], store.models())
+        self.assertEquals(["M1", "M2"], store.models_with_reaction("R1"))
+        self.assertEquals(["M1"], store.models_with_reaction("R2"))
+        self.assertEquals([("M1", B(0, 100)), ("M2", B(0, 10))], store.reaction_bounds("R1"))
+        self.assertEquals(["M2"], store.models_with_metabolite("C", boundary=True))
+        self.assertEquals([("M1", "R1"), ("M1", "R2"), ("M2", "R1")], store.reactions_with_metabolite("C"))
+        self.assertEquals(model1, store.model("M1"))
+        self.assertEquals(model1.save(), store.model("M1").save())
+
+        store.remove("M1")
+        self.assertEquals(1, len(store))
+        self.assertEquals([], store.models_with_reaction("R2"))
+        self.assertRaises(KeyError, store.model, "M1")
+        store.close()
+
+    def test_names(self):
+        import cPickle
+        name = "".join(["H2", "O"])
+        self.assertFalse(name is "H2O")
+        self.assertTrue(Metabolite(name).name is Metabolite("H2O").name)
+        self.assertTrue(Reaction(name).name is Reaction("H2O").name)
+
+        model = Model()
+        model.reactions = [R(name, 1*M(name), 1*M("".join(["N", "a"]), boundary=True))]
+        model = cPickle.loads(cPickle.dumps(model, cPickle.HIGHEST_PROTOCOL))
+        self.assertTrue(model.reactions[0].name is "H2O")
+        self.assertTrue(model.find_metabolites("Na")[0].name is "Na")
 
     def test_save(self):
         model = Model()
@@ -418,6 +549,367 @@ R2 R1 1
 """
         self.assertEquals(expected, model.save())
 
+        import cStringIO
+        f = cStringIO.StringIO()
+        model.write(f, buffer_lines=2)
+        self.assertEquals(expected, f.getvalue())
+
+        r1.bounds = B(-1.23456789, B.inf())
+        r1.reactants[1].coefficient = 0.123456
+        f = cStringIO.StringIO()
+        model.save(f, inf=500, precision=3)
+        self.assertTrue(f.getvalue().startswith("-REACTIONS\nR1\t:\tA + 0.123 B -> 3 C\n"))
+        self.assertTrue("\nR1\t[-1.23, 500]\n" in f.getvalue())
+
+    def test_repr(self):
+        model = Model()
+        model.reactions = [R("R{0}".format(i), 1*M("A"), 1*M("B{0}".format(i), boundary=True), direction=Direction.forward()) for i in xrange(Model.repr_limit + 5)]
+        model.objective = ME(Operation.multiplication(), [model.reactions[0], 1, 1])
+
+        text = repr(model)
+        self.assertTrue("R{0}[".format(Model.repr_limit - 1) in text)
+        self.assertFalse("R{0}[".format(Model.repr_limit) in text)
+        self.assertTrue("... (5 more)" in text)
+        self.assertTrue("-CONSTRAINTS ({0})".format(Model.repr_limit + 5) in text)
+        external = text.split("-EXTERNAL METABOLITES\n")[1].split("\n\n")[0].split("\n")
+        self.assertEquals(["B{0}*".format(i) for i in xrange(Model.repr_limit)] + ["..."], external)
+
+        import cStringIO
+        f = cStringIO.StringIO()
+        model.dump(f)
+        self.assertTrue("R{0}[".format(Model.repr_limit + 4) in f.getvalue())
+
+    def test_binary(self):
+        import os
+        import shutil
+        import tempfile
+        from bioopt_binary import save_binary, load_binary
+
+        model = Model()
+        r1 = R("R1", 1*M("A") + 1*M("B"), 3*M("C"), direction=Direction.forward(), bounds=B(-100, 100))
+        r2 = R("R2", 1*M("B") + 1*M("C"), 1*M("E", boundary=True), direction=Direction.reversible())
+        model.reactions = [r1, r2]
+        model.unify_references()
+        model.objective = ME(Operation.multiplication(), [r1, 1.0, 1.0])
+        model.design_objective = ME(Operation.addition(), [ME(Operation.multiplication(), [r2, R("R3"), 2.0]), ME(None, [r1])])
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "model.bin")
+            save_binary(model, path)
+            matrix = load_binary(path)
+            self.assertEquals(["R1", "R2"], list(matrix.reaction_names))
+            self.assertEquals(["A", "B", "C", "E"], list(matrix.metabolite_names))
+            self.assertEquals([[-1, 0], [-1, -1], [3, -1], [0, 1]], matrix.stoichiometry().toarray().tolist())
+            self.assertEquals([1, 0], matrix.objective_coefficients().tolist())
+            self.assertEquals(model, matrix.to_model())
+            self.assertEquals(model.save(), matrix.to_model().save())
+            self.assertEquals(model.save(), matrix.save())
+            self.assertEquals(model.matrix().fingerprint(), matrix.fingerprint())
+            self.assertNotEqual(model.matrix().fingerprint(), Model().matrix().fingerprint())
+
+            # Reactions modified in place are saved, not the cached view
+            model.matrix()
+            model.reactions[0].bounds = B(0, 7)
+            save_binary(model, path)
+            self.assertEquals([0, 7], [load_binary(path).lb[0], load_binary(path).ub[0]])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_columns(self):
+        from converter import Bioopt2ColumnsConverter
+
+        model = Model()
+        r1 = R("R1", 1*M("A_c") + 1*M("B_c"), 3*M("C_c"), direction=Direction.forward(), bounds=B(-100, 100))
+        r2 = R("R2", 1*M("B_c") + 1*M("C_c"), 1*M("E_e", boundary=True), direction=Direction.reversible())
+        model.reactions = [r1, r2]
+        model.objective = ME(Operation.multiplication(), [r2, 1, 1])
+
+        tables = dict((t, dict(columns)) for t, columns in Bioopt2ColumnsConverter(inf=1000).convert(model).iteritems())
+        self.assertEquals(["->", "<->"], tables["reactions"]["direction"].tolist())
+        self.assertEquals([-100, -1000], tables["reactions"]["lb"].tolist())
+        self.assertEquals([0, 1], tables["reactions"]["objective"].tolist())
+        self.assertEquals([0, 0, 0, 1, 1, 1], tables["members"]["reaction"].tolist())
+        self.assertEquals([0, 1, 2, 1, 2, 3], tables["members"]["metabolite"].tolist())
+        self.assertEquals([-1, -1, 3, -1, -1, 1], tables["members"]["coefficient"].tolist())
+        self.assertEquals(["c", "c", "c", "e"], tables["metabolites"]["compartment"].tolist())
+        self.assertEquals([False, False, False, True], tables["metabolites"]["boundary"].tolist())
+
+    def test_lp_backend(self):
+        import cplex_utils
+
+        fwd = Direction.forward()
+        rev = Direction.reversible()
+
+        a, b, c, d = M("A"), M("B"), M("C"), M("D")
+        x = dict((n, M(n + "_xtX", boundary=True)) for n in "AD")
+        model = Model()
+        model.reactions = [
+            R("R1", 1*a, 2*b, direction=rev),
+            R("R2", 1*a, 1*c, direction=fwd),
+            R("R3", 1*b + 1*c, 1*d, direction=fwd),
+            R("A_xtI", 1*x["A"], 1*a, direction=fwd, bounds=Bounds(0, 1)),
+            R("D_xtO", 1*d, 1*x["D"], direction=fwd)]
+        model.objective = ME(Operation.multiplication(), [model.reactions[2], 1])
+
+        prob = cplex_utils.bioopt2cplex(model, backend="scipy")
+        prob.lp.solve()
+        self.assertTrue(prob.lp.is_optimal())
+        self.assertAlmostEqual(2/3.0, prob.lp.objective_value(), places=4)
+        self.assertAlmostEqual(2/3.0, prob.lp.values([prob.rxn2i["R2"]])[0], places=4)
+
+        i = prob.rxn2i["R1"]
+        prob.lp.set_lower_bounds([(i, 0.0)])
+        prob.lp.set_upper_bounds([(i, 0.0)])
+        prob.lp.solve()
+        self.assertAlmostEqual(0.0, prob.lp.objective_value(), places=4)
+
+        other = prob.copy()
+        other.lp.set_lower_bounds([(i, -Bounds.inf())])
+        other.lp.set_upper_bounds([(i, Bounds.inf())])
+        other.lp.solve()
+        self.assertAlmostEqual(2/3.0, other.lp.objective_value(), places=4)
+        self.assertEquals([0.0], prob.lp.upper_bounds([i]))
+        self.assertIs(prob.rxn2i, other.rxn2i)
+
+        prob = cplex_utils.bioopt2cplex(model.matrix(), split_reversible=True, backend="scipy")
+        self.assertEquals(["R1_->", "R1_<->", "R2", "R3", "A_xtI", "D_xtO", "EX_A_xtX_->", "EX_A_xtX_<->", "EX_D_xtX_->", "EX_D_xtX_<->"], prob.i2rxn)
+        self.assertEquals([0, 2, 3, 4, 5, 6, 8], prob.fwd.tolist())
+        self.assertEquals([1, -1, -1, -1, -1, 7, 9], prob.rev.tolist())
+        self.assertEquals([False]*6 + [True]*4, prob.external.tolist())
+        self.assertEquals(prob.lp.column(prob.rxn2i["R1_->"])[1], [-v for v in prob.lp.column(prob.rxn2i["R1_<->"])[1]])
+        prob.lp.solve()
+        self.assertAlmostEqual(2/3.0, prob.lp.objective_value(), places=4)
+
+        model.reactions[3].bounds = Bounds(0, 2)
+        prob = cplex_utils.bioopt2cplex(model, backend="scipy")
+        prob.lp.solve()
+        self.assertAlmostEqual(4/3.0, prob.lp.objective_value(), places=4)
+
+    def test_knockouts(self):
+        import knockout_utils
+
+        model = BiooptParser().parse("""
+-REACTIONS
+R1: A <-> 2 B
+R2: A -> C
+R3: B + C -> D
+A_xtI : A_xtX -> A
+D_xtO : D -> D_xtX
+
+-CONSTRAINTS
+A_xtI [0, 1]
+
+-EXTERNAL METABOLITES
+A_xtX
+D_xtX
+
+-OBJ
+R3 1 1
+""")
+        spec = knockout_utils.ProblemSpec(model.matrix(), "R3", backend="scipy")
+        knockouts = [(0,), (1,), (0, 1), (3,)]
+        results = list(knockout_utils.run_knockouts(spec, iter(knockouts), workers=1))
+        self.assertEquals(knockouts, [r[0] for r in results])
+        self.assertEquals([0.0, 0.0, 0.0, 0.0], [round(r[2], 4) for r in results])
+
+        results = list(knockout_utils.run_knockouts(spec, [(2,), (4,), ()], workers=2, chunk_size=1))
+        self.assertEquals([(2,), (4,), ()], [r[0] for r in results])
+        self.assertEquals([0.0, 0.0, 0.6667], [round(r[2], 4) for r in results])
+
+        # R4 and R5 are alternative routes, optimum with fewer fluxes uses one of them
+        model = BiooptParser().parse("""
+-REACTIONS
+R1: A -> B
+R2: B -> C
+R3: A -> E
+R4: B -> D
+R5: B -> D
+R6: C + D -> F
+A_xtI : A_xtX -> A
+F_xtO : F -> F_xtX
+
+-CONSTRAINTS
+A_xtI [0, 1]
+
+-EXTERNAL METABOLITES
+A_xtX
+F_xtX
+
+-OBJ
+R6 1 1
+""")
+        spec = knockout_utils.ProblemSpec(model.matrix(), "R6", backend="scipy")
+        screen = knockout_utils.WildTypeScreen(spec.create())
+        self.assertAlmostEqual(0.5, screen.value, places=4)
+        self.assertTrue(screen.unaffected((2,)))
+        self.assertFalse(screen.unaffected((0,)))
+        self.assertTrue(screen.unaffected((3,)) or screen.unaffected((4,)))
+
+        knockouts = [(i,) for i in xrange(6)] + [(2, 3), (3, 4)]
+        expected = [round(r[2], 4) for r in knockout_utils.run_knockouts(spec, knockouts, workers=1)]
+        self.assertEquals([0.0, 0.0, 0.5, 0.5, 0.5, 0.0, 0.5, 0.0], expected)
+        self.assertEquals(expected, [round(r[2], 4) for r in knockout_utils.run_knockouts(spec, knockouts, workers=1, screen=screen)])
+        self.assertEquals(expected, [round(r[2], 4) for r in knockout_utils.run_knockouts(spec, knockouts, workers=2, chunk_size=3, screen=screen)])
+
+        pruned = knockout_utils.PrunedKnockouts(range(6), 3)
+        results = list(pruned.run(lambda kos: knockout_utils.run_knockouts(spec, kos, workers=1, screen=screen)))
+        self.assertEquals([(i,) for i in xrange(6)] + [(2, 3), (2, 4), (3, 4)], [r[0] for r in results])
+        self.assertEquals(set([0b1, 0b10, 0b100000, 0b11000]), pruned.lethal)
+        self.assertEquals(9, pruned.solved)
+        self.assertEquals(6 + 15 + 20 - 9, pruned.pruned)
+
+        for n, k in [(5, 1), (6, 2), (7, 3), (7, 4), (3, 4)]:
+            order = list(knockout_utils.revolving_door(range(n), k))
+            self.assertEquals(sorted(itertools.combinations(range(n), k)), sorted(order))
+            self.assertTrue(all(len(set(a) ^ set(b)) == 2 for a, b in zip(order, order[1:])))
+
+        for order in ["lexicographic", "revolving-door"]:
+            full = list(knockout_utils.combinations(range(7), 3, order))
+            self.assertEquals(full[10:20], list(knockout_utils.combinations(range(7), 3, order, 10, 20)))
+            shards = [knockout_utils.shard_range(len(full), i, 4) for i in xrange(4)]
+            self.assertEquals(full, sum([list(knockout_utils.combinations(range(7), 3, order, *r)) for r in shards], []))
+        self.assertRaises(ValueError, knockout_utils.shard_range, 10, 4, 4)
+
+        prob = spec.create()
+        knockouts = list(knockout_utils.combinations(range(6), 2, "revolving-door"))
+        results = dict((r[0], round(r[2], 4)) for r in knockout_utils.solve_knockouts(prob, knockouts))
+        expected = dict((r[0], round(r[2], 4)) for r in knockout_utils.run_knockouts(spec, itertools.combinations(range(6), 2), workers=1))
+        self.assertEquals(expected, results)
+        self.assertEquals(spec.create().lp.upper_bounds(), prob.lp.upper_bounds())
+
+    def test_knockout_results(self):
+        import os
+        import shutil
+        import tempfile
+        import knockout_results
+        from knockout_results import KnockoutWriter, KnockoutResults
+
+        items = ["R1", "R2", "R3", "R4"]
+        results = [((0,), "optimal", 0.5), ((1, 3), "infeasible", 0.0), ((), "optimal", 1.0), ((0, 2), "aborted", 0.25)]
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "knockouts.bin")
+            with KnockoutWriter(path, items, 2, description={"knockouts": "2"}, buffer_size=3) as writer:
+                for res in results:
+                    writer.write(*res)
+                self.assertEquals(4, writer.position)
+
+            stored = KnockoutResults(path)
+            self.assertEquals(items, stored.items)
+            self.assertEquals(4, len(stored))
+            self.assertEquals(9 * 4, stored.records.nbytes)
+            self.assertEquals([(0,), (1, 3), (), (0, 2)], [r[0] for r in stored])
+            self.assertEquals(["optimal", "infeasible", "optimal", "other"], [r[1] for r in stored])
+            self.assertEquals([0.5, 0.0, 1.0, 0.25], [r[2] for r in stored])
+            del stored
+
+            # Interrupted run leaves incomplete record, resumed run replaces it
+            with open(path, "r+b") as f:
+                f.truncate(os.path.getsize(path) - 5)
+            self.assertRaises(ValueError, KnockoutWriter, path, items, 2, description={"knockouts": "3"}, resume=True)
+            with KnockoutWriter(path, items, 2, description={"knockouts": "2"}, resume=True) as writer:
+                self.assertEquals(3, writer.position)
+                writer.write(*results[3])
+            self.assertEquals([(0,), (1, 3), (), (0, 2)], [r[0] for r in KnockoutResults(path, mmap=False)])
+
+            # Records are on disk at checkpoint, before buffer is full
+            checkpoint_path = os.path.join(tmp_dir, "checkpoint.bin")
+            with KnockoutWriter(checkpoint_path, items, 2, buffer_size=3, checkpoint=0) as writer:
+                writer.write(*results[0])
+                writer.write(*results[1])
+                self.assertEquals([(0,), (1, 3)], [r[0] for r in KnockoutResults(checkpoint_path, mmap=False)])
+
+            solved = []
+            def solve(knockouts):
+                for ko in knockouts:
+                    solved.append(ko)
+                    yield ko, "optimal", 1.0
+            resumed = knockout_results.resumed(itertools.islice(KnockoutResults(path), 2), solve)
+            self.assertEquals([(0,), (1, 3)], [r[0] for r in resumed([(0,)])] + [r[0] for r in resumed([(1, 3)])])
+            self.assertEquals([((), "optimal", 1.0), ((2,), "optimal", 1.0)], list(resumed([(), (2,)])))
+            self.assertEquals([(), (2,)], solved)
+            self.assertRaises(ValueError, list, knockout_results.resumed(KnockoutResults(path), solve)([(1,)]))
+
+            paths = [os.path.join(tmp_dir, "shard{0}.bin".format(i)) for i in xrange(2)]
+            for i, shard in enumerate(paths):
+                with KnockoutWriter(shard, items, 2, description={"knockouts": "2", "shard": [i, 2], "start": 2*i, "stop": 2*i + 2}) as writer:
+                    for res in results[2*i:2*i + 2]:
+                        writer.write(*res)
+            merged = os.path.join(tmp_dir, "merged.bin")
+            self.assertEquals(4, knockout_results.merge_shards(reversed(paths), merged))
+            self.assertEquals(list(KnockoutResults(path)), list(KnockoutResults(merged)))
+            self.assertEquals({"knockouts": "2"}, KnockoutResults(merged).description)
+            self.assertRaises(ValueError, knockout_results.merge_shards, paths[:1], merged)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_knockout_cache(self):
+        import os
+        import shutil
+        import tempfile
+        import knockout_utils
+        from knockout_cache import OutcomeCache
+
+        cache = OutcomeCache("model", max_size=2)
+        cache.put((0, 2), "optimal", 1.5)
+        cache.put((1,), "infeasible", 0.0)
+        self.assertEquals(("optimal", 1.5), cache.get((2, 0)))
+        cache.put((), "optimal", 2.0)
+        self.assertEquals(None, cache.get((1,)))
+        self.assertEquals(("optimal", 1.5), cache.get((0, 2, 2)))
+        self.assertEquals((2, 1), (cache.hits, cache.misses))
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "cache.sqlite")
+            with OutcomeCache("model", max_size=1, path=path) as cache:
+                cache.put((0,), "optimal", 0.5)
+                cache.put((1,), "infeasible", 0.0)
+                self.assertEquals(("optimal", 0.5), cache.get((0,)))
+            with OutcomeCache("model", path=path) as cache:
+                self.assertEquals(("infeasible", 0.0), cache.get((1,)))
+            with OutcomeCache("other model", path=path) as cache:
+                self.assertEquals(None, cache.get((1,)))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        model = BiooptParser().parse("""
+-REACTIONS
+R1: A <-> 2 B
+R2: A -> C
+R3: B + C -> D
+A_xtI : A_xtX -> A
+D_xtO : D -> D_xtX
+
+-CONSTRAINTS
+A_xtI [0, 1]
+
+-EXTERNAL METABOLITES
+A_xtX
+D_xtX
+
+-OBJ
+R3 1 1
+""")
+        spec = knockout_utils.ProblemSpec(model.matrix(), "R3", backend="scipy")
+        self.assertEquals(spec.fingerprint(), knockout_utils.ProblemSpec(model.matrix(refresh=True), "R3", backend="scipy").fingerprint())
+        self.assertNotEqual(spec.fingerprint(), knockout_utils.ProblemSpec(model.matrix(), "R2", backend="scipy").fingerprint())
+
+        knockouts = [(2,), (), (2,), (0, 1), (1, 0)]
+        for workers in [1, 2]:
+            cache = OutcomeCache(spec.fingerprint())
+            results = list(knockout_utils.run_knockouts(spec, knockouts, workers=workers, chunk_size=2, cache=cache))
+            self.assertEquals(knockouts, [r[0] for r in results])
+            self.assertEquals([0.0, 0.6667, 0.0, 0.0, 0.0], [round(r[2], 4) for r in results])
+            self.assertEquals(3, len(cache))
+            self.assertEquals((2, 3), (cache.hits, cache.misses))
+
+            results = list(knockout_utils.run_knockouts(spec, knockouts, workers=workers, cache=cache))
+            self.assertEquals([0.0, 0.6667, 0.0, 0.0, 0.0], [round(r[2], 4) for r in results])
+            self.assertEquals(3, len(cache))
+
     def test_sbml(self):
         fwd = Direction.forward()
         rev = Direction.reversible()
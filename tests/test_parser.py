@@ -7,6 +7,25 @@ from model import MathExpression as ME
 
 warnings.simplefilter("ignore")
 
+
+class SuffixEngine(RegexEngine):
+    """
+    Regex engine which appends suffix to reaction names, keeps name of the built-in engine
+    """
+    def parse_reaction(self, line):
+        r = RegexEngine.parse_reaction(self, line)
+        r.name += "_x"
+        return r
+
+    def parse_constraint(self, line):
+        r = RegexEngine.parse_constraint(self, line)
+        r.name += "_x"
+        return r
+
+
+class CustomEngine(SuffixEngine):
+    name = "custom"
+
 # TODO: change expected and actual results order.
 class TestBiooptParser(TestCase):
     def setUp(self):
@@ -338,6 +357,116 @@ R2 1 1
         self.assertTrue(self.model.objective, m.objective)
         self.assertTrue(self.model.design_objective, m.design_objective)
 
+    def test_diagnostics(self):
+        model_text = """
+-REACTIONS
+R1: A + B -> 3 C
+R2 B + C <-> 1 E
+-CONSTRAINTS
+R1[0, 100]
+R3[-100, 100]
+-EXTERNAL METABOLITES
+E
+-OBJ
+R1 1 1
+"""
+        parser = BiooptParser()
+        self.assertRaises(SyntaxError, parser.parse, model_text)
+
+        diagnostics = BiooptParseDiagnostics()
+        m = parser.parse(model_text, diagnostics=diagnostics)
+        self.assertEquals(["R1"], [r.name for r in m.reactions])
+        self.assertEquals(1, len(diagnostics.errors))
+        self.assertEquals(("-REACTIONS", 4), (diagnostics.errors[0].section, diagnostics.errors[0].line))
+        self.assertEquals([("-CONSTRAINTS", 7), ("-EXTERNAL METABOLITES", 9), (None, None)],
+                          [(d.section, d.line) for d in diagnostics.warnings])
+
+        self.assertRaises(BiooptParseError, parser.parse, model_text, BiooptParseDiagnostics(strict=True))
+
+        with warnings.catch_warnings(record=True) as ws:
+            warnings.simplefilter("always")
+            parser.parse(model_text, diagnostics=BiooptParseDiagnostics(warn=True))
+        self.assertEquals(4, len(ws))
+        self.assertTrue(all(issubclass(w.category, BiooptParseWarning) for w in ws))
+
+    def test_compressed_file(self):
+        import os
+        import shutil
+        import tempfile
+        from StringIO import StringIO
+
+        parser = BiooptParser()
+        model = parser.parse(self.model_text)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for ext in ["", ".gz", ".bz2"]:
+                path = os.path.join(tmp_dir, "model.bioopt" + ext)
+                model.save(path)
+                self.assertEquals(model, parser.parse_file(path))
+                self.assertEquals(model, parser.parse_file(open(path, "rb")))
+                self.assertEquals(model, parser.parse_file(StringIO(open(path, "rb").read())))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_parse_files(self):
+        import os
+        import shutil
+        import tempfile
+
+        parser = BiooptParser()
+        model = parser.parse(self.model_text)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(tmp_dir, "model1.bioopt"), os.path.join(tmp_dir, "missing.bioopt"), os.path.join(tmp_dir, "model2.bioopt.gz")]
+            model.save(paths[0])
+            model.save(paths[2])
+
+            for frozen in [False, True]:
+                res = parser.parse_files(paths, workers=2, frozen=frozen)
+                self.assertEquals(paths, [r.path for r in res])
+                self.assertEquals([True, False, True], [r.ok for r in res])
+                self.assertEquals(model, res[0].model)
+                self.assertTrue(res[1].model is None)
+                self.assertEquals(model, res[2].model)
+                self.assertTrue(res[2].model.objective.operation is Operation.multiplication())
+
+            path = os.path.join(tmp_dir, "model3.bioopt")
+            with open(path, "w") as f:
+                f.write("-REACTIONS\nR1: A -> B\n-CONSTRAINTS\nR1[0, 10]\n-EXTERNAL METABOLITES\nB\n")
+            for engine in [SuffixEngine, CustomEngine]:
+                for workers in [1, 2]:
+                    res = BiooptParser(engine=engine).parse_files([path, path], workers=workers)
+                    self.assertEquals([None, None], [r.error for r in res])
+                    self.assertEquals(["R1_x"], [r.name for r in res[1].model.reactions])
+                    self.assertEquals(10, res[1].model.reactions[0].bounds.ub)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_engines(self):
+        model = BiooptParser().parse(self.model_text)
+        for engine in BiooptParser.engines:
+            parser = BiooptParser(engine=engine)
+            self.assertEquals(model, parser.parse(self.model_text))
+            self.assertEquals(model.save(), parser.parse(model.save()).save())
+            self.assertEquals(R("R3", 2*M("A"), 1*M("B") + 0.5*M("h+"), self.rev),
+                              parser.engine.parse_reaction("R3 : (2) A <-> B + 0.5 h+"))
+
+        self.assertRaises(ValueError, BiooptParser, engine="unknown")
+
+    def test_parse_incremental(self):
+        parser = BiooptParser()
+        model = parser.parse_incremental(None, self.model_text)
+        self.assertEquals(self.model, model)
+
+        edited = self.model_text.replace("R2[-100, 100]", "R2[-10, 10]").replace("-OBJ", "D\n-OBJ") \
+            .replace("R1: A + B -> 3 C", "R3: B -> D\nR1: A + B -> 3 C")
+        r1 = model.find_reaction("R1")
+        edited_model = parser.parse_incremental(model, edited)
+        self.assertEquals(parser.parse(edited), edited_model)
+        self.assertTrue(edited_model.find_reaction("R1") is r1)
+
+        self.assertEquals(self.model, parser.parse_incremental(edited_model, self.model_text))
+
     def test_find_metabolites(self):
         parser = BiooptParser()
         m = parser.parse(self.model_text)